@@ -1,14 +1,29 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_file, send_from_directory
 from flask_cors import CORS
 import os
 import json
+import multiprocessing
 import subprocess
 import re
+import threading
+import time
+import uuid
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
-import requests
 from urllib.parse import quote
 
+from file_cache import FileMetadataCache
+from fingerprint import compute_fingerprint
+from media_probe import ProbeScheduler
+from metadata_index import MetadataIndex
+from metrics import REGISTRY, timed_iter
+from profiler import SamplingProfiler, save_profile
+from progress_store import ProgressStore
+from search_index import SearchIndex
+from stats import LibraryStats
+from streaming import stream_file_response
+
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app)
 
@@ -16,52 +31,138 @@ CORS(app)
 MEDIA_FOLDER = Path(__file__).parent.parent  # Parent folder of this repo
 PROGRESS_FILE = Path(__file__).parent / 'progress.json'
 COVERS_CACHE_FILE = Path(__file__).parent / 'covers_cache.json'
+PROBE_CACHE_FILE = Path(__file__).parent / 'probe_cache.json'
+FINGERPRINT_CACHE_FILE = Path(__file__).parent / 'fingerprint_cache.json'
+WATCH_ACTIVITY_FILE = Path(__file__).parent / 'watch_activity.json'
+METADATA_DB_FILE = Path(__file__).parent / 'metadata.db'  # Built by metadata_index.py from provider dumps
 VLC_PATH = r"C:\Program Files\VideoLAN\VLC\vlc.exe"
+VLC_HTTP_HOST = "localhost"
 VLC_HTTP_PORT = 8080
 VLC_HTTP_PASSWORD = "medialibrary"
 
 # Cover image API (optional - only uses if available)
 TMDB_API_KEY = None  # Set your TMDB API key here if you want to auto-fetch covers
 IMDB_API_URL = "https://www.imdb.com"
+TVMAZE_API_URL = "https://api.tvmaze.com"
+OPENLIBRARY_API_URL = "https://openlibrary.org"
+TMDB_API_URL = "https://api.themoviedb.org/3"
+COVER_LOOKUP_TIMEOUT = 5  # Seconds per cover provider request
 
 # Supported video formats
 VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', 
                    '.m4v', '.mpg', '.mpeg', '.3gp', '.m2ts', '.ts', '.vob'}
 
+# Sidecar files indexed next to the videos
+SUBTITLE_EXTENSIONS = {'.srt', '.ass', '.ssa', '.sub', '.vtt'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+FOLDER_POSTER_NAMES = ('poster', 'folder', 'cover')  # In order of preference
+
+# Number of finished scan jobs kept around for /api/scan status queries
+SCAN_JOB_HISTORY = 20
+
+# Threads probing container headers after scans (0 disables probing)
+PROBE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Requests sent with an "X-Profile: 1" header or ?profile=1 are profiled and
+# their stack samples saved here, newest PROFILE_RETENTION files are kept
+PROFILE_DIR = Path(__file__).parent / 'profiles'
+PROFILE_RETENTION = 50
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples (about the GIL switch interval)
+
+def http_get(url, **kwargs):
+    """requests.get(), importing requests on first use
+
+    It takes a good part of the server's import time and isn't needed at
+    all while every cover is cached and nothing plays in VLC.
+    """
+    import requests
+    return requests.get(url, **kwargs)
+
+# Serializes every load-modify-save of the covers cache (Flask threads and asgi_app.py)
+covers_cache_lock = threading.Lock()
+
 def load_covers_cache():
     """Load cover URLs cache"""
     if COVERS_CACHE_FILE.exists():
         try:
             with open(COVERS_CACHE_FILE, 'r', encoding='utf-8') as f:
                 return json.load(f)
-        except:
+        except (OSError, ValueError):
             return {}
     return {}
 
 def save_covers_cache(cache):
-    """Save cover URLs cache"""
-    with open(COVERS_CACHE_FILE, 'w', encoding='utf-8') as f:
+    """Save cover URLs cache, replacing the file so readers never see half of it"""
+    tmp_file = COVERS_CACHE_FILE.with_suffix(COVERS_CACHE_FILE.suffix + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
         json.dump(cache, f, indent=2)
+    os.replace(tmp_file, COVERS_CACHE_FILE)
 
-def load_progress():
-    """Load watch progress from JSON file"""
-    if PROGRESS_FILE.exists():
-        try:
-            with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+def store_covers(found):
+    """Add covers to the cache file, keeping covers stored meanwhile by other requests"""
+    with covers_cache_lock:
+        covers_cache = load_covers_cache()
+        covers_cache.update(found)
+        save_covers_cache(covers_cache)
 
-def save_progress(progress_data):
-    """Save watch progress to JSON file"""
-    with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(progress_data, f, indent=2)
+def count_covers_cache(hits, misses):
+    """Add covers cache lookups to the metrics"""
+    with covers_cache_stats_lock:
+        covers_cache_stats['hits'] += hits
+        covers_cache_stats['misses'] += misses
 
-def get_video_duration_vlc(video_path):
-    """Get video duration using VLC (approximate)"""
-    # For now, return None. We'll track duration when playing
-    return None
+# Content fingerprints by path, size and mtime, so each file is hashed once
+fingerprint_cache = FileMetadataCache(FINGERPRINT_CACHE_FILE)
+
+def get_fingerprint(video_path, file_stat):
+    """Get the content fingerprint of a video file (cached)"""
+    fingerprint = fingerprint_cache.get(video_path, file_stat.st_size, file_stat.st_mtime)
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(video_path, file_stat.st_size)
+        if fingerprint:
+            fingerprint_cache.put(video_path, file_stat.st_size, file_stat.st_mtime, fingerprint)
+    return fingerprint
+
+def fingerprint_for_path(video_path):
+    """Fingerprint of a path, from the scanned library when possible"""
+    file_info = library_state['files'].get(video_path)
+    if file_info is not None and file_info.get('fingerprint'):
+        return file_info['fingerprint']
+    try:
+        return get_fingerprint(video_path, os.stat(video_path))
+    except OSError:
+        return None
+
+# Watch progress keyed by fingerprint, so renamed and moved files keep it
+progress_store = ProgressStore(PROGRESS_FILE, fingerprint_for=fingerprint_for_path)
+
+# Container header metadata (duration, resolution, codec) by path, size and mtime
+probe_cache = FileMetadataCache(PROBE_CACHE_FILE)
+
+def on_probe_result(video_path, media_info):
+    """Keep probed metadata for the library being served (see file_media())"""
+    library_state['probed'][video_path] = media_info
+
+def on_probe_batch(count):
+    """Let clients know that probed durations have been filled in"""
+    bump_library_version()
+
+probe_scheduler = ProbeScheduler(probe_cache, max_workers=PROBE_WORKERS,
+                                 on_result=on_probe_result, on_batch=on_probe_batch)
+
+def schedule_probes(pending_probes, series):
+    """Queue unprobed files, episodes of the most recently watched series first"""
+    if not pending_probes or not PROBE_WORKERS:
+        return
+    
+    last_watched = {}
+    for series_name, seasons in series.items():
+        played = [ep['last_played'] for eps in seasons.values() for ep in eps if ep['last_played']]
+        last_watched[series_name] = max(played, default='')
+    
+    pending_probes.sort(key=lambda item: item[0])
+    pending_probes.sort(key=lambda item: last_watched.get(item[1], ''), reverse=True)
+    probe_scheduler.submit([file_key for file_key, _ in pending_probes])
 
 def clean_series_name(series_name):
     """Clean up series name by removing download quality info"""
@@ -154,11 +255,78 @@ def parse_episode_info(filename, parent_folder):
     
     return season, episode
 
-def scan_media_library():
-    """Scan the media folder and organize files into series and movies"""
+class ScanJob:
+    """A library scan running on a background thread"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.state = 'running'  # running, completed, cancelled, failed
+        self.dirs_visited = 0
+        self.files_classified = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._partial = {'series': {}, 'movies': []}
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Ask the scan to stop at the next directory boundary"""
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """Wait for the scan to finish, returns True if it did"""
+        return self.done.wait(timeout)
+
+    def elapsed(self):
+        end = self.finished_at or time.time()
+        return end - self.started_at
+
+    def snapshot(self):
+        """Copy of the results collected so far (safe while the scan runs)"""
+        if self.result is not None:
+            return self.result
+        with self.lock:
+            series = {
+                name: {season: list(episodes) for season, episodes in seasons.items()}
+                for name, seasons in self._partial['series'].items()
+            }
+            movies = list(self._partial['movies'])
+        return {'series': series, 'movies': movies}
+
+    def to_dict(self, include_results=False):
+        data = {
+            'id': self.id,
+            'state': self.state,
+            'dirs_visited': self.dirs_visited,
+            'files_classified': self.files_classified,
+            'elapsed': round(self.elapsed(), 3),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'finished_at': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            'error': self.error,
+        }
+        if include_results:
+            data['results'] = self.snapshot()
+        return data
+
+def scan_media_library(job=None):
+    """Scan the media folder and organize files into series and movies
+
+    When a ScanJob is passed, its counters are updated as the walk goes, the
+    partially built library is exposed through it and the walk stops early
+    once the job is cancelled.
+    """
     series = {}
     movies = []
-    progress_data = load_progress()
+    pending_probes = []
+    if job is not None:
+        job._partial = {'series': series, 'movies': movies}
     
     # Skip the MediaLibrary folder itself
     repo_folder = Path(__file__).parent
@@ -166,114 +334,513 @@ def scan_media_library():
     # Folders to completely skip
     skip_folders = {'BOOKS', 'WATCHED', 'Featurettes', 'EXTRAS', 'Documentaries', 'Specials'}
     
-    for root, dirs, files in os.walk(MEDIA_FOLDER):
+    scan_started = time.perf_counter()
+    phases = dict.fromkeys(SCAN_PHASES, 0.0)
+    folder_posters = {}
+    for root, dirs, files in timed_iter(os.walk(MEDIA_FOLDER), phases, 'walk'):
+        if job is not None:
+            if job.cancel_requested:
+                break
+            job.dirs_visited += 1
+
         root_path = Path(root)
-        
+
         # Skip the repo folder
         if root_path == repo_folder or repo_folder in root_path.parents:
             continue
-        
+
         # Skip specific folders
         if any(skip in root_path.name for skip in skip_folders):
             continue
+
+        # Hold the job lock per directory so snapshots never see a half-updated library
+        with job.lock if job is not None else nullcontext():
+            scan_directory_files(root_path, files, series, movies, skip_folders, pending_probes, job, phases,
+                                 folder_posters)
+
+    fingerprint_cache.save()
+    progress_store.save()
+
+    # Sort episodes within each season
+    for series_name in series:
+        for season in series[series_name]:
+            series[series_name][season].sort(key=lambda x: x['episode'])
+
+    # Sort movies by name
+    movies.sort(key=lambda x: x['name'])
+
+    if not (job is not None and job.cancel_requested):
+        schedule_probes(pending_probes, series)
+
+    for phase, seconds in phases.items():
+        scan_phase_duration.observe(seconds, phase=phase)
+    scan_duration.observe(time.perf_counter() - scan_started)
+
+    return {'series': series, 'movies': movies}
+
+def index_sidecars(root_path, files):
+    """Find subtitles, .nfo files and artwork among the files of one directory
+
+    Returns (subtitles, nfos, images, folder_poster): subtitles as (stem, path)
+    pairs, .nfo files and images by stem, and the folder's own poster
+    (poster.jpg, folder.jpg or cover.jpg) if there is one.
+    """
+    subtitles = []
+    nfos = {}
+    images = {}
+    folder_images = {}
+    for file in files:
+        stem, ext = os.path.splitext(file)
+        ext = ext.lower()
+        if ext in SUBTITLE_EXTENSIONS:
+            subtitles.append((stem, str(root_path / file)))
+        elif ext == '.nfo':
+            nfos[stem] = str(root_path / file)
+        elif ext in IMAGE_EXTENSIONS:
+            if stem.lower() in FOLDER_POSTER_NAMES:
+                folder_images[stem.lower()] = str(root_path / file)
+            else:
+                images[stem] = str(root_path / file)
+    
+    folder_poster = next((folder_images[name] for name in FOLDER_POSTER_NAMES if name in folder_images), None)
+    return subtitles, nfos, images, folder_poster
+
+def video_sidecars(video_stem, subtitles, nfos, images, folder_poster):
+    """Sidecars of one video, matched by stem ("Show.S01E01.en.srt" belongs to "Show.S01E01.mkv")"""
+    sidecars = {}
+    
+    matched = []
+    for subtitle_stem, subtitle_path in subtitles:
+        if subtitle_stem == video_stem or subtitle_stem.startswith(video_stem + '.'):
+            matched.append({'path': subtitle_path, 'language': subtitle_stem[len(video_stem) + 1:] or None})
+    if matched:
+        sidecars['subtitles'] = matched
+    
+    if video_stem in nfos:
+        sidecars['nfo'] = nfos[video_stem]
+    
+    poster = images.get(f"{video_stem}-poster") or images.get(video_stem) or folder_poster
+    if poster:
+        sidecars['poster'] = poster
+    if folder_poster:
+        sidecars['folder_poster'] = folder_poster
+    
+    return sidecars
+
+def scan_directory_files(root_path, files, series, movies, skip_folders, pending_probes, job=None, phases=None,
+                         folder_posters=None):
+    """Classify the video files of one directory into series and movies
+
+    Time spent per phase (stat, fingerprint, parse) is added to phases.
+    folder_posters maps folders to their poster, so Season folders can use
+    the poster of the series folder above them.
+    """
+    if phases is None:
+        phases = dict.fromkeys(SCAN_PHASES, 0.0)
+    if folder_posters is None:
+        folder_posters = {}
+    
+    # Sidecars come from the same directory listing as the videos
+    subtitles, nfos, images, folder_poster = index_sidecars(root_path, files)
+    if root_path == MEDIA_FOLDER:
+        # Artwork of the media folder itself isn't any title's poster
+        folder_poster = None
+    elif folder_poster:
+        folder_posters[root_path] = folder_poster
+    elif re.search(r'season[\s_-]*\d+', root_path.name.lower()):
+        folder_poster = folder_posters.get(root_path.parent)
+    
+    for file in files:
+        file_path = root_path / file
+        ext = file_path.suffix.lower()
+
+        if ext not in VIDEO_EXTENSIONS:
+            continue
+
+        file_path_str = str(file_path)
+        rel_path = file_path.relative_to(MEDIA_FOLDER)
+
+        # Get file info
+        started = time.perf_counter()
+        file_stat = file_path.stat()
+        file_size = file_stat.st_size
+        file_modified = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+        
+        # Container metadata comes from the background probe once available
+        media_info = probe_cache.get(file_path_str, file_stat.st_size, file_stat.st_mtime)
+        probe_key = None
+        if media_info is None:
+            media_info = {}
+            probe_key = (file_path_str, file_stat.st_size, file_stat.st_mtime)
+        stat_done = time.perf_counter()
+        phases['stat'] += stat_done - started
+        
+        # Get progress info, following the file if it was renamed or moved
+        fingerprint = get_fingerprint(file_path_str, file_stat)
+        progress_store.link(file_path_str, fingerprint)
+        progress_info = progress_store.get(file_path_str, fingerprint) or {}
+        current_time = progress_info.get('position', 0)
+        duration = progress_info.get('duration') or media_info.get('duration') or 0
+        last_played = progress_info.get('last_played', None)
+        completed = progress_info.get('completed', False)
+        fingerprint_done = time.perf_counter()
+        phases['fingerprint'] += fingerprint_done - stat_done
+        
+        # Try to parse episode info
+        season, episode = parse_episode_info(file, root_path.name)
+        phases['parse'] += time.perf_counter() - fingerprint_done
         
-        for file in files:
-            file_path = root_path / file
-            ext = file_path.suffix.lower()
+        if job is not None:
+            job.files_classified += 1
+        
+        file_info = {
+            'path': file_path_str,
+            'fingerprint': fingerprint,
+            'name': file_path.stem,
+            'size': file_size,
+            'modified': file_modified,
+            'current_time': current_time,
+            'duration': duration,
+            'last_played': last_played,
+            'completed': completed,
+            'progress_percent': (current_time / duration * 100) if duration else 0,
+            'media': media_info,
+            'sidecars': video_sidecars(file_path.stem, subtitles, nfos, images, folder_poster)
+        }
+        
+        # Determine if this is part of a series or a standalone movie
+        if season is not None and episode is not None:
+            # This is a series episode
+            # Find the top-level series folder
+            series_name = None
+            rel_parts = rel_path.parts[:-1]  # Exclude the filename
             
-            if ext not in VIDEO_EXTENSIONS:
-                continue
+            # If file is in a Season subfolder, use the parent folder as series name
+            if rel_parts:
+                # Check if the immediate parent is a season folder
+                if rel_parts[-1] and re.search(r'season[\s_-]*\d+', rel_parts[-1].lower()):
+                    # Go up two levels for the series name
+                    if len(rel_parts) >= 2:
+                        series_name = rel_parts[-2]
+                    else:
+                        series_name = rel_parts[-1]
+                else:
+                    # Use the first (top-level) folder as series name
+                    series_name = rel_parts[0] if rel_parts else root_path.name
+            else:
+                # File is directly in parent folder - extract series name from filename
+                # Remove "WATCHED" prefix and extract series name before season info
+                filename_clean = file_path.stem
+                filename_clean = re.sub(r'^WATCHED\s+', '', filename_clean, flags=re.IGNORECASE)
+                # Extract everything before the season/episode info
+                series_name = re.sub(r'\s*[Ss]0?\d+[Ee]0?\d+.*$', '', filename_clean).strip()
             
-            file_path_str = str(file_path)
-            rel_path = file_path.relative_to(MEDIA_FOLDER)
+            if not series_name:
+                series_name = root_path.name
             
-            # Get file info
-            file_size = file_path.stat().st_size
-            file_modified = datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+            # Clean up series name
+            started = time.perf_counter()
+            series_name = clean_series_name(series_name)
+            phases['parse'] += time.perf_counter() - started
             
-            # Get progress info
-            progress_info = progress_data.get(file_path_str, {})
-            current_time = progress_info.get('position', 0)
-            duration = progress_info.get('duration', 0)
-            last_played = progress_info.get('last_played', None)
-            completed = progress_info.get('completed', False)
+            if not series_name or series_name.lower() in ('torrent', 'medialibrary'):
+                continue
             
-            # Try to parse episode info
-            season, episode = parse_episode_info(file, root_path.name)
+            if series_name not in series:
+                series[series_name] = {}
             
-            file_info = {
-                'path': file_path_str,
-                'name': file_path.stem,
-                'size': file_size,
-                'modified': file_modified,
-                'current_time': current_time,
-                'duration': duration,
-                'last_played': last_played,
-                'completed': completed,
-                'progress_percent': (current_time / duration * 100) if duration else 0
-            }
+            if season not in series[series_name]:
+                series[series_name][season] = []
             
-            # Determine if this is part of a series or a standalone movie
-            if season is not None and episode is not None:
-                # This is a series episode
-                # Find the top-level series folder
-                series_name = None
-                rel_parts = rel_path.parts[:-1]  # Exclude the filename
-                
-                # If file is in a Season subfolder, use the parent folder as series name
-                if rel_parts:
-                    # Check if the immediate parent is a season folder
-                    if rel_parts[-1] and re.search(r'season[\s_-]*\d+', rel_parts[-1].lower()):
-                        # Go up two levels for the series name
-                        if len(rel_parts) >= 2:
-                            series_name = rel_parts[-2]
-                        else:
-                            series_name = rel_parts[-1]
-                    else:
-                        # Use the first (top-level) folder as series name
-                        series_name = rel_parts[0] if rel_parts else root_path.name
-                else:
-                    # File is directly in parent folder - extract series name from filename
-                    # Remove "WATCHED" prefix and extract series name before season info
-                    filename_clean = file_path.stem
-                    filename_clean = re.sub(r'^WATCHED\s+', '', filename_clean, flags=re.IGNORECASE)
-                    # Extract everything before the season/episode info
-                    series_name = re.sub(r'\s*[Ss]0?\d+[Ee]0?\d+.*$', '', filename_clean).strip()
-                
-                if not series_name:
-                    series_name = root_path.name
-                
-                # Clean up series name
-                series_name = clean_series_name(series_name)
-                
-                if not series_name or series_name.lower() in ('torrent', 'medialibrary'):
-                    continue
-                
-                if series_name not in series:
-                    series[series_name] = {}
-                
-                if season not in series[series_name]:
-                    series[series_name][season] = []
-                
-                file_info['season'] = season
-                file_info['episode'] = episode
-                series[series_name][season].append(file_info)
-            else:
-                # This is a standalone movie - skip featurettes/extras
-                if any(skip.lower() in file_path_str.lower() for skip in skip_folders):
-                    continue
-                
-                movies.append(file_info)
-    
-    # Sort episodes within each season
-    for series_name in series:
-        for season in series[series_name]:
-            series[series_name][season].sort(key=lambda x: x['episode'])
+            file_info['season'] = season
+            file_info['episode'] = episode
+            series[series_name][season].append(file_info)
+            if probe_key:
+                pending_probes.append((probe_key, series_name))
+        else:
+            # This is a standalone movie - skip featurettes/extras
+            if any(skip.lower() in file_path_str.lower() for skip in skip_folders):
+                continue
+            
+            movies.append(file_info)
+            if probe_key:
+                pending_probes.append((probe_key, None))
+
+def iter_library_files(library):
+    """Yield every episode and movie entry of a library"""
+    for seasons in library['series'].values():
+        for episodes in seasons.values():
+            yield from episodes
+    yield from library['movies']
+
+def file_media(file_info):
+    """Container metadata of a library file, including probes finished after the scan"""
+    return file_info['media'] or library_state['probed'].get(file_info['path']) or {}
+
+def progress_fields(file_info):
+    """Current progress fields of a library file, from the progress store"""
+    progress_info = progress_store.get(file_info['path'], file_info['fingerprint']) or {}
+    current_time = progress_info.get('position', 0)
+    duration = progress_info.get('duration') or file_media(file_info).get('duration') or 0
+    return {
+        'current_time': current_time,
+        'duration': duration,
+        'last_played': progress_info.get('last_played', None),
+        'completed': progress_info.get('completed', False),
+        'progress_percent': (current_time / duration * 100) if duration else 0
+    }
+
+# Latest completed scan, shared by all requests. The published library is
+# never modified: responses are built from copies (library_payload()) and
+# probe results are kept aside in 'probed', by path.
+library_lock = threading.Lock()
+library_state = {'library': None, 'files': {}, 'probed': {}, 'version': 0, 'scanned_at': None}
+
+# Scan jobs by id, oldest first
+scan_jobs = {}
+scan_jobs_lock = threading.Lock()
+
+# Fuzzy search over the published library, kept in sync by publish_library
+search_index = SearchIndex()
+
+# Offline title -> poster index, asked before the live cover APIs
+metadata_index = MetadataIndex(METADATA_DB_FILE)
+
+# Running aggregates for /api/stats, fed by publish_library, progress writes
+# and record_progress (watch activity)
+library_stats = LibraryStats(WATCH_ACTIVITY_FILE)
+progress_store.add_listener(library_stats.on_progress)
+
+# Metrics exposed on /metrics
+SCAN_PHASES = ('walk', 'stat', 'fingerprint', 'parse')
+SCAN_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+scan_duration = REGISTRY.histogram(
+    'medialibrary_scan_duration_seconds', 'Duration of library scans', buckets=SCAN_BUCKETS)
+scan_phase_duration = REGISTRY.histogram(
+    'medialibrary_scan_phase_seconds', 'Time spent per scan in each phase', ['phase'], buckets=SCAN_BUCKETS)
+request_duration = REGISTRY.histogram(
+    'medialibrary_http_request_duration_seconds', 'Request latency per endpoint', ['method', 'endpoint', 'status'])
+cover_lookup_duration = REGISTRY.histogram(
+    'medialibrary_cover_lookup_duration_seconds', 'Latency of cover provider requests', ['provider'])
+cover_lookups = REGISTRY.counter(
+    'medialibrary_cover_lookups_total', 'Cover provider requests by outcome (found, not_found, error)',
+    ['provider', 'result'])
+
+# Hits and misses of the covers cache, the other caches count their own
+covers_cache_stats = {'hits': 0, 'misses': 0}
+covers_cache_stats_lock = threading.Lock()
+
+def cache_stats():
+    """(hits, misses) of every cache"""
+    with covers_cache_stats_lock:
+        covers = (covers_cache_stats['hits'], covers_cache_stats['misses'])
+    return {
+        'progress': (progress_store.hits, progress_store.misses),
+        'covers': covers,
+        'probe': (probe_cache.hits, probe_cache.misses),
+        'fingerprint': (fingerprint_cache.hits, fingerprint_cache.misses),
+    }
+
+def cache_lookup_samples():
+    samples = {}
+    for cache, (hits, misses) in cache_stats().items():
+        samples[(cache, 'hit')] = hits
+        samples[(cache, 'miss')] = misses
+    return samples
+
+def cache_hit_ratio_samples():
+    return {(cache,): hits / (hits + misses) if hits + misses else 0.0
+            for cache, (hits, misses) in cache_stats().items()}
+
+def library_size_samples():
+    library = library_state['library'] or {'series': {}, 'movies': []}
+    return {
+        ('series',): len(library['series']),
+        ('seasons',): sum(len(seasons) for seasons in library['series'].values()),
+        ('episodes',): sum(len(eps) for seasons in library['series'].values() for eps in seasons.values()),
+        ('movies',): len(library['movies']),
+    }
+
+REGISTRY.counter('medialibrary_cache_lookups_total', 'Cache lookups by cache and result',
+                 ['cache', 'result'], callback=cache_lookup_samples)
+REGISTRY.gauge('medialibrary_cache_hit_ratio', 'Fraction of cache lookups that were hits',
+               ['cache'], callback=cache_hit_ratio_samples)
+REGISTRY.gauge('medialibrary_library_items', 'Size of the served library',
+               ['kind'], callback=library_size_samples)
+REGISTRY.gauge('medialibrary_library_version', 'Version counter of the served library',
+               callback=lambda: library_state['version'])
+REGISTRY.gauge('medialibrary_probe_queue', 'Files waiting for a container header probe',
+               callback=lambda: probe_scheduler.pending())
+REGISTRY.gauge('medialibrary_metadata_titles', 'Titles in the offline metadata index',
+               callback=lambda: metadata_index.count())
+
+def bump_library_version():
+    """Mark the served library as changed"""
+    with library_lock:
+        library_state['version'] += 1
+        return library_state['version']
+
+def publish_library(library):
+    """Make a completed scan the library served by the API"""
+    files = {file_info['path']: file_info for file_info in iter_library_files(library)}
+    with library_lock:
+        # Probes finished while the scan ran are still needed for files it found unprobed
+        probed = {path: media_info for path, media_info in library_state['probed'].items()
+                  if path in files and not files[path]['media']}
+        library_state['library'] = library
+        library_state['files'] = files
+        library_state['probed'] = probed
+        library_state['scanned_at'] = datetime.now().isoformat()
+        library_state['version'] += 1
     
-    # Sort movies by name
-    movies.sort(key=lambda x: x['name'])
+    library_stats.apply_library(library, MEDIA_FOLDER)
     
-    return {'series': series, 'movies': movies}
+    started = time.perf_counter()
+    added, removed, changed = search_index.update(search_documents(library))
+    print(f"[SEARCH] Index updated in {(time.perf_counter() - started) * 1000:.0f}ms: "
+          f"{added} added, {removed} removed, {changed} changed, {len(search_index)} entries")
+
+def search_documents(library):
+    """Searchable text and result payload of every series, episode and movie"""
+    documents = {}
+    for series_name, seasons in library['series'].items():
+        documents[f"series:{series_name}"] = (series_name, {'kind': 'series', 'title': series_name})
+        for season_num, episodes in seasons.items():
+            for episode in episodes:
+                code = f"S{season_num:02d}E{episode['episode']:02d}"
+                documents[episode['path']] = (f"{series_name} {code} {episode['name']}", {
+                    'kind': 'episode',
+                    'title': f"{series_name} - {code}",
+                    'series': series_name,
+                    'season': season_num,
+                    'episode': episode['episode'],
+                    'path': episode['path'],
+                })
+    for movie in library['movies']:
+        documents[movie['path']] = (movie['name'], {'kind': 'movie', 'title': movie['name'], 'path': movie['path']})
+    return documents
+
+def run_scan_job(job):
+    """Thread body of a scan job"""
+    try:
+        result = scan_media_library(job)
+        if job.cancel_requested:
+            job.state = 'cancelled'
+        else:
+            job.result = result
+            publish_library(result)
+            job.state = 'completed'
+    except Exception as e:
+        print(f"[SCAN] Scan {job.id} failed: {e}")
+        job.error = str(e)
+        job.state = 'failed'
+    finally:
+        job.finished_at = time.time()
+        job.done.set()
+        print(f"[SCAN] Scan {job.id} {job.state}: {job.dirs_visited} folders, "
+              f"{job.files_classified} files in {job.elapsed():.2f}s")
+
+def start_scan_job():
+    """Start a background scan, or return the one already running"""
+    with scan_jobs_lock:
+        for job in scan_jobs.values():
+            if job.state == 'running':
+                return job
+
+        job = ScanJob()
+        scan_jobs[job.id] = job
+
+        # Forget the oldest finished jobs
+        finished = [job_id for job_id, j in scan_jobs.items() if j.state != 'running']
+        for job_id in finished[:max(0, len(scan_jobs) - SCAN_JOB_HISTORY)]:
+            del scan_jobs[job_id]
+
+    threading.Thread(target=run_scan_job, args=(job,), name=f"scan-{job.id[:8]}", daemon=True).start()
+    return job
+
+def get_current_library():
+    """Return the latest scanned library, scanning first if there is none yet"""
+    library = library_state['library']
+    if library is None:
+        job = start_scan_job()
+        job.wait()
+        library = library_state['library']
+        if library is None:
+            # The scan was cancelled or failed, fall back to an inline scan
+            library = scan_media_library()
+            publish_library(library)
+    return library
+
+def record_progress(video_path, position, duration, completed):
+    """Store and save the watch progress of a video, as reported by a player
+
+    Only these saves count as watch activity in the statistics.
+    """
+    fingerprint = fingerprint_for_path(video_path)
+    previous = progress_store.get(video_path, fingerprint)
+    record = {
+        'position': position,
+        'duration': duration,
+        'last_played': datetime.now().isoformat(),
+        'completed': completed
+    }
+    progress_store.set(video_path, record, fingerprint)
+    library_stats.on_playback(previous, record)
+    progress_store.save()
+    library_stats.save()
+    bump_library_version()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe the latency of every request, labelled by its route"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_duration.observe(time.perf_counter() - started, method=request.method,
+                                 endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.before_request
+def start_request_profiler():
+    """Start sampling if the client asked for this request to be profiled"""
+    if request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1':
+        g.profiler = SamplingProfiler(PROFILE_INTERVAL)
+        g.profiler.start()
+
+@app.after_request
+def save_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        response.headers['X-Profile-File'] = finish_profile(profiler, request.method, request.path)
+    return response
+
+@app.teardown_request
+def stop_failed_request_profile(error=None):
+    """Stop the profiler of a request that raised, after_request never ran for it"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        finish_profile(profiler, request.method, request.path)
+
+def finish_profile(profiler, method, path):
+    """Stop a request's profiler and save its samples, returns the file name
+
+    Shared with asgi_app.py, which profiles the routes it serves itself.
+    """
+    profiler.stop()
+    file_name = save_profile(profiler, PROFILE_DIR, f"{method} {path}", PROFILE_RETENTION)
+    print(f"[PROFILE] {method} {path}: {profiler.samples} samples "
+          f"in {profiler.duration * 1000:.0f}ms -> {PROFILE_DIR / file_name}")
+    return file_name
+
+@app.route('/metrics')
+def metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -283,40 +850,149 @@ def index():
 @app.route('/api/library')
 def get_library():
     """Get the complete media library with cover URLs"""
-    library = scan_media_library()
+    library = get_current_library()
     covers_cache = load_covers_cache()
+    titles = list(library_cover_titles(library))
+    missing = missing_covers(titles, covers_cache)
     
-    # Add cover URLs to series
-    for series_name in library['series']:
-        cache_key = f"series:{series_name}"
-        if cache_key not in covers_cache:
-            # Try to fetch cover image
-            cover_url = search_cover_image(series_name, 'series')
-            if cover_url:
-                covers_cache[cache_key] = cover_url
-        
-        cover_url = covers_cache.get(cache_key)
-        
-        # Add cover URL to all episodes in this series
-        for season_episodes in library['series'][series_name].values():
-            for episode in season_episodes:
-                episode['cover_url'] = cover_url
+    found = {}
+    for cache_key, title, media_type in missing:
+        cover_url = search_cover_image(title, media_type)
+        if cover_url:
+            found[cache_key] = cover_url
+    if found:
+        store_covers(found)
+        covers_cache.update(found)
+    count_covers_cache(len(titles) - len(missing), len(missing))
     
-    # Add cover URLs to movies
+    return jsonify(library_payload(library, cover_urls(titles, covers_cache)))
+
+def library_cover_titles(library):
+    """(cache key, title, media type, local poster, files) of every series and movie
+
+    Local posters come from the scan and are not checked again here (a stat
+    per title and request adds up on network shares), /api/artwork answers
+    404 for one deleted since.
+    """
+    for series_name, seasons in library['series'].items():
+        episodes = [episode for season_episodes in seasons.values() for episode in season_episodes]
+        yield f"series:{series_name}", series_name, 'series', series_local_poster(seasons), episodes
     for movie in library['movies']:
-        cache_key = f"movie:{movie['name']}"
-        if cache_key not in covers_cache:
-            # Try to fetch cover image
-            cover_url = search_cover_image(movie['name'], 'movie')
-            if cover_url:
-                covers_cache[cache_key] = cover_url
-        
-        movie['cover_url'] = covers_cache.get(cache_key)
+        yield f"movie:{movie['name']}", movie['name'], 'movie', movie['sidecars'].get('poster'), [movie]
+
+def missing_covers(titles, covers_cache):
+    """(cache key, title, media type) of titles with neither a local poster nor a cached cover"""
+    return [(cache_key, title, media_type) for cache_key, title, media_type, local_poster, _ in titles
+            if not local_poster and cache_key not in covers_cache]
+
+def cover_urls(titles, covers_cache):
+    """Cover URL by cache key, artwork shipped with the files winning over online covers"""
+    return {cache_key: artwork_url(local_poster) if local_poster else covers_cache.get(cache_key)
+            for cache_key, _, _, local_poster, _ in titles}
+
+def local_cover_url(cache_key):
+    """/api/artwork URL of the poster shipped with a library title, or None"""
+    for title_key, _, _, local_poster, _ in library_cover_titles(get_current_library()):
+        if title_key == cache_key:
+            return artwork_url(local_poster) if local_poster else None
+    return None
+
+def file_payload(file_info, cover_url):
+    """Copy of a library file with its current progress and cover"""
+    payload = dict(file_info, media=file_media(file_info), cover_url=cover_url)
+    payload.update(progress_fields(file_info))
+    return payload
+
+def library_payload(library, covers):
+    """Response of /api/library, built from copies so concurrent requests never share state"""
+    return {
+        'series': {
+            series_name: {
+                season_num: [file_payload(episode, covers.get(f"series:{series_name}")) for episode in episodes]
+                for season_num, episodes in seasons.items()
+            }
+            for series_name, seasons in library['series'].items()
+        },
+        'movies': [file_payload(movie, covers.get(f"movie:{movie['name']}")) for movie in library['movies']],
+        'version': library_state['version']
+    }
+
+def series_local_poster(seasons):
+    """Poster found in the folder of a series (or of one of its seasons)"""
+    for season_num in sorted(seasons):
+        for episode in seasons[season_num]:
+            poster = episode['sidecars'].get('folder_poster')
+            if poster:
+                return poster
+    return None
+
+def artwork_url(image_path):
+    """URL serving a local image through /api/artwork"""
+    return f"/api/artwork?path={quote(image_path)}"
+
+@app.route('/api/artwork')
+def get_artwork():
+    """Serve a poster or other image found next to the videos"""
+    image_path = request.args.get('path')
+    if not image_path:
+        return jsonify({'error': 'Image path required'}), 400
+    
+    image_file = Path(image_path).resolve()
+    if MEDIA_FOLDER.resolve() not in image_file.parents or image_file.suffix.lower() not in IMAGE_EXTENSIONS:
+        return jsonify({'error': 'Not an image in the media folder'}), 403
+    if not image_file.is_file():
+        return jsonify({'error': f'Image not found: {image_path}'}), 404
+    
+    return send_file(image_file, conditional=True, max_age=3600)
+
+@app.route('/api/scan', methods=['GET', 'POST'])
+def handle_scan():
+    """List scan jobs or start a new background scan
+
+    POST accepts an optional ``time_budget`` (seconds). The request then waits
+    up to that long and returns whatever the scan has found so far, so clients
+    can show results progressively while the job keeps running.
+    """
+    if request.method == 'GET':
+        with scan_jobs_lock:
+            jobs = list(scan_jobs.values())
+        return jsonify({'jobs': [job.to_dict() for job in jobs]})
+    
+    data = request.get_json(silent=True) or {}
+    time_budget = data.get('time_budget')
+    if time_budget is not None:
+        try:
+            time_budget = float(time_budget)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'time_budget must be a number of seconds'}), 400
     
-    # Save updated cache
-    save_covers_cache(covers_cache)
+    job = start_scan_job()
     
-    return jsonify(library)
+    if time_budget is None:
+        return jsonify(job.to_dict()), 202
+    
+    finished = job.wait(max(0.0, time_budget))
+    return jsonify(job.to_dict(include_results=True)), 200 if finished else 202
+
+@app.route('/api/scan/<job_id>')
+def scan_status(job_id):
+    """Get the progress of a scan job, optionally with the results found so far"""
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Scan job not found'}), 404
+    
+    include_results = request.args.get('results', '').lower() in ('1', 'true', 'yes')
+    return jsonify(job.to_dict(include_results=include_results))
+
+@app.route('/api/scan/<job_id>/cancel', methods=['POST'])
+def cancel_scan(job_id):
+    """Cancel a running scan job"""
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Scan job not found'}), 404
+    
+    job.cancel()
+    return jsonify(job.to_dict())
 
 @app.route('/api/play', methods=['POST'])
 def play_video():
@@ -362,6 +1038,21 @@ def play_video():
         print(f"[ERROR] Failed to launch VLC: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stream')
+def stream_video():
+    """Stream a video to the browser with HTTP range support"""
+    video_path = request.args.get('path')
+    if not video_path:
+        return jsonify({'error': 'Video path required'}), 400
+    
+    video_file = Path(video_path).resolve()
+    if MEDIA_FOLDER.resolve() not in video_file.parents or video_file.suffix.lower() not in VIDEO_EXTENSIONS:
+        return jsonify({'error': 'Not a video in the media folder'}), 403
+    if not video_file.is_file():
+        return jsonify({'error': f'Video not found: {video_path}'}), 404
+    
+    return stream_file_response(request, str(video_file))
+
 @app.route('/api/progress', methods=['POST'])
 def update_progress():
     """Update watch progress for a video"""
@@ -374,14 +1065,7 @@ def update_progress():
     if not video_path:
         return jsonify({'error': 'Video path required'}), 400
     
-    progress_data = load_progress()
-    progress_data[video_path] = {
-        'position': position,
-        'duration': duration,
-        'last_played': datetime.now().isoformat(),
-        'completed': completed
-    }
-    save_progress(progress_data)
+    record_progress(video_path, position, duration, completed)
     
     return jsonify({'success': True})
 
@@ -389,8 +1073,8 @@ def update_progress():
 def vlc_status():
     """Get VLC playback status"""
     try:
-        response = requests.get(
-            f'http://localhost:{VLC_HTTP_PORT}/requests/status.json',
+        response = http_get(
+            f'http://{VLC_HTTP_HOST}:{VLC_HTTP_PORT}/requests/status.json',
             auth=('', VLC_HTTP_PASSWORD),
             timeout=1
         )
@@ -401,13 +1085,9 @@ def vlc_status():
     except:
         return jsonify({'error': 'VLC not running'}), 503
 
-@app.route('/api/next-episode', methods=['POST'])
-def get_next_episode():
-    """Get the next episode in a series"""
-    data = request.json
-    current_path = data.get('path')
-    
-    library = scan_media_library()
+def find_next_episode(current_path):
+    """Return the episode following current_path in its series, or None"""
+    library = get_current_library()
     
     # Find current episode in series
     for series_name, seasons in library['series'].items():
@@ -417,14 +1097,26 @@ def get_next_episode():
                     # Found current episode, return next one
                     if idx + 1 < len(episodes):
                         # Next episode in same season
-                        return jsonify(episodes[idx + 1])
+                        return episodes[idx + 1]
                     else:
                         # Check next season
                         next_season = season_num + 1
                         if next_season in seasons and seasons[next_season]:
-                            return jsonify(seasons[next_season][0])
+                            return seasons[next_season][0]
+    
+    return None
+
+@app.route('/api/next-episode', methods=['POST'])
+def get_next_episode():
+    """Get the next episode in a series"""
+    data = request.json
+    current_path = data.get('path')
     
-    return jsonify({'error': 'No next episode found'}), 404
+    next_episode = find_next_episode(current_path)
+    if next_episode is None:
+        return jsonify({'error': 'No next episode found'}), 404
+    
+    return jsonify(next_episode)
 
 @app.route('/api/reset-progress', methods=['POST'])
 def reset_progress():
@@ -435,13 +1127,118 @@ def reset_progress():
     if not video_path:
         return jsonify({'error': 'Video path required'}), 400
     
-    progress_data = load_progress()
-    if video_path in progress_data:
-        del progress_data[video_path]
-        save_progress(progress_data)
+    if progress_store.delete(video_path, fingerprint_for_path(video_path)):
+        progress_store.save()
+        bump_library_version()
     
     return jsonify({'success': True})
 
+PROGRESS_BATCH_ACTIONS = ('watched', 'unwatched', 'reset')
+
+def batch_target_paths(data):
+    """Paths a batch request applies to: an explicit list, a series or one of its seasons
+
+    Only paths of the scanned library are returned, None if nothing matches.
+    """
+    library = get_current_library()
+    if data.get('paths'):
+        files = library_state['files']
+        return [path for path in data['paths'] if path in files] or None
+    
+    seasons = library['series'].get(data.get('series'))
+    if seasons is None:
+        return None
+    if data.get('season') is not None:
+        try:
+            season_episodes = [seasons.get(int(data['season']))]
+        except (TypeError, ValueError):
+            return None
+        if season_episodes[0] is None:
+            return None
+    else:
+        season_episodes = seasons.values()
+    return [episode['path'] for episodes in season_episodes for episode in episodes]
+
+@app.route('/api/progress/batch', methods=['POST'])
+def batch_progress():
+    """Mark many videos watched/unwatched or reset them with a single write
+
+    The body names an ``action`` and either ``paths`` (files of the library)
+    or a ``series`` (and optionally a ``season``). All records are written to progress.json at
+    once and the library version is bumped once.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON object required'}), 400
+    action = data.get('action')
+    if action not in PROGRESS_BATCH_ACTIONS:
+        return jsonify({'error': f"action must be one of {', '.join(PROGRESS_BATCH_ACTIONS)}"}), 400
+    
+    paths = data.get('paths')
+    if paths is not None and not (isinstance(paths, list) and all(isinstance(path, str) for path in paths)):
+        return jsonify({'error': 'paths must be a list of strings'}), 400
+    if not paths and not isinstance(data.get('series'), str):
+        return jsonify({'error': 'paths, or a series, required'}), 400
+    
+    paths = batch_target_paths(data)
+    if paths is None:
+        return jsonify({'error': 'Series, season or paths not found in the library'}), 404
+    
+    now = datetime.now().isoformat()
+    updates = []
+    for path in paths:
+        fingerprint = fingerprint_for_path(path)
+        if action == 'reset':
+            updates.append((path, None, fingerprint))
+            continue
+        
+        # Keep the known duration, so the progress bars stay meaningful
+        previous = progress_store.get(path, fingerprint) or {}
+        file_info = library_state['files'].get(path)  # None if a scan published meanwhile
+        media_info = file_media(file_info) if file_info else {}
+        duration = previous.get('duration') or media_info.get('duration') or 0
+        watched = action == 'watched'
+        updates.append((path, {
+            'position': duration if watched else 0,
+            'duration': duration,
+            'last_played': now,
+            'completed': watched
+        }, fingerprint))
+    
+    updated = progress_store.update_many(updates)
+    if updated:
+        progress_store.save()
+        version = bump_library_version()
+    else:
+        version = library_state['version']
+    print(f"[PROGRESS] Batch {action}: {updated} of {len(paths)} videos updated")
+    
+    return jsonify({'success': True, 'action': action, 'updated': updated, 'version': version})
+
+@app.route('/api/stats')
+def get_stats():
+    """Watch statistics and library totals per series and top-level folder"""
+    days = max(1, min(request.args.get('days', 30, type=int), 365))
+    get_current_library()
+    return jsonify(library_stats.snapshot(days))
+
+@app.route('/api/search')
+def search_library():
+    """Ranked, typo-tolerant search over series, movie and episode names"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    kinds = set(request.args.get('kind', '').split(',')) - {''}
+    
+    get_current_library()
+    started = time.perf_counter()
+    results = search_index.search(query, limit, kinds or None)
+    
+    return jsonify({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
 @app.route('/api/cover', methods=['GET', 'POST'])
 def handle_cover():
     """Get or set cover image for a title"""
@@ -452,18 +1249,23 @@ def handle_cover():
         if not title:
             return jsonify({'error': 'Title required'}), 400
         
-        covers_cache = load_covers_cache()
         cache_key = f"{media_type}:{title}"
+        # Artwork next to the files wins, like in /api/library, and is never cached
+        local_cover = local_cover_url(cache_key)
+        if local_cover:
+            return jsonify({'cover_url': local_cover})
         
+        covers_cache = load_covers_cache()
         if cache_key in covers_cache:
+            count_covers_cache(1, 0)
             return jsonify({'cover_url': covers_cache[cache_key]})
+        count_covers_cache(0, 1)
         
         # Try to find cover from TMDB or other sources
         cover_url = search_cover_image(title, media_type)
         
         if cover_url:
-            covers_cache[cache_key] = cover_url
-            save_covers_cache(covers_cache)
+            store_covers({cache_key: cover_url})
             return jsonify({'cover_url': cover_url})
         
         return jsonify({'cover_url': None})
@@ -477,76 +1279,94 @@ def handle_cover():
         if not title or not cover_url:
             return jsonify({'error': 'Title and cover_url required'}), 400
         
-        covers_cache = load_covers_cache()
-        cache_key = f"{media_type}:{title}"
-        covers_cache[cache_key] = cover_url
-        save_covers_cache(covers_cache)
+        store_covers({f"{media_type}:{title}": cover_url})
         
         return jsonify({'success': True})
 
-def search_cover_image(title, media_type='movie'):
-    """Search for cover image from online sources"""
-    try:
-        # Clean up title for searching
-        search_title = re.sub(r'\s*\(.*?\)$', '', title).strip()
-        
-        if media_type == 'series':
-            # Try TVMaze API for TV series (no key required)
-            try:
-                url = "https://api.tvmaze.com/singlesearch/shows"
-                params = {'q': search_title}
-                response = requests.get(url, params=params, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('image') and data['image'].get('medium'):
-                        # Return the larger image size
-                        return data['image']['medium'].replace('http://', 'https://')
-            except Exception as e:
-                print(f"[COVER] TVMaze error: {e}")
-        else:
-            # Try OpenLibrary/Google Books for better coverage
-            try:
-                # Use a simple approach with DuckDuckGo zero-click info
-                # Or use Open Library API
-                url = "https://openlibrary.org/search.json"
-                params = {
-                    'title': search_title,
-                    'limit': 1
-                }
-                response = requests.get(url, params=params, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('docs') and data['docs'][0].get('cover_i'):
-                        cover_id = data['docs'][0]['cover_i']
-                        return f"https://covers.openlibrary.org/b/id/{cover_id}-M.jpg"
-            except Exception as e:
-                print(f"[COVER] Open Library error: {e}")
-        
-        # Try TMDB API if key is available
-        if TMDB_API_KEY:
-            try:
-                endpoint = f"https://api.themoviedb.org/3/search/{media_type}"
-                params = {
-                    'api_key': TMDB_API_KEY,
-                    'query': search_title
-                }
-                response = requests.get(endpoint, params=params, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('results'):
-                        poster_path = data['results'][0].get('poster_path')
-                        if poster_path:
-                            return f"https://image.tmdb.org/t/p/w342{poster_path}"
-            except Exception as e:
-                print(f"[COVER] TMDB error: {e}")
-        
-        # No cover found
+def parse_tvmaze_cover(data):
+    image = data.get('image') or {}
+    if image.get('medium'):
+        return image['medium'].replace('http://', 'https://')
+    return None
+
+def parse_openlibrary_cover(data):
+    if data.get('docs') and data['docs'][0].get('cover_i'):
+        return f"https://covers.openlibrary.org/b/id/{data['docs'][0]['cover_i']}-M.jpg"
+    return None
+
+def parse_tmdb_cover(data):
+    if data.get('results') and data['results'][0].get('poster_path'):
+        return f"https://image.tmdb.org/t/p/w342{data['results'][0]['poster_path']}"
+    return None
+
+def cover_provider_requests(title, media_type):
+    """Provider lookups for a title, in the order they are tried
+
+    Each is (provider, url, params, parse), where parse turns the JSON
+    response into a cover URL or None. Shared with asgi_app.py, which sends
+    the same requests with an async client.
+    """
+    # Clean up title for searching
+    search_title = re.sub(r'\s*\(.*?\)$', '', title).strip()
+    if media_type == 'series':
+        # TVMaze needs no API key
+        lookups = [('tvmaze', f"{TVMAZE_API_URL}/singlesearch/shows", {'q': search_title}, parse_tvmaze_cover)]
+    else:
+        lookups = [('openlibrary', f"{OPENLIBRARY_API_URL}/search.json",
+                    {'title': search_title, 'limit': 1}, parse_openlibrary_cover)]
+    if TMDB_API_KEY:
+        lookups.append(('tmdb', f"{TMDB_API_URL}/search/{media_type}",
+                        {'api_key': TMDB_API_KEY, 'query': search_title}, parse_tmdb_cover))
+    return lookups
+
+def cover_provider_result(provider, status_code, load_json, parse):
+    """Cover URL from a provider response, counting the lookup's outcome"""
+    if status_code != 200:
+        cover_lookups.inc(provider=provider, result='error')
         return None
-    except Exception as e:
-        print(f"[COVER] Error searching for cover: {e}")
+    cover_url = parse(load_json())
+    cover_lookups.inc(provider=provider, result='found' if cover_url else 'not_found')
+    return cover_url
+
+def indexed_cover(title, media_type):
+    """Poster from the offline metadata index, counted like a provider lookup"""
+    if not metadata_index.available:
         return None
+    with cover_lookup_duration.time(provider='metadata_index'):
+        cover_url = metadata_index.lookup(title, media_type)
+    cover_lookups.inc(provider='metadata_index', result='found' if cover_url else 'not_found')
+    return cover_url
+
+def cover_provider_failed(provider, error):
+    cover_lookups.inc(provider=provider, result='error')
+    print(f"[COVER] {provider} error: {error}")
+
+def search_cover_image(title, media_type='movie'):
+    """Search for cover image from online sources
+
+    The offline metadata index is asked first, the live APIs only for titles
+    it does not know. Callers check local posters before this (cover_urls()
+    and local_cover_url()), so titles with artwork never reach the network.
+    """
+    cover_url = indexed_cover(title, media_type)
+    if cover_url:
+        return cover_url
+    
+    for provider, url, params, parse in cover_provider_requests(title, media_type):
+        try:
+            with cover_lookup_duration.time(provider=provider):
+                response = http_get(url, params=params, timeout=COVER_LOOKUP_TIMEOUT)
+            cover_url = cover_provider_result(provider, response.status_code, response.json, parse)
+            if cover_url:
+                return cover_url
+        except Exception as e:
+            cover_provider_failed(provider, e)
+    
+    # No cover found
+    return None
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     print(f"Media Library Server Starting...")
     print(f"Scanning folder: {MEDIA_FOLDER}")
     print(f"VLC Path: {VLC_PATH}")
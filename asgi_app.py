@@ -0,0 +1,237 @@
+"""
+Async serving mode (ASGI)
+
+    python asgi_app.py
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+The endpoints that wait on other servers run on the event loop:
+/api/vlc/status, GET /api/cover and /api/library. They share one pooled
+httpx.AsyncClient with timeouts, so a hung VLC or a slow cover provider
+holds a pending coroutine instead of a server thread, and the cover
+lookups of /api/library run concurrently. Scans, cache files and JSON
+encoding of the library are run in the default executor.
+
+Every other route is the Flask app from app.py, run in a thread pool by
+a2wsgi.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import time
+from urllib.parse import parse_qs
+
+import httpx
+from a2wsgi import WSGIMiddleware
+
+import app as backend
+from profiler import SamplingProfiler
+
+# Upstream connections kept open (VLC, cover providers)
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+HTTP_TIMEOUT = httpx.Timeout(backend.COVER_LOOKUP_TIMEOUT, connect=2)
+VLC_STATUS_TIMEOUT = 1
+# Cover provider requests in flight at once, over all clients
+COVER_LOOKUP_CONCURRENCY = 16
+# Threads running the Flask routes
+WSGI_WORKERS = 32
+
+async def run_blocking(func, *args):
+    """Run func in the default executor and await its result"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def prepare_library(library):
+    return list(backend.library_cover_titles(library)), backend.load_covers_cache()
+
+
+def finish_library(library, titles, covers_cache, found, misses):
+    """Store new covers and encode the /api/library response"""
+    if found:
+        backend.store_covers(found)
+    backend.count_covers_cache(len(titles) - misses, misses)
+    payload = backend.library_payload(library, backend.cover_urls(titles, covers_cache))
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+class MediaLibraryASGI:
+    """ASGI app serving the I/O-bound endpoints natively and the rest through Flask"""
+
+    def __init__(self, flask_app):
+        self.wsgi = WSGIMiddleware(flask_app, workers=WSGI_WORKERS)
+        self.client = None
+        self.cover_slots = None
+        # Lookups in flight by cache key, so concurrent requests share them
+        self._cover_tasks = {}
+        # Threads waiting on a scan job by job id, shared the same way
+        self._scan_waiters = {}
+        self.routes = {
+            ('GET', '/api/vlc/status'): self.vlc_status,
+            ('GET', '/api/cover'): self.get_cover,
+            ('GET', '/api/library'): self.get_library,
+        }
+
+    def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+            self.cover_slots = asyncio.Semaphore(COVER_LOOKUP_CONCURRENCY)
+
+    async def stop(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        self.start()
+        started = time.perf_counter()
+        query = {name: values[-1] for name, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        # Same opt-in profiling as the Flask routes (app.start_request_profiler)
+        profiler = None
+        if dict(scope['headers']).get(b'x-profile') == b'1' or query.get('profile') == '1':
+            profiler = SamplingProfiler(backend.PROFILE_INTERVAL)
+            profiler.start()
+        try:
+            status, payload = await handler(query)
+        except Exception as e:
+            print(f"[ASGI] {scope['method']} {scope['path']} failed: {e}")
+            status, payload = 500, {'error': 'Internal server error'}
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        headers = [(b'content-type', b'application/json'),
+                   (b'content-length', str(len(body)).encode()),
+                   (b'access-control-allow-origin', b'*')]
+        if profiler is not None:
+            file_name = await run_blocking(backend.finish_profile, profiler, scope['method'], scope['path'])
+            headers.append((b'x-profile-file', file_name.encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        backend.request_duration.observe(time.perf_counter() - started, method=scope['method'],
+                                         endpoint=scope['path'], status=status)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def vlc_status(self, query):
+        """Get VLC playback status"""
+        try:
+            response = await self.client.get(
+                f'http://{backend.VLC_HTTP_HOST}:{backend.VLC_HTTP_PORT}/requests/status.json',
+                auth=('', backend.VLC_HTTP_PASSWORD),
+                timeout=VLC_STATUS_TIMEOUT
+            )
+            if response.status_code != 200:
+                return 503, {'error': 'VLC not responding'}
+            return 200, response.json()
+        except (httpx.HTTPError, ValueError):
+            return 503, {'error': 'VLC not running'}
+
+    async def get_cover(self, query):
+        """Get the cover image for a title (setting one is handled by Flask)"""
+        title = query.get('title')
+        media_type = query.get('type', 'movie')
+        if not title:
+            return 400, {'error': 'Title required'}
+
+        cache_key = f"{media_type}:{title}"
+        covers_cache = await run_blocking(backend.load_covers_cache)
+        if cache_key in covers_cache:
+            backend.count_covers_cache(1, 0)
+            return 200, {'cover_url': covers_cache[cache_key]}
+        backend.count_covers_cache(0, 1)
+
+        cover_url = await self.lookup_cover(cache_key, title, media_type)
+        if cover_url:
+            await run_blocking(backend.store_covers, {cache_key: cover_url})
+        return 200, {'cover_url': cover_url}
+
+    async def get_library(self, query):
+        """Get the complete media library with cover URLs"""
+        library = await self.current_library()
+        titles, covers_cache = await run_blocking(prepare_library, library)
+        missing = backend.missing_covers(titles, covers_cache)
+
+        found = {}
+        if missing:
+            cover_urls = await asyncio.gather(*(self.lookup_cover(cache_key, title, media_type)
+                                                for cache_key, title, media_type in missing))
+            found = {cache_key: cover_url for (cache_key, _, _), cover_url in zip(missing, cover_urls) if cover_url}
+            covers_cache.update(found)
+        return 200, await run_blocking(finish_library, library, titles, covers_cache, found, len(missing))
+
+    async def current_library(self):
+        """The published library, waiting for a background scan if there is none yet"""
+        library = backend.library_state['library']
+        if library is not None:
+            return library
+
+        # Starting a job only starts its thread; one executor thread per job
+        # waits for it however many requests are waiting
+        job = backend.start_scan_job()
+        waiter = self._scan_waiters.get(job.id)
+        if waiter is None:
+            waiter = self._scan_waiters[job.id] = asyncio.ensure_future(run_blocking(job.wait))
+            waiter.add_done_callback(lambda _: self._scan_waiters.pop(job.id, None))
+        await asyncio.shield(waiter)
+
+        library = backend.library_state['library']
+        if library is None:
+            # The scan was cancelled or failed, Flask's fallback scans inline
+            library = await run_blocking(backend.get_current_library)
+        return library
+
+    async def lookup_cover(self, cache_key, title, media_type):
+        task = self._cover_tasks.get(cache_key)
+        if task is None:
+            task = self._cover_tasks[cache_key] = asyncio.ensure_future(self.search_cover_image(title, media_type))
+            task.add_done_callback(lambda _: self._cover_tasks.pop(cache_key, None))
+        # A client going away must not cancel a lookup other requests wait for
+        return await asyncio.shield(task)
+
+    async def search_cover_image(self, title, media_type):
+        """Async counterpart of app.search_cover_image() for titles without a local poster"""
+        cover_url = await run_blocking(backend.indexed_cover, title, media_type)
+        if cover_url:
+            return cover_url
+        async with self.cover_slots:
+            for provider, url, params, parse in backend.cover_provider_requests(title, media_type):
+                try:
+                    with backend.cover_lookup_duration.time(provider=provider):
+                        response = await self.client.get(url, params=params)
+                    cover_url = backend.cover_provider_result(provider, response.status_code, response.json, parse)
+                    if cover_url:
+                        return cover_url
+                except Exception as e:
+                    backend.cover_provider_failed(provider, e)
+        return None
+
+
+app = MediaLibraryASGI(backend.app)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    multiprocessing.freeze_support()
+    print(f"Media Library Server Starting (async mode)...")
+    print(f"Scanning folder: {backend.MEDIA_FOLDER}")
+    print(f"VLC Path: {backend.VLC_PATH}")
+    print(f"Open http://localhost:5000 in your browser")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Library benchmarks on synthetic media trees
+
+Times the hot paths of the backend on generated trees of 1k, 10k and 100k
+files: the full scan (cold and with warm caches), clean_series_name(),
+parse_episode_info(), /api/library serialization and /api/next-episode.
+Results are written as JSON so two runs can be compared:
+
+    python benchmarks/bench_library.py --sizes 1000 10000
+    python benchmarks/bench_library.py --sizes 1000 10000 --compare benchmarks/results/<earlier run>.json
+
+Cover lookups are answered from a pre-filled covers cache and header probing
+is disabled, so the numbers don't depend on the network or on worker processes.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import app as backend
+from bench_results import RESULTS_DIR, compare, git_revision, make_result
+from file_cache import FileMetadataCache
+from progress_store import ProgressStore
+from synthetic_tree import tree_for_file_count
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Fraction of files given watch progress before timing
+PROGRESS_RATIO = 0.1
+# Episodes looked up per /api/next-episode run
+NEXT_EPISODE_SAMPLES = 200
+
+
+def measure(func, repeat):
+    """Run func repeat times, returns the list of durations in seconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def use_temp_state(state_dir):
+    """Point every cache and progress file of the backend at state_dir"""
+    backend.PROBE_WORKERS = 0
+    backend.COVERS_CACHE_FILE = state_dir / 'covers_cache.json'
+    backend.probe_cache = FileMetadataCache(state_dir / 'probe_cache.json')
+    reset_fingerprint_cache(state_dir)
+    backend.progress_store = ProgressStore(state_dir / 'progress.json',
+                                           fingerprint_for=backend.fingerprint_for_path)
+
+
+def reset_fingerprint_cache(state_dir, keep_file=False):
+    cache_file = state_dir / 'fingerprint_cache.json'
+    if not keep_file and cache_file.exists():
+        cache_file.unlink()
+    backend.fingerprint_cache = FileMetadataCache(cache_file)
+
+
+def seed_progress(library, rng):
+    """Give a share of the files some watch progress"""
+    for file_info in backend.iter_library_files(library):
+        if rng.random() < PROGRESS_RATIO:
+            backend.progress_store.set(file_info['path'], {
+                'position': rng.randint(0, 2400),
+                'duration': 2700,
+                'last_played': datetime.now().isoformat(),
+                'completed': rng.random() < 0.3,
+            }, file_info['fingerprint'])
+    backend.progress_store.save()
+
+
+def seed_covers(library):
+    """Fill the covers cache so /api/library never goes to the network"""
+    covers = {f"series:{name}": f"https://covers.invalid/{i}.jpg"
+              for i, name in enumerate(library['series'])}
+    covers.update({f"movie:{movie['name']}": f"https://covers.invalid/m{i}.jpg"
+                   for i, movie in enumerate(library['movies'])})
+    backend.save_covers_cache(covers)
+
+
+def bench_size(file_count, repeat, seed):
+    """Run every benchmark on a tree of about file_count files"""
+    results = []
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory(prefix='medialib-bench-') as tmp:
+        tree_dir = Path(tmp) / 'media'
+        state_dir = Path(tmp) / 'state'
+        state_dir.mkdir()
+
+        started = time.perf_counter()
+        created = tree_for_file_count(tree_dir, file_count, depth=2, seed=seed)
+        print(f"[BENCH] Generated {len(created)} files in {time.perf_counter() - started:.1f}s")
+
+        backend.MEDIA_FOLDER = tree_dir
+        use_temp_state(state_dir)
+
+        # Scans: cold runs start without a fingerprint cache
+        def cold_scan():
+            reset_fingerprint_cache(state_dir)
+            backend.scan_media_library()
+        results.append(make_result('scan_media_library.cold', file_count, measure(cold_scan, repeat)))
+
+        def warm_scan():
+            reset_fingerprint_cache(state_dir, keep_file=True)
+            backend.scan_media_library()
+        results.append(make_result('scan_media_library.warm', file_count, measure(warm_scan, repeat)))
+
+        # Name parsing on the generated folder and file names
+        folder_names = sorted({path.parent.name for path in created} |
+                              {path.parent.parent.name for path in created})
+        results.append(make_result(
+            'clean_series_name', file_count,
+            measure(lambda: [backend.clean_series_name(name) for name in folder_names], repeat),
+            ops=len(folder_names)))
+
+        name_pairs = [(path.name, path.parent.name) for path in created]
+        results.append(make_result(
+            'parse_episode_info', file_count,
+            measure(lambda: [backend.parse_episode_info(name, parent) for name, parent in name_pairs], repeat),
+            ops=len(name_pairs)))
+
+        # API endpoints on a published library
+        library = backend.scan_media_library()
+        backend.publish_library(library)
+        seed_progress(library, rng)
+        seed_covers(library)
+        client = backend.app.test_client()
+
+        def get_library():
+            response = client.get('/api/library')
+            assert response.status_code == 200, response.status_code
+        results.append(make_result('get_library', file_count, measure(get_library, repeat)))
+
+        episodes = [ep for seasons in library['series'].values()
+                    for eps in seasons.values() for ep in eps]
+        samples = [ep['path'] for ep in rng.sample(episodes, min(NEXT_EPISODE_SAMPLES, len(episodes)))]
+
+        def next_episodes():
+            for path in samples:
+                client.post('/api/next-episode', json={'path': path})
+        results.append(make_result('get_next_episode', file_count,
+                                   measure(next_episodes, repeat), ops=len(samples)))
+
+    for result in results:
+        print(f"[BENCH] {result['name']:<26} {file_count:>7} files  "
+              f"min {result['min_s'] * 1000:9.1f} ms  per op {result['per_op_us']:10.1f} us")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the library backend on synthetic trees")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Tree sizes in files")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark, the fastest is reported")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/library-<time>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.extend(bench_size(size, args.repeat, args.seed))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"library-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'created': datetime.now().isoformat(),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'repeat': args.repeat,
+                'seed': args.seed,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"[BENCH] Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
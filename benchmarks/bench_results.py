@@ -0,0 +1,53 @@
+"""
+Result files shared by the benchmarks
+
+Every benchmark writes {'meta': ..., 'results': [...]} to benchmarks/results/
+with one make_result() entry per measurement, so any two runs of the same
+benchmark can be compared with compare(). Kept apart from the benchmarks so
+importing it doesn't import the backend (bench_startup.py times that).
+"""
+
+import json
+import statistics
+import subprocess
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def make_result(name, files, timings, ops=1):
+    """Summarize the timings of one benchmark; ops is the number of calls per run"""
+    best = min(timings)
+    return {
+        'name': name,
+        'files': files,
+        'repeat': len(timings),
+        'ops': ops,
+        'min_s': best,
+        'median_s': statistics.median(timings),
+        'per_op_us': best / ops * 1e6,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous_file, results):
+    """Print how each result changed against an earlier run"""
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = {(r['name'], r['files']): r for r in json.load(f)['results']}
+
+    print(f"\n{'benchmark':<26} {'files':>7} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for result in results:
+        before = previous.get((result['name'], result['files']))
+        if before is None:
+            continue
+        change = (result['min_s'] - before['min_s']) / before['min_s'] * 100 if before['min_s'] else 0
+        print(f"{result['name']:<26} {result['files']:>7} {before['min_s'] * 1000:>11.1f} "
+              f"{result['min_s'] * 1000:>11.1f} {change:>+7.1f}%")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Startup benchmarks: import time and time-to-interactive
+
+Every measurement runs in a fresh interpreter, so nothing is already imported
+or cached in memory:
+
+- import.<module>: time to import app, asgi_app, desktop_app and the heavy
+  libraries they (lazily) use, without interpreter startup
+- server.listening: from spawning a server process to the first answer on /
+- server.interactive: from spawning it to the first /api/library response,
+  i.e. until the web UI could paint the library (warm caches, like a restart)
+- desktop.painted: from launching desktop_app.py until the web view reports
+  the library painted (only where PyQt6 is installed; uses the real media
+  folder)
+
+Results are written as JSON and can be compared like bench_library.py:
+
+    python benchmarks/bench_startup.py --files 10000
+    python benchmarks/bench_startup.py --compare benchmarks/results/<earlier run>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+# Neither imports the backend, which is only ever imported by the child processes
+from bench_results import RESULTS_DIR, compare, git_revision, make_result
+from synthetic_tree import tree_for_file_count
+
+# Modules whose import time is tracked; missing optional ones are skipped
+IMPORT_MODULES = ('app', 'asgi_app', 'desktop_app', 'requests', 'vlc')
+# Seconds to wait for a server or the desktop app before giving up
+STARTUP_TIMEOUT = 120
+# How often the server is polled while it starts (seconds)
+POLL_INTERVAL = 0.005
+
+
+def time_import(module):
+    """Seconds to import module in a fresh interpreter, None if it can't be imported"""
+    code = (f"import time; started = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - started)")
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def configure_backend(backend, tree_dir, state_dir):
+    """Serve tree_dir with all state in state_dir and no network access"""
+    from file_cache import FileMetadataCache
+    from metadata_index import MetadataIndex
+    from progress_store import ProgressStore
+
+    backend.MEDIA_FOLDER = Path(tree_dir)
+    backend.PROBE_WORKERS = 0
+    backend.COVERS_CACHE_FILE = Path(state_dir) / 'covers_cache.json'
+    backend.probe_cache = FileMetadataCache(Path(state_dir) / 'probe_cache.json')
+    backend.fingerprint_cache = FileMetadataCache(Path(state_dir) / 'fingerprint_cache.json')
+    backend.progress_store = ProgressStore(Path(state_dir) / 'progress.json',
+                                           fingerprint_for=backend.fingerprint_for_path)
+    backend.metadata_index = MetadataIndex(Path(state_dir) / 'metadata.db')
+    # Nothing listens on the discard port, so a missed cover fails at once
+    backend.TVMAZE_API_URL = backend.OPENLIBRARY_API_URL = 'http://127.0.0.1:9'
+    backend.TMDB_API_KEY = None
+
+
+def child_prepare(tree_dir, state_dir):
+    """Scan once and fill the caches, so the timed runs start like a restart"""
+    sys.path.insert(0, str(REPO_DIR))
+    import app as backend
+
+    configure_backend(backend, tree_dir, state_dir)
+    library = backend.scan_media_library()
+    covers = {cache_key: 'https://covers.invalid/cover.jpg'
+              for cache_key, *_ in backend.library_cover_titles(library)}
+    backend.save_covers_cache(covers)
+    backend.fingerprint_cache.save()
+
+
+def child_serve(tree_dir, state_dir, port):
+    """Import the backend and serve it like app.py does (the timed part)"""
+    sys.path.insert(0, str(REPO_DIR))
+    import app as backend
+    from werkzeug.serving import make_server
+
+    configure_backend(backend, tree_dir, state_dir)
+    backend.start_scan_job()
+    make_server('127.0.0.1', port, backend.app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, started, deadline):
+    """Poll url until it answers 200, returns seconds since started"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=STARTUP_TIMEOUT) as response:
+                response.read()
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"{url} did not answer within {STARTUP_TIMEOUT}s")
+
+
+def time_server_startup(tree_dir, state_dir):
+    """(seconds until / answers, seconds until /api/library answers) for one server start"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, __file__, '--child-serve', str(tree_dir), str(state_dir), str(port)],
+                               cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + STARTUP_TIMEOUT
+        listening = wait_for(f"{base_url}/", started, deadline)
+        interactive = wait_for(f"{base_url}/api/library", started, deadline)
+    finally:
+        process.terminate()
+        process.wait()
+    return listening, interactive
+
+
+def time_desktop_startup():
+    """(seconds until the library is painted, as reported by the app) or None without PyQt6"""
+    env = dict(os.environ, MEDIALIBRARY_QUIT_AFTER_PAINT='1')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        result = subprocess.run([sys.executable, 'desktop_app.py'], cwd=REPO_DIR, env=env,
+                                capture_output=True, text=True, timeout=STARTUP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return None
+    match = re.search(r'\[STARTUP\] Library painted (\d+) ms', result.stdout)
+    return int(match.group(1)) / 1000 if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time and time-to-interactive")
+    parser.add_argument('--files', type=int, default=10000, help="Size of the synthetic tree the server starts on")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per benchmark, the fastest is reported")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--desktop', action='store_true', help="Also time desktop_app.py on the real media folder")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/startup-<time>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--child-prepare', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--child-serve', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_prepare:
+        child_prepare(*args.child_prepare)
+        return 0
+    if args.child_serve:
+        child_serve(args.child_serve[0], args.child_serve[1], int(args.child_serve[2]))
+        return 0
+
+    results = []
+    for module in IMPORT_MODULES:
+        timings = [time_import(module) for _ in range(args.repeat)]
+        if None in timings:
+            print(f"[BENCH] import {module}: not importable here, skipped")
+            continue
+        results.append(make_result(f"import.{module}", 0, timings))
+
+    with tempfile.TemporaryDirectory(prefix='medialib-startup-') as tmp:
+        tree_dir = Path(tmp) / 'media'
+        state_dir = Path(tmp) / 'state'
+        state_dir.mkdir()
+        created = tree_for_file_count(tree_dir, args.files, seed=args.seed)
+        subprocess.run([sys.executable, __file__, '--child-prepare', str(tree_dir), str(state_dir)],
+                       cwd=REPO_DIR, check=True, stdout=subprocess.DEVNULL)
+        runs = [time_server_startup(tree_dir, state_dir) for _ in range(args.repeat)]
+        results.append(make_result('server.listening', len(created), [listening for listening, _ in runs]))
+        results.append(make_result('server.interactive', len(created), [interactive for _, interactive in runs]))
+
+    if args.desktop:
+        timings = [time_desktop_startup() for _ in range(args.repeat)]
+        if None in timings:
+            print("[BENCH] desktop: PyQt6 missing or the library was never painted, skipped")
+        else:
+            results.append(make_result('desktop.painted', 0, timings))
+
+    for result in results:
+        print(f"[BENCH] {result['name']:<22} {result['files']:>7} files  "
+              f"min {result['min_s'] * 1000:8.1f} ms  median {result['median_s'] * 1000:8.1f} ms")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"startup-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'created': datetime.now().isoformat(),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'repeat': args.repeat,
+                'files': args.files,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"[BENCH] Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
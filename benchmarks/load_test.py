@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+HTTP load test of the backend with local stand-ins for VLC and cover APIs
+
+Serves the Flask app on a threaded Werkzeug server (or asgi_app.py on
+uvicorn with --server asgi) over a synthetic media tree and drives it from
+many concurrent clients:
+
+- player tabs poll /api/vlc/status and post /api/progress every few polls
+- library tabs reload /api/library
+
+VLC's HTTP interface and the TVMaze, OpenLibrary and TMDB APIs are replaced
+by one local fake server with configurable latency and failure rates, so
+runs are repeatable and never touch the network. The report lists request
+count, throughput and p50/p95/p99 latency per endpoint:
+
+    python benchmarks/load_test.py --players 20 --library-tabs 4 --duration 30
+    python benchmarks/load_test.py --vlc-latency 50 --cover-failure-rate 0.2 --output load.json
+    python benchmarks/load_test.py --server asgi --players 200 --vlc-latency 500
+"""
+
+import argparse
+import base64
+import json
+import logging
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from werkzeug.serving import make_server
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import app as backend
+from file_cache import FileMetadataCache
+from metadata_index import MetadataIndex
+from progress_store import ProgressStore
+from stats import LibraryStats
+from synthetic_tree import tree_for_file_count
+
+PERCENTILES = (50, 95, 99)
+
+
+class FakeUpstream:
+    """Answers VLC status and cover search requests with simulated latency and failures"""
+
+    def __init__(self, vlc_latency=0.005, vlc_failure_rate=0.0,
+                 cover_latency=0.1, cover_failure_rate=0.0, seed=42):
+        self.vlc_latency = vlc_latency
+        self.vlc_failure_rate = vlc_failure_rate
+        self.cover_latency = cover_latency
+        self.cover_failure_rate = cover_failure_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.position = 0
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                upstream.handle(self)
+
+        return Handler
+
+    def _roll(self, failure_rate):
+        with self.rng_lock:
+            return self.rng.random() < failure_rate
+
+    def _sleep(self, latency):
+        if latency:
+            with self.rng_lock:
+                # +-50% jitter around the configured latency
+                delay = latency * self.rng.uniform(0.5, 1.5)
+            time.sleep(delay)
+
+    def handle(self, handler):
+        url = urlparse(handler.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/requests/status.json':
+            service, latency, failure_rate = 'vlc', self.vlc_latency, self.vlc_failure_rate
+        else:
+            service, latency, failure_rate = 'covers', self.cover_latency, self.cover_failure_rate
+        self.counts[service] += 1
+        self._sleep(latency)
+
+        if self._roll(failure_rate):
+            self._send(handler, 500, {'error': 'simulated failure'})
+            return
+
+        if service == 'vlc':
+            expected = 'Basic ' + base64.b64encode(f":{backend.VLC_HTTP_PASSWORD}".encode()).decode()
+            if handler.headers.get('Authorization') != expected:
+                self._send(handler, 401, {'error': 'unauthorized'})
+                return
+            self.position += 1
+            self._send(handler, 200, {'state': 'playing', 'time': self.position % 2700,
+                                      'length': 2700, 'position': (self.position % 2700) / 2700})
+        elif url.path == '/singlesearch/shows':
+            self._send(handler, 200, {'name': query.get('q'),
+                                      'image': {'medium': f"http://covers.invalid/tv/{abs(hash(query.get('q')))}.jpg"}})
+        elif url.path == '/search.json':
+            self._send(handler, 200, {'docs': [{'title': query.get('title'), 'cover_i': abs(hash(query.get('title'))) % 10**7}]})
+        elif url.path.startswith('/search/'):
+            self._send(handler, 200, {'results': [{'poster_path': f"/{abs(hash(query.get('query')))}.jpg"}]})
+        else:
+            self._send(handler, 404, {'error': 'not found'})
+
+    def _send(self, handler, status, payload):
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-upstream', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def point_backend_at(upstream, tree_dir, state_dir):
+    """Serve tree_dir, keep all state in state_dir and use the fake upstream"""
+    backend.MEDIA_FOLDER = tree_dir
+    backend.PROBE_WORKERS = 0
+    backend.COVERS_CACHE_FILE = state_dir / 'covers_cache.json'
+    backend.probe_cache = FileMetadataCache(state_dir / 'probe_cache.json')
+    backend.fingerprint_cache = FileMetadataCache(state_dir / 'fingerprint_cache.json')
+    backend.progress_store = ProgressStore(state_dir / 'progress.json',
+                                           fingerprint_for=backend.fingerprint_for_path)
+    # Simulated playback must not add watch time to the real activity file
+    backend.library_stats = LibraryStats(state_dir / 'watch_activity.json')
+    backend.progress_store.add_listener(backend.library_stats.on_progress)
+    # An empty index, so a real metadata.db can't answer lookups meant for the fake upstream
+    backend.metadata_index = MetadataIndex(state_dir / 'metadata.db')
+    backend.VLC_HTTP_HOST = '127.0.0.1'
+    backend.VLC_HTTP_PORT = upstream.port
+    backend.TVMAZE_API_URL = upstream.url
+    backend.OPENLIBRARY_API_URL = upstream.url
+    backend.TMDB_API_URL = upstream.url
+    backend.TMDB_API_KEY = 'load-test'
+
+
+class Recorder:
+    """Latencies and status codes per endpoint, shared by all client threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def timed(self, endpoint, send):
+        started = time.perf_counter()
+        try:
+            status = send().status_code
+        except requests.RequestException:
+            status = 'error'
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+
+
+def player_tab(base_url, recorder, stop, paths, poll_interval, progress_every, seed):
+    """Poll VLC status like the web UI does and save progress every few polls"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    path = rng.choice(paths)
+    position = 0
+    polls = 0
+    while not stop.is_set():
+        recorder.timed('GET /api/vlc/status', lambda: session.get(f"{base_url}/api/vlc/status", timeout=10))
+        polls += 1
+        if polls % progress_every == 0:
+            position += 10
+            recorder.timed('POST /api/progress', lambda: session.post(
+                f"{base_url}/api/progress",
+                json={'path': path, 'position': position, 'duration': 2700, 'completed': False},
+                timeout=10))
+            if rng.random() < 0.05:
+                path = rng.choice(paths)
+                position = 0
+        if poll_interval:
+            stop.wait(poll_interval)
+
+
+def library_tab(base_url, recorder, stop, reload_interval):
+    """Reload the whole library over and over"""
+    session = requests.Session()
+    while not stop.is_set():
+        recorder.timed('GET /api/library', lambda: session.get(f"{base_url}/api/library", timeout=60))
+        if reload_interval:
+            stop.wait(reload_interval)
+
+
+def start_server(kind):
+    """Serve the backend in a background thread, returns (base URL, shutdown function)"""
+    if kind == 'asgi':
+        import uvicorn
+        import asgi_app
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        server = uvicorn.Server(uvicorn.Config(asgi_app.app, log_level='warning'))
+        thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, name='backend', daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+
+        def shutdown():
+            server.should_exit = True
+            thread.join()
+        return f"http://127.0.0.1:{sock.getsockname()[1]}", shutdown
+
+    # Keep the per-request access log out of the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='backend', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_report(recorder, duration):
+    report = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        latencies = sorted(latencies)
+        entry = {
+            'requests': len(latencies),
+            'throughput_rps': len(latencies) / duration if duration else 0,
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'statuses': {str(status): count for status, count in recorder.statuses[endpoint].items()},
+        }
+        for percent in PERCENTILES:
+            entry[f"p{percent}_ms"] = percentile(latencies, percent) * 1000
+        report[endpoint] = entry
+    return report
+
+
+def print_report(report, duration):
+    print(f"\n{'endpoint':<22} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for endpoint, entry in report.items():
+        statuses = ' '.join(f"{status}:{count}" for status, count in sorted(entry['statuses'].items()))
+        print(f"{endpoint:<22} {entry['requests']:>9} {entry['throughput_rps']:>8.1f} "
+              f"{entry['p50_ms']:>9.1f} {entry['p95_ms']:>9.1f} {entry['p99_ms']:>9.1f}  {statuses}")
+    total = sum(entry['requests'] for entry in report.values())
+    print(f"{'total':<22} {total:>9} {total / duration if duration else 0:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend with fake VLC and cover APIs")
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask',
+                        help="Threaded Werkzeug server or asgi_app.py on uvicorn")
+    parser.add_argument('--files', type=int, default=2000, help="Size of the synthetic media tree")
+    parser.add_argument('--players', type=int, default=20, help="Tabs polling VLC status and saving progress")
+    parser.add_argument('--library-tabs', type=int, default=4, help="Tabs reloading /api/library")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds to run the load for")
+    parser.add_argument('--poll-interval', type=float, default=0.5, help="Seconds between status polls (0 = no pause)")
+    parser.add_argument('--progress-every', type=int, default=5, help="Post progress every N status polls")
+    parser.add_argument('--reload-interval', type=float, default=1.0, help="Seconds between library reloads")
+    parser.add_argument('--vlc-latency', type=float, default=5, help="Fake VLC response time in ms")
+    parser.add_argument('--vlc-failure-rate', type=float, default=0.0, help="Fraction of VLC requests that fail")
+    parser.add_argument('--cover-latency', type=float, default=100, help="Fake cover API response time in ms")
+    parser.add_argument('--cover-failure-rate', type=float, default=0.0, help="Fraction of cover lookups that fail")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(vlc_latency=args.vlc_latency / 1000, vlc_failure_rate=args.vlc_failure_rate,
+                            cover_latency=args.cover_latency / 1000, cover_failure_rate=args.cover_failure_rate,
+                            seed=args.seed)
+    upstream.start()
+
+    with tempfile.TemporaryDirectory(prefix='medialib-load-') as tmp:
+        tree_dir = Path(tmp) / 'media'
+        state_dir = Path(tmp) / 'state'
+        state_dir.mkdir()
+        created = tree_for_file_count(tree_dir, args.files, depth=2, seed=args.seed)
+        paths = [str(path) for path in created]
+        point_backend_at(upstream, tree_dir, state_dir)
+
+        base_url, shutdown = start_server(args.server)
+        print(f"[LOAD] {args.server} backend on {base_url}, fake upstream on {upstream.url}, {len(created)} files")
+
+        # Publish a library first so the clients measure serving, not the first scan
+        backend.start_scan_job().wait()
+
+        recorder = Recorder()
+        stop = threading.Event()
+        threads = [threading.Thread(target=player_tab, daemon=True,
+                                    args=(base_url, recorder, stop, paths, args.poll_interval,
+                                          args.progress_every, args.seed + i))
+                   for i in range(args.players)]
+        threads += [threading.Thread(target=library_tab, daemon=True,
+                                     args=(base_url, recorder, stop, args.reload_interval))
+                    for _ in range(args.library_tabs)]
+
+        print(f"[LOAD] {args.players} player tabs, {args.library_tabs} library tabs for {args.duration:.0f}s")
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        shutdown()
+        upstream.stop()
+
+    report = build_report(recorder, elapsed)
+    print_report(report, elapsed)
+    print(f"[LOAD] Upstream requests: {dict(upstream.counts)}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'duration_s': elapsed, 'endpoints': report,
+                       'upstream_requests': dict(upstream.counts)}, f, indent=2)
+        print(f"[LOAD] Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
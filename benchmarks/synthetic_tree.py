@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Synthetic media tree generator for benchmarks
+
+Creates a folder structure that looks like a real download folder: series
+folders with release-name noise (quality, codec, tracker tags), season
+subfolders, loose episodes, movies, extras/featurettes that the scanner must
+skip, and optional category folders to add depth. Each file only holds its
+own path (padded to a sparse file of a given size if asked), so even 100k-file
+trees are cheap to build and every file still has its own fingerprint.
+
+Run: python benchmarks/synthetic_tree.py <output folder> --series 100 --seasons 3 --episodes 10
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+WORDS = [
+    'Dark', 'Silent', 'Broken', 'Crown', 'City', 'Night', 'River', 'Empire', 'Station',
+    'Signal', 'House', 'Garden', 'Frontier', 'Machine', 'Winter', 'Harbor', 'Code',
+    'Shadow', 'Line', 'Orbit', 'Desert', 'Court', 'Glass', 'Echo', 'Valley', 'Storm',
+]
+QUALITIES = ['720p', '1080p', '2160p', '480p']
+SOURCES = ['WEBRip', 'BluRay', 'HDTV', 'WEB-DL', 'DVDRip', 'BRRip']
+CODECS = ['x264', 'x265', 'HEVC', 'H.264', '10bit']
+AUDIO = ['AAC', 'EAC3', 'DDP5.1', 'DTS', 'FLAC']
+PROVIDERS = ['NF', 'AMZN', '']
+GROUPS = ['RARBG', 'GalaxyTV', 'AGLET', 'NTb', 'MeGusta', 'ION10']
+TRACKERS = ['[eztv.re]', '[TGx]', '[EZTVx.to]', '(MeGusta)', '']
+EXTENSIONS = ['.mkv', '.mp4', '.mkv', '.avi', '.mp4', '.m4v']
+SKIP_FOLDERS = ['Featurettes', 'EXTRAS', 'Specials']
+CATEGORIES = ['TV', 'Movies', 'Anime', 'Documentaries2', 'Kids', 'Archive']
+
+
+def release_noise(rng):
+    """A random quality/codec/group suffix like '1080p.WEBRip.x265-RARBG[eztv.re]'"""
+    parts = [rng.choice(QUALITIES)]
+    provider = rng.choice(PROVIDERS)
+    if provider:
+        parts.append(provider)
+    parts += [rng.choice(SOURCES), rng.choice(AUDIO), rng.choice(CODECS)]
+    return '.'.join(parts) + '-' + rng.choice(GROUPS) + rng.choice(TRACKERS)
+
+
+def title(rng, words=None):
+    return '.'.join(rng.sample(WORDS, words or rng.randint(1, 3)))
+
+
+def create_file(path, file_size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        # Distinct content per file, identical files would share one fingerprint
+        f.write(str(path).encode('utf-8'))
+        if file_size:
+            f.truncate(file_size)
+
+
+def generate_media_tree(root, series=50, seasons=3, episodes=10, movies=100, depth=1,
+                        extras_ratio=0.1, file_size=0, seed=42):
+    """Create a synthetic media tree under root, returns the list of video files created
+
+    depth is the number of folder levels above each series or movie folder
+    (1 puts them directly under root). extras_ratio is the fraction of series
+    and movies that get an extras folder the scanner should skip.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    created = []
+
+    def parent_folder():
+        folder = root
+        for _ in range(depth - 1):
+            folder = folder / rng.choice(CATEGORIES)
+        return folder
+
+    for index in range(series):
+        name = f"{title(rng)}.{index}"
+        year = rng.randint(1990, 2025)
+        series_folder = parent_folder() / f"{name}.S01-S{seasons:02d}.COMPLETE.{release_noise(rng)}"
+        layout = rng.random()
+        for season in range(1, seasons + 1):
+            if layout < 0.6:
+                # Series/Season N/Show.SxxEyy...
+                season_folder = series_folder / f"Season {season}"
+            elif layout < 0.9:
+                # One folder per season pack
+                season_folder = parent_folder() / f"{name}.({year}).S{season:02d}.{release_noise(rng)}"
+            else:
+                # Loose episodes directly in the series folder
+                season_folder = series_folder
+            for episode in range(1, episodes + 1):
+                if rng.random() < 0.8:
+                    file_name = f"{name}.S{season:02d}E{episode:02d}.{release_noise(rng)}"
+                else:
+                    file_name = f"{name.replace('.', ' ')} {season}x{episode:02d} {title(rng, 2).replace('.', ' ')}"
+                path = season_folder / (file_name + rng.choice(EXTENSIONS))
+                create_file(path, file_size)
+                created.append(path)
+        if rng.random() < extras_ratio:
+            path = series_folder / rng.choice(SKIP_FOLDERS) / f"Behind.The.Scenes.{release_noise(rng)}.mkv"
+            create_file(path, file_size)
+            created.append(path)
+
+    for index in range(movies):
+        name = f"{title(rng)}.{index}.{rng.randint(1970, 2025)}"
+        movie_folder = parent_folder() / f"{name}.{release_noise(rng)}"
+        path = movie_folder / (f"{name}.{release_noise(rng)}" + rng.choice(EXTENSIONS))
+        create_file(path, file_size)
+        created.append(path)
+        if rng.random() < extras_ratio:
+            path = movie_folder / 'Featurettes' / f"Making.Of.{release_noise(rng)}.mp4"
+            create_file(path, file_size)
+            created.append(path)
+        if rng.random() < 0.3:
+            # Non-video files the scanner has to step over
+            create_file(movie_folder / f"{name}.nfo", 0)
+            create_file(movie_folder / 'RARBG.txt', 0)
+
+    return created
+
+
+def tree_for_file_count(root, file_count, seasons=3, episodes=10, movie_ratio=0.1, **kwargs):
+    """Generate a tree holding roughly file_count videos"""
+    movies = int(file_count * movie_ratio)
+    series = max(1, (file_count - movies) // (seasons * episodes))
+    return generate_media_tree(root, series=series, seasons=seasons, episodes=episodes,
+                               movies=movies, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic media tree")
+    parser.add_argument('output', help="Folder to create the tree in")
+    parser.add_argument('--series', type=int, default=50)
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--episodes', type=int, default=10)
+    parser.add_argument('--movies', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=1, help="Folder levels above each series/movie")
+    parser.add_argument('--extras-ratio', type=float, default=0.1, help="Fraction of titles with extras folders")
+    parser.add_argument('--file-size', type=int, default=0, help="Size of each (sparse) video file in bytes")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    created = generate_media_tree(args.output, series=args.series, seasons=args.seasons,
+                                  episodes=args.episodes, movies=args.movies, depth=args.depth,
+                                  extras_ratio=args.extras_ratio, file_size=args.file_size,
+                                  seed=args.seed)
+    print(f"Created {len(created)} video files under {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
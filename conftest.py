@@ -0,0 +1,67 @@
+"""
+Shared pytest fixtures
+
+The backend fixture points app.py at a temporary media folder and keeps
+all of its state files (progress, caches, profiles, metadata index) in
+tmp_path, with the cover APIs unreachable.
+"""
+
+import pytest
+
+# A manual script that scans the real media folder, not a test
+collect_ignore = ['test_scan.py']
+
+
+def write_video(path, size=4096):
+    """Create a small fake video whose content depends on its name"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pattern = path.name.encode()
+    path.write_bytes((pattern * (size // len(pattern) + 1))[:size])
+    return path
+
+
+@pytest.fixture
+def media_tree(tmp_path):
+    """A series with two seasons and two movies"""
+    root = tmp_path / 'media'
+    write_video(root / 'Breaking Bad' / 'Season 1' / 'Breaking.Bad.S01E01.mkv')
+    write_video(root / 'Breaking Bad' / 'Season 1' / 'Breaking.Bad.S01E02.mkv')
+    write_video(root / 'Breaking Bad' / 'Season 2' / 'Breaking.Bad.S02E01.mkv')
+    write_video(root / 'Heat.1995.1080p.BluRay.mkv')
+    write_video(root / 'Inception.mp4')
+    return root
+
+
+@pytest.fixture
+def backend(tmp_path, media_tree, monkeypatch):
+    """app.py serving media_tree with every state file in tmp_path"""
+    import app
+    from file_cache import FileMetadataCache
+    from metadata_index import MetadataIndex
+    from progress_store import ProgressStore
+    from stats import LibraryStats
+
+    state_dir = tmp_path / 'state'
+    state_dir.mkdir()
+    progress_store = ProgressStore(state_dir / 'progress.json', fingerprint_for=app.fingerprint_for_path)
+    library_stats = LibraryStats(state_dir / 'watch_activity.json')
+    progress_store.add_listener(library_stats.on_progress)
+
+    monkeypatch.setattr(app, 'MEDIA_FOLDER', media_tree)
+    monkeypatch.setattr(app, 'PROBE_WORKERS', 0)
+    monkeypatch.setattr(app, 'COVERS_CACHE_FILE', state_dir / 'covers_cache.json')
+    monkeypatch.setattr(app, 'PROFILE_DIR', state_dir / 'profiles')
+    monkeypatch.setattr(app, 'fingerprint_cache', FileMetadataCache(state_dir / 'fingerprint_cache.json'))
+    monkeypatch.setattr(app, 'probe_cache', FileMetadataCache(state_dir / 'probe_cache.json'))
+    monkeypatch.setattr(app, 'progress_store', progress_store)
+    monkeypatch.setattr(app, 'library_stats', library_stats)
+    monkeypatch.setattr(app, 'metadata_index', MetadataIndex(state_dir / 'metadata.db'))
+    monkeypatch.setattr(app, 'library_state',
+                        {'library': None, 'files': {}, 'probed': {}, 'version': 0, 'scanned_at': None})
+    monkeypatch.setattr(app, 'search_index', app.SearchIndex())
+    monkeypatch.setattr(app, 'scan_jobs', {})
+    # Nothing listens on the discard port, so cover lookups fail at once
+    monkeypatch.setattr(app, 'TVMAZE_API_URL', 'http://127.0.0.1:9')
+    monkeypatch.setattr(app, 'OPENLIBRARY_API_URL', 'http://127.0.0.1:9')
+    monkeypatch.setattr(app, 'TMDB_API_KEY', None)
+    return app
@@ -4,35 +4,70 @@ Media Library Desktop Application
 Combines Flask backend with PyQt6 frontend and embedded VLC player
 """
 
+import time
+
+# Reference point for the startup timing printed once the library is painted
+STARTUP_STARTED = time.perf_counter()
+
 import sys
 import os
 import json
-import subprocess
-import time
+import multiprocessing
 import threading
-import vlc
 from pathlib import Path
 
+from werkzeug.serving import make_server
+
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QLabel, QStackedWidget, QFrame, QSlider
 )
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtCore import Qt, QTimer, QUrl, pyqtSignal, QObject, QSize
+from PyQt6.QtCore import Qt, QTimer, QUrl, pyqtSignal, pyqtSlot, QObject, QSize
 from PyQt6.QtGui import QIcon, QFont, QColor
 from PyQt6.QtWidgets import QDialog, QMessageBox
 from PyQt6.QtWebChannel import QWebChannel
 
+import app as backend
+
 # Configuration
 FLASK_PORT = 5000
 FLASK_HOST = "127.0.0.1"
 WINDOW_WIDTH = 1400
 WINDOW_HEIGHT = 900
 
+# Seconds between progress writes while a video plays
+PROGRESS_SAVE_INTERVAL = 10
+# Fraction of a video after which it counts as watched
+COMPLETED_THRESHOLD = 0.95
+# Bytes of the next episode pulled into the OS cache ahead of time
+PREFETCH_BYTES = 16 * 1024 * 1024
+
 # Paths
 APP_DIR = Path(__file__).parent
 MEDIA_DIR = APP_DIR.parent
 
+# Set to quit as soon as the library is painted (used by benchmarks/bench_startup.py)
+QUIT_AFTER_PAINT = os.environ.get('MEDIALIBRARY_QUIT_AFTER_PAINT') == '1'
+
+# libVLC is loaded off the startup path and off the GUI thread: on a
+# background thread once the library is on screen, or on the first play,
+# whichever comes first
+vlc_instance = None
+vlc_instance_lock = threading.Lock()
+
+
+def get_vlc_instance():
+    """The shared libVLC instance, importing vlc and creating it on first use"""
+    global vlc_instance
+    with vlc_instance_lock:
+        if vlc_instance is None:
+            started = time.perf_counter()
+            import vlc
+            vlc_instance = vlc.Instance()
+            print(f"[STARTUP] libVLC loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return vlc_instance
+
 
 class DesktopBridge(QObject):
     """Bridge between JavaScript and Python"""
@@ -40,35 +75,125 @@ class DesktopBridge(QObject):
     # Signal emitted when JavaScript calls play
     play_requested = pyqtSignal(str, float)  # file_path, start_position
     back_requested = pyqtSignal()
+    library_painted = pyqtSignal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
     
+    @pyqtSlot(str, float)
     def playMedia(self, file_path, start_position=0):
         """Called from JavaScript to play a media file in the desktop player"""
         print(f"Play requested: {file_path} at {start_position}")
         self.play_requested.emit(file_path, float(start_position))
     
+    @pyqtSlot()
     def goBack(self):
         """Called from JavaScript to go back to library"""
         print("Back requested")
         self.back_requested.emit()
+    
+    @pyqtSlot()
+    def libraryPainted(self):
+        """Called from JavaScript once the library has been rendered the first time"""
+        elapsed = (time.perf_counter() - STARTUP_STARTED) * 1000
+        print(f"[STARTUP] Library painted {elapsed:.0f} ms after launch", flush=True)
+        self.library_painted.emit()
+
+
+class BackendServer(threading.Thread):
+    """Flask backend served in-process from a background thread"""
+    
+    def __init__(self, host, port):
+        super().__init__(name="flask-backend", daemon=True)
+        try:
+            self.server = make_server(host, port, backend.app, threaded=True)
+        except OSError as e:
+            # Port taken (e.g. the web version is running), use any free port
+            print(f"Port {port} unavailable ({e}), using a free port instead")
+            self.server = make_server(host, 0, backend.app, threaded=True)
+        # The socket is bound and listening once make_server returns
+        self.url = f"http://{host}:{self.server.server_port}"
+    
+    def run(self):
+        self.server.serve_forever()
+    
+    def stop(self):
+        """Stop serving and release the port"""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def prefetch_file_head(file_path, length=PREFETCH_BYTES):
+    """Ask the OS to cache the start of a file (spins up sleeping disks/NAS)"""
+    try:
+        with open(file_path, 'rb') as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, length, os.POSIX_FADV_WILLNEED)
+            else:
+                # No readahead hint (Windows): read the bytes once so they are cached
+                remaining = length
+                while remaining > 0 and f.read(min(1024 * 1024, remaining)):
+                    remaining -= 1024 * 1024
+    except OSError as e:
+        print(f"Could not prefetch {file_path}: {e}")
 
 
 class VLCPlayer(QWidget):
     """VLC Player widget with control buttons"""
     
-    def __init__(self, parent=None):
+    # libVLC calls event callbacks on its own thread; these signals
+    # hand them over to the GUI thread
+    playback_state_changed = pyqtSignal()
+    end_reached = pyqtSignal()
+    # (file the lookup was made for, next episode path, resume position)
+    next_episode_resolved = pyqtSignal(str, str, float)
+    
+    # Resume positions closer than this to the actual position are left alone (ms)
+    SEEK_TOLERANCE_MS = 2000
+    
+    def __init__(self, vlc_instance, progress_recorder=None, next_episode_finder=None, parent=None):
         super().__init__(parent)
-        self.vlc_instance = vlc.Instance()
+        # Called as progress_recorder(path, position, duration, completed)
+        self.progress_recorder = progress_recorder
+        # Called as next_episode_finder(path) -> (next_path, resume_position) or None
+        self.next_episode_finder = next_episode_finder
+        self.next_file = None
+        self.next_position = 0.0
+        self.last_progress_write = 0.0
+        self.last_position = 0.0
+        self.last_duration = 0.0
+        
+        # Already imported by the thread that created vlc_instance
+        import vlc
+        self.vlc_instance = vlc_instance
         self.media_list_player = self.vlc_instance.media_list_player_new()
         self.media_list = self.vlc_instance.media_list_new()
         self.media_list_player.set_media_list(self.media_list)
+        # Takes the place of episodes that have been played (see _release_played_media)
+        self.played_placeholder = self.vlc_instance.media_new_location('vlc://nop')
+        self.current_media = None
+        self.next_media = None
         
         self.current_file = None
         self.is_playing = False
+        self.pending_seek_ms = None
+        
+        self.playback_state_changed.connect(self.apply_pending_seek)
+        event_manager = self.media_list_player.get_media_player().event_manager()
+        for event_type in (vlc.EventType.MediaPlayerPlaying,
+                           vlc.EventType.MediaPlayerLengthChanged,
+                           vlc.EventType.MediaPlayerSeekableChanged):
+            event_manager.event_attach(event_type, self._on_vlc_event)
+        self.end_reached.connect(self.on_end_reached)
+        self.next_episode_resolved.connect(self.queue_next_episode)
+        event_manager.event_attach(vlc.EventType.MediaPlayerEndReached,
+                                   lambda event: self.end_reached.emit())
         
         self.init_ui()
+    
+    def _on_vlc_event(self, event):
+        """libVLC event callback (runs on a VLC thread)"""
+        self.playback_state_changed.emit()
         
     def init_ui(self):
         """Initialize VLC player UI"""
@@ -122,10 +247,10 @@ class VLCPlayer(QWidget):
         self.setLayout(layout)
         self.setStyleSheet("background-color: #1a1a1a;")
         
-        # Timer for position updates
+        # Timer for position updates, only running while a video plays
         self.position_timer = QTimer()
+        self.position_timer.setInterval(500)
         self.position_timer.timeout.connect(self.update_position)
-        self.position_timer.start(500)
         
     def _button_style(self, color="#ff8c42"):
         """Generate button stylesheet"""
@@ -169,16 +294,25 @@ class VLCPlayer(QWidget):
         """Play a media file"""
         try:
             media = self.vlc_instance.media_new(str(file_path))
-            self.media_list.clear()
+            self.pending_seek_ms = None
+            if start_position > 0:
+                # libVLC opens the file at the resume position itself; the
+                # playback events re-check it once the media is seekable
+                media.add_option(f"start-time={start_position:.3f}")
+                self.pending_seek_ms = int(start_position * 1000)
+            self.media_list.lock()
+            for index in reversed(range(self.media_list.count())):
+                self.media_list.remove_index(index)
             self.media_list.add_media(media)
+            self.media_list.unlock()
             self.media_list_player.play()
+            for played in (self.current_media, self.next_media):
+                if played is not None:
+                    played.release()
+            self.current_media = media
+            self.next_media = None
             
-            # Set start position after brief delay to allow media to load
-            time.sleep(0.5)
-            if start_position > 0:
-                self.media_list_player.get_media_player().set_time(int(start_position * 1000))
-            
-            self.current_file = file_path
+            self._start_tracking(file_path, start_position)
             self.is_playing = True
             self.play_button.setText("⏸ Pause")
             
@@ -187,20 +321,107 @@ class VLCPlayer(QWidget):
             print(f"Error playing file: {e}")
             return False
     
+    def _start_tracking(self, file_path, start_position):
+        """Reset position tracking for a newly started file and look up its successor"""
+        self.current_file = file_path
+        self.next_file = None
+        self.next_position = 0.0
+        self.last_position = start_position
+        self.last_duration = 0.0
+        self.last_progress_write = time.monotonic()
+        self.position_timer.start()
+        
+        if self.next_episode_finder is not None:
+            threading.Thread(target=self._resolve_next_episode, args=(file_path,),
+                             name="next-episode", daemon=True).start()
+    
+    def _resolve_next_episode(self, file_path):
+        """Find and prefetch the next episode (background thread)"""
+        try:
+            result = self.next_episode_finder(file_path)
+        except Exception as e:
+            print(f"Error finding next episode: {e}")
+            return
+        if not result:
+            return
+        next_path, resume_position = result
+        prefetch_file_head(next_path)
+        self.next_episode_resolved.emit(file_path, next_path, float(resume_position))
+    
+    def queue_next_episode(self, for_file, next_path, resume_position):
+        """Append the next episode to the playlist so libVLC moves on without a gap"""
+        if for_file != self.current_file or self.next_file is not None:
+            # The user started something else meanwhile
+            return
+        media = self.vlc_instance.media_new(str(next_path))
+        if resume_position > 0:
+            media.add_option(f"start-time={resume_position:.3f}")
+        self.media_list.lock()
+        self.media_list.add_media(media)
+        self.media_list.unlock()
+        # Read the headers now rather than when the current episode ends
+        import vlc
+        media.parse_with_options(vlc.MediaParseFlag.local | vlc.MediaParseFlag.network, 0)
+        self.next_media = media
+        self.next_file = next_path
+        self.next_position = resume_position
+        print(f"Queued next episode: {next_path}")
+    
+    def _release_played_media(self, media):
+        """Replace an episode that has been played with the placeholder
+
+        The media list player keeps its position as an index into the list,
+        so played items can't be removed without breaking the move to the
+        next one. Swapping them for one shared placeholder keeps the indexes
+        and releases the played media, so a long session holds one media
+        object per queued episode at most.
+        """
+        if media is None:
+            return
+        self.media_list.lock()
+        try:
+            index = self.media_list.index_of_item(media)
+            if index >= 0:
+                self.media_list.remove_index(index)
+                self.media_list.insert_media(self.played_placeholder, index)
+        finally:
+            self.media_list.unlock()
+        media.release()
+    
+    def apply_pending_seek(self):
+        """Seek to the resume position once the media can seek (GUI thread)"""
+        if self.pending_seek_ms is None:
+            return
+        mp = self.media_list_player.get_media_player()
+        if not mp.is_seekable() or mp.get_length() <= 0:
+            # Wait for the next playing/length/seekable event
+            return
+        if abs(mp.get_time() - self.pending_seek_ms) > self.SEEK_TOLERANCE_MS:
+            mp.set_time(self.pending_seek_ms)
+        self.pending_seek_ms = None
+    
     def toggle_play(self):
         """Toggle play/pause"""
         if not self.is_playing:
             self.media_list_player.play()
+            self.position_timer.start()
             self.is_playing = True
             self.play_button.setText("⏸ Pause")
         else:
             self.media_list_player.pause()
+            self.position_timer.stop()
+            self.record_progress(force=True)
             self.is_playing = False
             self.play_button.setText("▶ Play")
     
     def stop(self):
-        """Stop playback"""
+        """Stop playback, saving the position reached"""
+        self.position_timer.stop()
+        self.record_progress(force=True)
         self.media_list_player.stop()
+        self.pending_seek_ms = None
+        self.next_file = None
+        self.next_position = 0.0
         self.is_playing = False
         self.play_button.setText("▶ Play")
         self.current_file = None
@@ -223,9 +444,46 @@ class VLCPlayer(QWidget):
                     current_str = self._format_time(current_time)
                     duration_str = self._format_time(duration)
                     self.time_label.setText(f"{current_str} / {duration_str}")
+                    if current_time >= 0:
+                        self.last_position = current_time
+                        self.last_duration = duration
+                        self.record_progress()
             except:
                 pass
     
+    def record_progress(self, force=False, completed=None):
+        """Save the playback position, at most every PROGRESS_SAVE_INTERVAL unless forced"""
+        if not self.current_file or self.progress_recorder is None or self.last_duration <= 0:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_progress_write < PROGRESS_SAVE_INTERVAL:
+            return
+        if completed is None:
+            completed = self.last_position >= self.last_duration * COMPLETED_THRESHOLD
+        try:
+            self.progress_recorder(self.current_file, self.last_position, self.last_duration, completed)
+            self.last_progress_write = now
+        except Exception as e:
+            print(f"Error saving progress: {e}")
+    
+    def on_end_reached(self):
+        """Mark the video as watched and follow libVLC to the queued next episode"""
+        self.last_position = self.last_duration
+        self.record_progress(force=True, completed=True)
+        
+        if self.next_file is not None:
+            # The media list player is already moving on to the next item
+            print(f"Auto-advancing to {self.next_file}")
+            self.pending_seek_ms = int(self.next_position * 1000) if self.next_position > 0 else None
+            self._release_played_media(self.current_media)
+            self.current_media, self.next_media = self.next_media, None
+            self._start_tracking(self.next_file, self.next_position)
+            return
+        
+        self.position_timer.stop()
+        self.is_playing = False
+        self.play_button.setText("▶ Play")
+    
     @staticmethod
     def _format_time(seconds):
         """Format seconds to MM:SS"""
@@ -246,19 +504,31 @@ class VLCPlayer(QWidget):
 class MediaLibraryApp(QMainWindow):
     """Main application window"""
     
+    # Emitted from the loader thread once libVLC is loaded (or failed to load)
+    vlc_loaded = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
-        self.flask_process = None
         self.is_library_view = True
+        # Play request waiting for libVLC, as (file_path, start_position)
+        self.pending_play = None
+        self.vlc_loader = None
+        self.vlc_loaded.connect(self.on_vlc_loaded)
+        
+        # Shared with the Qt side: library index, progress store, scan jobs
+        self.backend = backend
         
         # Create bridge for JS communication
         self.bridge = DesktopBridge()
         self.bridge.play_requested.connect(self.show_player)
         self.bridge.back_requested.connect(self.show_library)
+        self.bridge.library_painted.connect(self.on_library_painted)
         
-        # Start Flask server
+        # Start the backend in-process; it accepts connections immediately
         self.start_flask_server()
-        time.sleep(1)  # Give Flask time to start
+        
+        # Scan while Qt and the web engine start up
+        self.backend.start_scan_job()
         
         # Initialize UI
         self.init_ui()
@@ -285,10 +555,13 @@ class MediaLibraryApp(QMainWindow):
         self.library_view = self.create_library_view()
         self.stacked_widget.addWidget(self.library_view)
         
-        # Player view
-        self.player_view = VLCPlayer()
-        self.player_view.back_button.clicked.connect(self.show_library)
-        self.stacked_widget.addWidget(self.player_view)
+        # Player view, created on first play once libVLC is loaded (see
+        # ensure_player_view); until then a placeholder is shown
+        self.player_view = None
+        self.player_placeholder = QLabel("Loading player...")
+        self.player_placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.player_placeholder.setStyleSheet("background-color: #000000; color: #b0b0b0; font-size: 16px;")
+        self.stacked_widget.addWidget(self.player_placeholder)
         
         layout.addWidget(self.stacked_widget)
         
@@ -307,9 +580,10 @@ class MediaLibraryApp(QMainWindow):
         view = QWebEngineView()
         
         # Set up web channel for JS-Python communication
-        channel = QWebChannel()
-        channel.registerObject("desktopBridge", self.bridge)
-        view.page().setWebChannel(channel)
+        # (kept on self so it isn't garbage collected)
+        self.web_channel = QWebChannel()
+        self.web_channel.registerObject("desktopBridge", self.bridge)
+        view.page().setWebChannel(self.web_channel)
         
         # Inject JavaScript to set up bridge after page load
         def on_load_finished(ok):
@@ -335,21 +609,83 @@ class MediaLibraryApp(QMainWindow):
         
         view.page().loadFinished.connect(on_load_finished)
         
-        url = QUrl(f"http://{FLASK_HOST}:{FLASK_PORT}")
+        url = QUrl(self.flask_server.url)
         view.load(url)
         return view
     
+    def ensure_player_view(self):
+        """The player view, created the first time something is played (libVLC must be loaded)"""
+        if self.player_view is None:
+            self.player_view = VLCPlayer(vlc_instance, progress_recorder=self.backend.record_progress,
+                                         next_episode_finder=self.find_next_episode)
+            self.player_view.back_button.clicked.connect(self.show_library)
+            self.stacked_widget.addWidget(self.player_view)
+        return self.player_view
+    
+    def start_vlc_loader(self):
+        """Load libVLC on a background thread, unless it is loaded or loading"""
+        if vlc_instance is None and (self.vlc_loader is None or not self.vlc_loader.is_alive()):
+            self.vlc_loader = threading.Thread(target=self._load_vlc, name="vlc-loader", daemon=True)
+            self.vlc_loader.start()
+    
+    def _load_vlc(self):
+        """Thread body of the libVLC loader"""
+        try:
+            get_vlc_instance()
+        except Exception as e:
+            print(f"Error loading libVLC: {e}")
+        self.vlc_loaded.emit()
+    
+    def on_library_painted(self):
+        """Load libVLC in the background now that the library is on screen"""
+        if QUIT_AFTER_PAINT:
+            QTimer.singleShot(0, self.close)
+            return
+        self.start_vlc_loader()
+    
+    def on_vlc_loaded(self):
+        """Start a play request that was waiting for libVLC (GUI thread)"""
+        if self.pending_play is None:
+            return
+        file_path, start_position = self.pending_play
+        self.pending_play = None
+        if vlc_instance is None:
+            QMessageBox.warning(self, "Media Library", "The VLC player could not be loaded.")
+            self.show_library()
+            return
+        self.show_player(file_path, start_position)
+    
     def show_library(self):
         """Switch to library view"""
         self.stacked_widget.setCurrentWidget(self.library_view)
         self.is_library_view = True
-        self.player_view.stop()
+        self.pending_play = None
+        if self.player_view is not None:
+            self.player_view.stop()
+        # Show the progress just saved
+        self.library_view.page().runJavaScript("loadLibrary();")
     
     def show_player(self, file_path, start_position=0):
         """Switch to player view and play file"""
-        self.stacked_widget.setCurrentWidget(self.player_view)
         self.is_library_view = False
-        self.player_view.play_file(file_path, start_position)
+        if vlc_instance is None:
+            # Never wait for libVLC on the GUI thread, play once it is loaded
+            self.pending_play = (file_path, start_position)
+            self.stacked_widget.setCurrentWidget(self.player_placeholder)
+            self.start_vlc_loader()
+            return
+        player_view = self.ensure_player_view()
+        self.stacked_widget.setCurrentWidget(player_view)
+        player_view.play_file(file_path, start_position)
+    
+    def find_next_episode(self, file_path):
+        """Next episode and its resume position, straight from the backend library"""
+        next_episode = self.backend.find_next_episode(file_path)
+        if next_episode is None:
+            return None
+        record = self.backend.progress_store.get(next_episode['path'], next_episode.get('fingerprint')) or {}
+        resume_position = 0 if record.get('completed') else record.get('position', 0)
+        return next_episode['path'], resume_position
     
     def _create_icon(self):
         """Create simple icon"""
@@ -357,38 +693,31 @@ class MediaLibraryApp(QMainWindow):
         return QIcon()
     
     def start_flask_server(self):
-        """Start Flask backend server"""
-        try:
-            # Use pythonw.exe to run Flask without console window
-            python_exe = sys.executable
-            self.flask_process = subprocess.Popen(
-                [python_exe, str(APP_DIR / "app.py")],
-                cwd=str(APP_DIR),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-            )
-            print(f"Flask server started (PID: {self.flask_process.pid})")
-        except Exception as e:
-            print(f"Error starting Flask server: {e}")
+        """Start Flask backend server on a background thread"""
+        self.flask_server = BackendServer(FLASK_HOST, FLASK_PORT)
+        self.flask_server.start()
+        print(f"Flask server listening on {self.flask_server.url}")
     
     def closeEvent(self, event):
         """Clean up on application close"""
+        # Save the position of anything still playing
+        if self.player_view is not None:
+            self.player_view.stop()
+        
         # Stop Flask server
-        if self.flask_process:
-            try:
-                self.flask_process.terminate()
-                self.flask_process.wait(timeout=5)
-                print("Flask server stopped")
-            except Exception as e:
-                print(f"Error stopping Flask server: {e}")
-                self.flask_process.kill()
+        try:
+            self.flask_server.stop()
+            print("Flask server stopped")
+        except Exception as e:
+            print(f"Error stopping Flask server: {e}")
+        self.backend.probe_scheduler.shutdown()
         
         event.accept()
 
 
 def main():
     """Main entry point"""
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     
     window = MediaLibraryApp()
@@ -0,0 +1,67 @@
+"""
+JSON-backed cache for per-file metadata that is expensive to compute.
+
+Entries are keyed by path and only returned while the file's size and
+modification time still match the values they were computed for.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class FileMetadataCache:
+    """Per-file values invalidated when a file's size or mtime changes"""
+
+    def __init__(self, cache_file):
+        self.cache_file = Path(cache_file)
+        self._entries = None
+        self._dirty = False
+        # Lookup counters, exposed on /metrics
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, path, size, mtime):
+        """Return the cached value for a file, or None if missing or stale"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(str(path))
+            if entry and entry.get('size') == size and entry.get('mtime') == mtime:
+                self.hits += 1
+                return entry.get('value')
+            self.misses += 1
+        return None
+
+    def put(self, path, size, mtime, value):
+        """Store the value computed for a file at the given size and mtime"""
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[str(path)] = {'size': size, 'mtime': mtime, 'value': value}
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk if anything changed since the last save"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = json.dumps(self._entries)
+                self._dirty = False
+            tmp_file = self.cache_file.with_suffix(self.cache_file.suffix + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_file, self.cache_file)
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Pure-Python container probe for MP4/MOV and Matroska/WebM files
+
+Reads only the container headers (the MP4 'moov' box, the Matroska Segment
+Info and Tracks elements) with a handful of small seeks, so duration,
+resolution and codec are known without decoding anything or starting VLC.
+
+Run: python media_probe.py <file> [<file> ...]
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ThreadPoolExecutor, wait
+
+# Never read more than this much header data from a single file
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+MAX_EBML_ELEMENT_SIZE = 4 * 1024 * 1024
+# Worker crashes a file may be in flight for before it is no longer retried
+MAX_PROBE_CRASHES = 2
+
+MP4_TOP_LEVEL_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid'}
+
+MP4_CODECS = {
+    'avc1': 'h264', 'avc3': 'h264',
+    'hvc1': 'hevc', 'hev1': 'hevc',
+    'av01': 'av1', 'vp09': 'vp9', 'vp08': 'vp8',
+    'mp4v': 'mpeg4', 'mjpa': 'mjpeg', 'jpeg': 'mjpeg',
+    'apcn': 'prores', 'apch': 'prores', 'apcs': 'prores', 'apco': 'prores', 'ap4h': 'prores',
+}
+
+MATROSKA_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc',
+    'V_AV1': 'av1', 'V_VP9': 'vp9', 'V_VP8': 'vp8',
+    'V_MPEG4/ISO/ASP': 'mpeg4', 'V_MPEG4/ISO/SP': 'mpeg4', 'V_MS/VFW/FOURCC': 'vfw',
+    'V_MPEG2': 'mpeg2', 'V_MPEG1': 'mpeg1', 'V_THEORA': 'theora', 'V_MJPEG': 'mjpeg',
+}
+
+# Matroska element ids
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+
+
+def probe_media(path):
+    """Return duration, resolution and codec of a video file
+
+    The result is a dict with 'container', 'duration' (seconds), 'width',
+    'height' and 'video_codec' (any of them may be None), or None when the
+    container is not supported or the headers can't be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            file_size = f.tell()
+            f.seek(0)
+            magic = f.read(8)
+            if len(magic) < 8:
+                return None
+            if struct.unpack('>I', magic[:4])[0] == EBML_HEADER:
+                return probe_matroska(f, file_size)
+            if magic[4:8] in MP4_TOP_LEVEL_BOXES:
+                return probe_mp4(f, file_size)
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        print(f"[PROBE] Could not read {path}: {e}")
+    return None
+
+
+def _empty_info(container):
+    return {'container': container, 'duration': None, 'width': None, 'height': None, 'video_codec': None}
+
+
+# --- MP4 / MOV ---------------------------------------------------------------
+
+def probe_mp4(f, file_size):
+    """Probe an ISO base media file (MP4, MOV, M4V, 3GP)"""
+    moov = _find_top_level_box(f, file_size, b'moov')
+    if moov is None:
+        return None
+
+    info = _empty_info('mp4')
+    timescale = None
+    for box_type, start, end in _iter_boxes(moov, 0, len(moov)):
+        if box_type == b'mvhd':
+            timescale, duration = _parse_mvhd(moov, start)
+            if timescale and duration:
+                info['duration'] = duration / timescale
+        elif box_type == b'mvex' and not info['duration']:
+            # Fragmented files keep the total duration in mvex/mehd
+            for child_type, child_start, _ in _iter_boxes(moov, start, end):
+                if child_type == b'mehd' and timescale:
+                    version = moov[child_start]
+                    fmt = '>Q' if version == 1 else '>I'
+                    duration = struct.unpack_from(fmt, moov, child_start + 4)[0]
+                    if duration:
+                        info['duration'] = duration / timescale
+        elif box_type == b'trak' and info['video_codec'] is None:
+            track = _parse_trak(moov, start, end)
+            if track:
+                info.update(track)
+    return info
+
+
+def _find_top_level_box(f, file_size, wanted):
+    """Seek through top-level boxes and return the payload of the wanted one"""
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            return None
+        if box_type == wanted:
+            payload_size = size - header_size
+            if payload_size > MAX_MOOV_SIZE:
+                return None
+            f.seek(pos + header_size)
+            return f.read(payload_size)
+        pos += size
+    return None
+
+
+def _iter_boxes(data, start, end):
+    """Yield (type, payload_start, payload_end) for the boxes in data[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size or pos + size > end:
+            return
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+
+def _parse_mvhd(data, start):
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, start + 4 + 16)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, start + 4 + 8)
+    return timescale, duration
+
+
+def _parse_trak(data, start, end):
+    """Return width, height and codec of a video track, or None for other tracks"""
+    width = height = None
+    is_video = False
+    codec = None
+
+    for box_type, box_start, box_end in _iter_boxes(data, start, end):
+        if box_type == b'tkhd':
+            version = data[box_start]
+            offset = box_start + (4 + 84 if version == 1 else 4 + 72)
+            if offset + 8 <= box_end:
+                w, h = struct.unpack_from('>II', data, offset)
+                width, height = w >> 16, h >> 16
+        elif box_type == b'mdia':
+            for mdia_type, mdia_start, mdia_end in _iter_boxes(data, box_start, box_end):
+                if mdia_type == b'hdlr':
+                    is_video = data[mdia_start + 8:mdia_start + 12] == b'vide'
+                elif mdia_type == b'minf':
+                    codec, entry_width, entry_height = _parse_stsd(data, mdia_start, mdia_end)
+                    if not width and entry_width:
+                        width, height = entry_width, entry_height
+
+    if not is_video:
+        return None
+    return {
+        'width': width or None,
+        'height': height or None,
+        'video_codec': MP4_CODECS.get(codec, codec),
+    }
+
+
+def _parse_stsd(data, minf_start, minf_end):
+    """Return (fourcc, width, height) of the first sample entry in minf/stbl/stsd"""
+    for box_type, start, end in _iter_boxes(data, minf_start, minf_end):
+        if box_type != b'stbl':
+            continue
+        for stbl_type, stsd_start, stsd_end in _iter_boxes(data, start, end):
+            if stbl_type != b'stsd' or stsd_start + 16 > stsd_end:
+                continue
+            entry = stsd_start + 8
+            fourcc = data[entry + 4:entry + 8].decode('latin-1').strip()
+            width = height = None
+            if entry + 36 <= stsd_end:
+                width, height = struct.unpack_from('>HH', data, entry + 32)
+            return fourcc, width, height
+    return None, None, None
+
+
+# --- Matroska / WebM ---------------------------------------------------------
+
+def _read_vint(data, pos, keep_marker=False):
+    """Decode an EBML variable-length integer, returns (value, length)
+
+    Sizes with all value bits set mean "unknown" and decode to None.
+    """
+    first = data[pos]
+    if first == 0:
+        raise ValueError('invalid EBML vint')
+    length = 1
+    mask = 0x80
+    while not first & mask:
+        mask >>= 1
+        length += 1
+    value = first if keep_marker else first & (mask - 1)
+    for i in range(1, length):
+        value = (value << 8) | data[pos + i]
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def _read_element_header(f, pos):
+    """Read the id and size of the element at pos, returns (id, size, data_start)"""
+    f.seek(pos)
+    header = f.read(12)
+    if len(header) < 2:
+        return None, None, None
+    element_id, id_length = _read_vint(header, 0, keep_marker=True)
+    size, size_length = _read_vint(header, id_length)
+    return element_id, size, pos + id_length + size_length
+
+
+def _iter_elements(data, start, end):
+    """Yield (id, data_start, data_end) for the EBML elements in data[start:end]"""
+    pos = start
+    while pos < end:
+        element_id, id_length = _read_vint(data, pos, keep_marker=True)
+        size, size_length = _read_vint(data, pos + id_length)
+        data_start = pos + id_length + size_length
+        if size is None or data_start + size > end:
+            return
+        yield element_id, data_start, data_start + size
+        pos = data_start + size
+
+
+def _read_uint(data, start, end):
+    value = 0
+    for byte in data[start:end]:
+        value = (value << 8) | byte
+    return value
+
+
+def probe_matroska(f, file_size):
+    """Probe a Matroska or WebM file"""
+    element_id, size, pos = _read_element_header(f, 0)
+    if element_id != EBML_HEADER or size is None:
+        return None
+    pos += size
+
+    element_id, size, segment_start = _read_element_header(f, pos)
+    if element_id != SEGMENT:
+        return None
+    segment_end = file_size if size is None else min(file_size, segment_start + size)
+
+    found = {}
+    seek_positions = {}
+    pos = segment_start
+    while pos < segment_end and not (INFO in found and TRACKS in found):
+        element_id, size, data_start = _read_element_header(f, pos)
+        if element_id is None or element_id == CLUSTER or size is None:
+            break
+        if element_id in (INFO, TRACKS, SEEK_HEAD) and size <= MAX_EBML_ELEMENT_SIZE:
+            f.seek(data_start)
+            payload = f.read(size)
+            if element_id == SEEK_HEAD:
+                seek_positions.update(_parse_seek_head(payload))
+            else:
+                found[element_id] = payload
+        pos = data_start + size
+
+    # Info or Tracks written after the clusters: follow the SeekHead
+    for wanted in (INFO, TRACKS):
+        if wanted in found or wanted not in seek_positions:
+            continue
+        element_id, size, data_start = _read_element_header(f, segment_start + seek_positions[wanted])
+        if element_id == wanted and size is not None and size <= MAX_EBML_ELEMENT_SIZE:
+            f.seek(data_start)
+            found[wanted] = f.read(size)
+
+    info = _empty_info('matroska')
+    if INFO in found:
+        info['duration'] = _parse_info(found[INFO])
+    if TRACKS in found:
+        info.update(_parse_tracks(found[TRACKS]))
+    return info
+
+
+def _parse_seek_head(data):
+    positions = {}
+    for element_id, start, end in _iter_elements(data, 0, len(data)):
+        if element_id != SEEK:
+            continue
+        seek_id = seek_position = None
+        for child_id, child_start, child_end in _iter_elements(data, start, end):
+            if child_id == SEEK_ID:
+                seek_id = _read_uint(data, child_start, child_end)
+            elif child_id == SEEK_POSITION:
+                seek_position = _read_uint(data, child_start, child_end)
+        if seek_id is not None and seek_position is not None:
+            positions.setdefault(seek_id, seek_position)
+    return positions
+
+
+def _parse_info(data):
+    """Return the segment duration in seconds"""
+    timestamp_scale = 1000000
+    duration = None
+    for element_id, start, end in _iter_elements(data, 0, len(data)):
+        if element_id == TIMESTAMP_SCALE:
+            timestamp_scale = _read_uint(data, start, end)
+        elif element_id == DURATION:
+            fmt = '>d' if end - start == 8 else '>f'
+            duration = struct.unpack_from(fmt, data, start)[0]
+    if duration is None:
+        return None
+    return duration * timestamp_scale / 1e9
+
+
+def _parse_tracks(data):
+    """Return width, height and codec of the first video track"""
+    for element_id, start, end in _iter_elements(data, 0, len(data)):
+        if element_id != TRACK_ENTRY:
+            continue
+        track_type = codec = width = height = None
+        for child_id, child_start, child_end in _iter_elements(data, start, end):
+            if child_id == TRACK_TYPE:
+                track_type = _read_uint(data, child_start, child_end)
+            elif child_id == CODEC_ID:
+                codec = data[child_start:child_end].rstrip(b'\0').decode('ascii', 'replace')
+            elif child_id == VIDEO:
+                for video_id, video_start, video_end in _iter_elements(data, child_start, child_end):
+                    if video_id == PIXEL_WIDTH:
+                        width = _read_uint(data, video_start, video_end)
+                    elif video_id == PIXEL_HEIGHT:
+                        height = _read_uint(data, video_start, video_end)
+        if track_type == 1:
+            return {
+                'width': width,
+                'height': height,
+                'video_codec': MATROSKA_CODECS.get(codec, codec),
+            }
+    return {}
+
+
+# --- Background probing ------------------------------------------------------
+
+class ProbeScheduler:
+    """Probes files on a bounded worker pool in the background
+
+    Files are handed over in priority order with submit(). Each result is
+    stored in the FileMetadataCache, which is saved every few seconds, and
+    passed to on_result(path, info) so callers can update what they serve.
+    Reading headers is a few small seeks per file, so the default pool is
+    threads: a process pool would spawn on Windows and macOS, where every
+    worker re-imports the main script (PyQt and all of the backend in the
+    desktop app). A ProcessPoolExecutor can still be passed as
+    executor_class; a crashed worker breaks such a pool, so it is replaced
+    and the files it was probing are queued again. Failed probes are not cached, so the next scan
+    retries them.
+    """
+
+    def __init__(self, cache, max_workers=None, on_result=None, on_batch=None, save_interval=5.0, probe=probe_media,
+                 executor_class=ThreadPoolExecutor):
+        self.cache = cache
+        self.probe = probe
+        self.executor_class = executor_class
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_in_flight = self.max_workers * 2
+        self.on_result = on_result
+        self.on_batch = on_batch
+        self.save_interval = save_interval
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._stopped = False
+        # Pool crashes per path while it was being probed
+        self._crashes = Counter()
+
+    def submit(self, files):
+        """Queue (path, size, mtime) tuples, replacing anything not yet started"""
+        with self._condition:
+            self._queue = deque(files)
+            self._condition.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='media-probe', daemon=True)
+                self._thread.start()
+
+    def pending(self):
+        """Number of files waiting to be probed"""
+        with self._condition:
+            return len(self._queue)
+
+    def shutdown(self):
+        """Stop probing and the workers"""
+        with self._condition:
+            self._stopped = True
+            self._queue.clear()
+            self._condition.notify()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _next_batch(self, count):
+        with self._condition:
+            while not self._queue and not self._stopped:
+                self._condition.wait()
+            batch = []
+            while self._queue and len(batch) < count:
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _requeue(self, files):
+        """Put files back at the front of the queue"""
+        with self._condition:
+            self._queue.extendleft(reversed(files))
+
+    def _restart_pool(self, in_flight):
+        """Replace a broken pool and queue the files it was probing again"""
+        print(f"[PROBE] A probe worker crashed, restarting the pool ({len(in_flight)} files in flight)")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        retry = []
+        for path, size, mtime in in_flight.values():
+            # One of these crashed the worker; each is probed on its own from now on
+            self._crashes[path] += 1
+            if self._crashes[path] < MAX_PROBE_CRASHES:
+                retry.append((path, size, mtime))
+            else:
+                print(f"[PROBE] Giving up on {path}, probing it crashed the worker")
+        in_flight.clear()
+        self._requeue(retry)
+
+    def _run(self):
+        in_flight = {}
+        changed = 0
+        last_save = time.monotonic()
+
+        while not self._stopped:
+            if len(in_flight) < self.max_in_flight:
+                if in_flight:
+                    # Don't wait for new work while results are outstanding
+                    with self._condition:
+                        has_work = bool(self._queue)
+                else:
+                    has_work = True
+                if has_work:
+                    if self._executor is None:
+                        self._executor = self.executor_class(max_workers=self.max_workers)
+                    batch = self._next_batch(self.max_in_flight - len(in_flight))
+                    for index, (path, size, mtime) in enumerate(batch):
+                        # Another probe may have filled the cache in the meantime
+                        if self.cache.get(path, size, mtime) is not None:
+                            continue
+                        suspect = self._crashes[path] > 0
+                        if suspect and in_flight:
+                            # Files in flight during a crash are retried alone
+                            self._requeue(batch[index:])
+                            break
+                        try:
+                            future = self._executor.submit(self.probe, path)
+                        except BrokenExecutor:
+                            self._requeue(batch[index:])
+                            self._restart_pool(in_flight)
+                            break
+                        in_flight[future] = (path, size, mtime)
+                        if suspect:
+                            self._requeue(batch[index + 1:])
+                            break
+
+            if in_flight:
+                done, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    path, size, mtime = in_flight[future]
+                    try:
+                        info = future.result() or {}
+                    except BrokenExecutor:
+                        broken = True
+                        continue
+                    except Exception as e:
+                        # Not cached, so the next scan tries again
+                        print(f"[PROBE] Probing {path} failed: {e}")
+                        del in_flight[future]
+                        continue
+                    del in_flight[future]
+                    self._crashes.pop(path, None)
+                    self.cache.put(path, size, mtime, info)
+                    if self.on_result:
+                        self.on_result(path, info)
+                    changed += 1
+                if broken:
+                    self._restart_pool(in_flight)
+
+            idle = not in_flight and not self.pending()
+            if changed and (idle or time.monotonic() - last_save >= self.save_interval):
+                self.cache.save()
+                if self.on_batch:
+                    self.on_batch(changed)
+                changed = 0
+                last_save = time.monotonic()
+
+
+if __name__ == '__main__':
+    for file_arg in sys.argv[1:]:
+        print(f"{file_arg}: {probe_media(file_arg)}")
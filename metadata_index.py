@@ -0,0 +1,307 @@
+"""
+Offline title -> poster index built from provider dumps
+
+Imports JSON-lines exports with one show or movie per line into SQLite:
+
+- TVMaze shows: {"id", "name", "premiered", "image": {"medium", ...}}
+- TMDB movies and TV: {"id", "title" or "name", "original_title",
+  "release_date" or "first_air_date", "poster_path", "popularity"}
+
+Every title is stored under its normalized name plus year (and under its
+original title), so finding the poster of a library title is one indexed
+lookup. search_cover_image() asks this index first and only goes to the
+live APIs for titles it does not know.
+
+    python metadata_index.py import tvmaze_shows.jsonl tmdb_movies.jsonl
+    python metadata_index.py lookup "Heat.1995.1080p.BluRay" --type movie
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from search_index import normalize
+
+DEFAULT_DB_FILE = Path(__file__).parent / 'metadata.db'
+TMDB_POSTER_URL = "https://image.tmdb.org/t/p/w342"
+# Rows written per executemany() while importing
+IMPORT_BATCH = 5000
+# A library title's year matches a dump entry this many years apart
+# (festival vs. release dates)
+YEAR_TOLERANCE = 1
+# Stored in PRAGMA user_version; older databases are rebuilt on import
+SCHEMA_VERSION = 2
+
+YEAR_PATTERN = re.compile(r'(?<!\d)(?:19|20)\d{2}(?!\d)')
+RELEASE_TAG_PATTERN = re.compile(
+    r'\b(?:2160p|1080p|720p|576p|480p|4k|uhd|hdr|bluray|blu ray|brrip|bdrip|web dl|webdl|webrip|hdtv|'
+    r'dvdrip|dvd|x264|x265|h264|h265|hevc|xvid|remux|proper|repack|extended|unrated|directors cut)\b')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    year INTEGER,
+    poster_url TEXT,
+    popularity REAL NOT NULL DEFAULT 0,  -- Percentile within its source (0-1)
+    UNIQUE (source, kind, source_id)  -- TMDB numbers movies and TV separately
+);
+CREATE TABLE IF NOT EXISTS title_keys (
+    kind TEXT NOT NULL,
+    norm_title TEXT NOT NULL,
+    year INTEGER,
+    title_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS title_keys_lookup ON title_keys (kind, norm_title, year);
+CREATE INDEX IF NOT EXISTS title_keys_title ON title_keys (title_id);
+"""
+
+
+def split_title_year(name):
+    """(normalized title, year or None) of a library name like 'Heat.1995.1080p.BluRay'
+
+    A year in brackets wins, otherwise the last year that is not the start
+    of the name ('1917 (2019)', 'Blade Runner 2049 2017'). Release tags
+    after the title are dropped.
+    """
+    text = re.sub(r'[._]+', ' ', name)
+    year = None
+    bracketed = re.search(r'[(\[]((?:19|20)\d{2})[)\]]', text)
+    if bracketed and text[:bracketed.start()].strip():
+        year, text = int(bracketed.group(1)), text[:bracketed.start()]
+    else:
+        for match in reversed(list(YEAR_PATTERN.finditer(text))):
+            if text[:match.start()].strip(' -([') and not RELEASE_TAG_PATTERN.search(text[:match.start()].lower()):
+                year, text = int(match.group()), text[:match.start()]
+                break
+    title = normalize(text)
+    tag = RELEASE_TAG_PATTERN.search(title)
+    if tag and tag.start() > 0:
+        title = title[:tag.start()].strip()
+    return title, year
+
+
+def parse_year(date_text):
+    match = YEAR_PATTERN.match(date_text or '')
+    return int(match.group()) if match else None
+
+
+def parse_record(record, source=None):
+    """Entry of one dump line as (source, source_id, kind, title, year, poster_url, popularity, aliases)
+
+    Returns None for records without an id or title.
+    """
+    if source is None:
+        source = 'tmdb' if 'poster_path' in record or 'release_date' in record or 'first_air_date' in record else 'tvmaze'
+
+    if source == 'tvmaze':
+        kind = 'series'
+        title = record.get('name')
+        year = parse_year(record.get('premiered'))
+        image = record.get('image') or {}
+        poster_url = image.get('medium') or image.get('original')
+        if poster_url:
+            poster_url = poster_url.replace('http://', 'https://')
+        popularity = record.get('weight') or 0
+        aliases = []
+    else:
+        is_movie = record.get('media_type') == 'movie' or (record.get('media_type') is None and 'title' in record)
+        kind = 'movie' if is_movie else 'series'
+        title = record.get('title') if is_movie else record.get('name')
+        year = parse_year(record.get('release_date') if is_movie else record.get('first_air_date'))
+        poster_url = f"{TMDB_POSTER_URL}{record['poster_path']}" if record.get('poster_path') else None
+        popularity = record.get('popularity') or 0
+        aliases = [record.get('original_title') if is_movie else record.get('original_name')]
+
+    if record.get('id') is None or not title:
+        return None
+    aliases = [alias for alias in aliases if alias and alias != title]
+    return source, str(record['id']), kind, title, year, poster_url, float(popularity), aliases
+
+
+def rank_popularity(connection):
+    """Replace popularity by its percentile within each source
+
+    TVMaze weights (0-100) and TMDB popularity (unbounded) can't be compared
+    directly. Ranking again is a no-op, so all sources are ranked after every
+    import.
+    """
+    connection.execute('CREATE TEMP TABLE ranks (id INTEGER PRIMARY KEY, popularity REAL)')
+    connection.execute('INSERT INTO ranks SELECT id, percent_rank() OVER (PARTITION BY source ORDER BY popularity) '
+                       'FROM titles')
+    connection.execute('UPDATE titles SET popularity = (SELECT popularity FROM ranks WHERE ranks.id = titles.id)')
+    connection.execute('DROP TABLE ranks')
+
+
+def import_dumps(db_file, dump_files, source=None):
+    """Import JSON-lines dumps, replacing earlier imports of the same source and kind
+
+    A TMDB TV dump replaces the TMDB series only, so movie and TV exports can
+    be imported together or one at a time.
+
+    Returns {'imported': n, 'skipped': n, 'sources': [...]}, where skipped
+    counts unreadable lines and lines without an id or title.
+    """
+    connection = sqlite3.connect(db_file)
+    if connection.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'titles'").fetchone():
+            print(f"[METADATA] {db_file} has an older schema, re-import every dump")
+        connection.executescript('DROP TABLE IF EXISTS title_keys; DROP TABLE IF EXISTS titles;')
+    connection.executescript(SCHEMA)
+    connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    connection.execute('PRAGMA synchronous=OFF')
+    imported = skipped = 0
+    replaced = set()
+
+    def flush(rows):
+        for row in rows:
+            scope = (row[0], row[2])
+            if scope not in replaced:
+                # A new dump of a source's movies or series replaces the previous one
+                connection.execute('DELETE FROM title_keys WHERE title_id IN '
+                                   '(SELECT id FROM titles WHERE source = ? AND kind = ?)', scope)
+                connection.execute('DELETE FROM titles WHERE source = ? AND kind = ?', scope)
+                replaced.add(scope)
+        keys = []
+        inserted = 0
+        for source_name, source_id, kind, title, year, poster_url, popularity, aliases in rows:
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO titles (source, source_id, kind, title, year, poster_url, popularity) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (source_name, source_id, kind, title, year, poster_url, popularity))
+            if cursor.rowcount == 0:
+                # Listed twice in the dump, the first line wins
+                continue
+            inserted += 1
+            for name in {normalize(title), *(normalize(alias) for alias in aliases)}:
+                if name:
+                    keys.append((kind, name, year, cursor.lastrowid))
+        connection.executemany('INSERT INTO title_keys (kind, norm_title, year, title_id) VALUES (?, ?, ?, ?)', keys)
+        return inserted
+
+    with connection:
+        for dump_file in dump_files:
+            rows = []
+            with open(dump_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        row = parse_record(json.loads(line), source)
+                    except (ValueError, AttributeError, TypeError):
+                        row = None
+                    if row is None:
+                        skipped += 1
+                        continue
+                    rows.append(row)
+                    if len(rows) >= IMPORT_BATCH:
+                        imported += flush(rows)
+                        rows = []
+            imported += flush(rows)
+        rank_popularity(connection)
+    connection.close()
+    return {'imported': imported, 'skipped': skipped, 'sources': sorted({source_name for source_name, _ in replaced})}
+
+
+class MetadataIndex:
+    """Read side of the index, shared by the request threads
+
+    The database is opened on first use, so it can be imported while the
+    server is running.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = Path(db_file)
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            if not self.db_file.exists():
+                return None
+            self._connection = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+        return self._connection
+
+    @property
+    def available(self):
+        return self._connection is not None or self.db_file.exists()
+
+    def lookup(self, name, media_type='movie'):
+        """Poster URL of a library title, or None if the index does not know it"""
+        kind = 'series' if media_type == 'series' else 'movie'
+        title, year = split_title_year(name)
+        if not title:
+            return None
+
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = None
+                if year is not None:
+                    row = connection.execute(
+                        'SELECT t.poster_url FROM title_keys k JOIN titles t ON t.id = k.title_id '
+                        'WHERE k.kind = ? AND k.norm_title = ? AND (k.year BETWEEN ? AND ? OR k.year IS NULL) '
+                        'AND t.poster_url IS NOT NULL '
+                        'ORDER BY k.year IS NULL, abs(k.year - ?), t.popularity DESC, t.id LIMIT 1',
+                        (kind, title, year - YEAR_TOLERANCE, year + YEAR_TOLERANCE, year)).fetchone()
+                    # The number may belong to the title ('Blade Runner 2049')
+                    title = f"{title} {year}"
+                if row is None:
+                    row = connection.execute(
+                        'SELECT t.poster_url FROM title_keys k JOIN titles t ON t.id = k.title_id '
+                        'WHERE k.kind = ? AND k.norm_title = ? AND t.poster_url IS NOT NULL '
+                        'ORDER BY t.popularity DESC, t.id LIMIT 1',
+                        (kind, title)).fetchone()
+            except sqlite3.Error as e:
+                # Not imported yet (no tables) or a broken file
+                print(f"[METADATA] Lookup failed: {e}")
+                return None
+        return row[0] if row else None
+
+    def count(self):
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return 0
+            try:
+                return connection.execute('SELECT count(*) FROM titles').fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the offline poster index")
+    parser.add_argument('--db', default=str(DEFAULT_DB_FILE), help="SQLite database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help="Import JSON-lines dumps")
+    import_parser.add_argument('dumps', nargs='+')
+    import_parser.add_argument('--source', choices=('tvmaze', 'tmdb'), help="Format of the dumps (detected per line by default)")
+    lookup_parser = commands.add_parser('lookup', help="Resolve a library title to a poster URL")
+    lookup_parser.add_argument('title')
+    lookup_parser.add_argument('--type', choices=('movie', 'series'), default='movie')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        started = time.perf_counter()
+        result = import_dumps(args.db, args.dumps, args.source)
+        print(f"[METADATA] Imported {result['imported']} titles from {', '.join(result['sources']) or 'no sources'} "
+              f"({result['skipped']} lines skipped) into {args.db} in {time.perf_counter() - started:.2f}s")
+    else:
+        title, year = split_title_year(args.title)
+        print(f"[METADATA] {title!r} ({year or 'no year'}): {MetadataIndex(args.db).lookup(args.title, args.type)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
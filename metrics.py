@@ -0,0 +1,194 @@
+"""
+Minimal Prometheus metrics
+
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format by the /metrics endpoint. Updates are a dict lookup and an
+add under a per-metric lock, cheap enough to leave on in the request and scan
+hot paths. Values that already live elsewhere (library size, cache counters)
+are registered as callbacks and only computed when /metrics is scraped.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Default latency buckets in seconds, from 1ms to 30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Base class: a named family of values keyed by label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=(), callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        # Callable returning {label values tuple: value} (or a bare number
+        # without labels), evaluated at scrape time instead of stored values
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        if self.callback is None:
+            with self._lock:
+                return list(self._values.items())
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return list(values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts plus the +Inf bucket, sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = ('le', _format_value(float(bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The set of metrics exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=(), callback=None):
+        return self._register(Counter(name, help_text, labelnames, callback))
+
+    def gauge(self, name, help_text, labelnames=(), callback=None):
+        return self._register(Gauge(name, help_text, labelnames, callback))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing callback must not take the whole endpoint down
+                print(f"[METRICS] Could not render {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+def timed_iter(iterable, phases, phase):
+    """Yield from iterable, adding the time spent producing items to phases[phase]"""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            phases[phase] += time.perf_counter() - started
+            return
+        phases[phase] += time.perf_counter() - started
+        yield item
+
+
+REGISTRY = Registry()
@@ -0,0 +1,98 @@
+"""
+Opt-in sampling profiler for single requests
+
+While a profiled request runs, a background thread samples the stacks of
+all threads every few milliseconds with sys._current_frames(). The samples
+are written in the collapsed-stack format used by flamegraph.pl, speedscope
+and similar tools: one line per distinct stack, frames root first separated
+by ';', followed by the number of samples. The root frame is the thread
+name, so a scan job the request waits on shows up next to the request.
+
+Only the newest files in the profile folder are kept.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+# Refresh the thread name table every this many samples
+THREAD_NAME_REFRESH = 100
+
+
+class SamplingProfiler:
+    """Collects stack samples of every thread until stopped"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if self.samples % THREAD_NAME_REFRESH == 0:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stack.reverse()
+                self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def folded(self):
+        """The samples in collapsed-stack format"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def save_profile(profiler, directory, name, retention):
+    """Write a stopped profiler's samples to directory, returns the file name
+
+    Older .folded files beyond the newest retention are deleted.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-') or 'request'
+    file_name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{slug}-{profiler.duration * 1000:.0f}ms.folded"
+    with open(directory / file_name, 'w', encoding='utf-8') as f:
+        f.write(profiler.folded())
+
+    # Names start with the timestamp, so they sort oldest to newest
+    profiles = sorted(directory.glob('*.folded'), reverse=True)
+    for old in profiles[retention:]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+    return file_name
@@ -0,0 +1,191 @@
+"""
+Watch progress storage keyed by file fingerprint
+
+progress.json holds the progress records keyed by content fingerprint and an
+index of every path each record has been seen at. A renamed or moved file
+keeps its progress: the scan links the new path to the existing fingerprint
+instead of starting over. Files saved before fingerprints existed are keyed
+by their path and migrated the first time the scan links them.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+PROGRESS_FORMAT_VERSION = 2
+
+# How often to check whether progress.json was changed by another process
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+class ProgressStore:
+    """Thread-safe, in-memory view of progress.json"""
+
+    def __init__(self, progress_file, fingerprint_for=None):
+        self.progress_file = Path(progress_file)
+        # Callable returning the fingerprint of a path, used when a caller doesn't know it
+        self.fingerprint_for = fingerprint_for
+        self._entries = {}
+        self._paths = {}
+        self._loaded_mtime = None
+        self._checked_at = None
+        self._dirty = False
+        # Lookups answered from memory vs. ones that (re)read progress.json
+        self.hits = 0
+        self.misses = 0
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def add_listener(self, callback):
+        """Call callback(path, old_record, new_record) after every set or delete
+
+        Callbacks run under the store lock and must be quick. Records are None
+        when there was or is no progress.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, path, old_record, new_record):
+        for callback in self._listeners:
+            try:
+                callback(path, old_record, new_record)
+            except Exception as e:
+                print(f"[PROGRESS] Listener failed for {path}: {e}")
+
+    def _file_mtime(self):
+        try:
+            return self.progress_file.stat().st_mtime
+        except OSError:
+            return None
+
+    def _ensure_loaded(self):
+        """(Re)load the file if it was never read or changed on disk"""
+        now = time.monotonic()
+        if self._checked_at is not None and (self._dirty or now - self._checked_at < RELOAD_CHECK_INTERVAL):
+            self.hits += 1
+            return
+        self._checked_at = now
+        mtime = self._file_mtime()
+        if mtime == self._loaded_mtime:
+            self.hits += 1
+            return
+        self.misses += 1
+        self._entries, self._paths = {}, {}
+        self._loaded_mtime = mtime
+        if mtime is None:
+            return
+        try:
+            with open(self.progress_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') == PROGRESS_FORMAT_VERSION:
+            self._entries = data.get('entries', {})
+            self._paths = data.get('paths', {})
+        else:
+            # Old format: records keyed by absolute path
+            for path, record in data.items():
+                self._entries[path] = dict(record, path=path)
+                self._paths[path] = path
+
+    def get(self, path, fingerprint=None):
+        """Return the progress record of a file, or None"""
+        with self._lock:
+            self._ensure_loaded()
+            if fingerprint and fingerprint in self._entries:
+                return self._entries[fingerprint]
+            key = self._paths.get(path)
+            return self._entries.get(key) if key is not None else None
+
+    def link(self, path, fingerprint):
+        """Associate a scanned path with its fingerprint
+
+        Migrates records still keyed by path and points renamed or moved
+        files at the progress recorded under their fingerprint.
+        """
+        if not fingerprint:
+            return
+        with self._lock:
+            self._ensure_loaded()
+            key = self._paths.get(path)
+            if key == fingerprint:
+                return
+            if fingerprint in self._entries:
+                self._paths[path] = fingerprint
+                self._entries[fingerprint]['path'] = path
+            elif key is not None and key in self._entries:
+                self._entries[fingerprint] = self._entries.pop(key)
+                self._paths[path] = fingerprint
+            else:
+                return
+            self._dirty = True
+
+    def set(self, path, record, fingerprint=None):
+        """Store the progress record of a file"""
+        if fingerprint is None and self.fingerprint_for is not None:
+            fingerprint = self.fingerprint_for(path)
+        with self._lock:
+            self._ensure_loaded()
+            old_key = self._paths.get(path)
+            key = fingerprint or old_key or path
+            old_record = self._entries.get(key)
+            if old_key is not None and old_key != key:
+                old_record = self._entries.pop(old_key, None) or old_record
+                self._repoint(old_key, key)
+            new_record = self._entries[key] = dict(record, path=path)
+            self._paths[path] = key
+            self._dirty = True
+            self._notify(path, old_record, new_record)
+
+    def delete(self, path, fingerprint=None):
+        """Remove the progress of a file, returns True if there was any"""
+        with self._lock:
+            self._ensure_loaded()
+            key = fingerprint if fingerprint in self._entries else self._paths.get(path)
+            if key is None or key not in self._entries:
+                return False
+            old_record = self._entries.pop(key)
+            self._paths = {p: k for p, k in self._paths.items() if k != key}
+            self._dirty = True
+            self._notify(path, old_record, None)
+            return True
+
+    def update_many(self, updates):
+        """Apply (path, record, fingerprint) updates in one step, a None record deletes
+
+        Other threads never see the batch half applied. Returns how many
+        records were stored or deleted.
+        """
+        changed = 0
+        with self._lock:
+            for path, record, fingerprint in updates:
+                if record is None:
+                    changed += self.delete(path, fingerprint)
+                else:
+                    self.set(path, record, fingerprint)
+                    changed += 1
+        return changed
+
+    def _repoint(self, old_key, new_key):
+        for p, k in self._paths.items():
+            if k == old_key:
+                self._paths[p] = new_key
+
+    def save(self):
+        """Write progress.json if anything changed since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'version': PROGRESS_FORMAT_VERSION,
+                'entries': self._entries,
+                'paths': self._paths,
+            }
+            tmp_file = self.progress_file.with_suffix(self.progress_file.suffix + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_file, self.progress_file)
+            self._loaded_mtime = self._file_mtime()
+            self._dirty = False
@@ -0,0 +1,143 @@
+"""
+Trigram search index over library titles
+
+Every entry (a series, movie or episode) is indexed by the trigrams of its
+normalized text, with each word padded like pg_trgm does ("  ab", " abc",
+"bc "), so prefixes weigh more and a typo only breaks a few trigrams.
+Queries gather candidates from their rarest trigrams, then rank them by how
+much of the query they contain, with bonuses for prefix and substring
+matches.
+
+update() takes the full set of documents after every scan and only
+re-indexes entries that were added, removed or renamed.
+"""
+
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+# Postings longer than this fraction of all entries are too common to gather
+# candidates from; they still count when scoring
+COMMON_TRIGRAM_FRACTION = 0.1
+# Candidates scored exactly per query, best trigram overlap first
+CANDIDATE_LIMIT = 1000
+# Minimum fraction of the query's trigrams a result must contain
+MIN_SIMILARITY = 0.4
+
+KIND_BOOST = {'series': 0.05, 'movie': 0.03, 'episode': 0.0}
+
+
+def normalize(text):
+    """Lowercase text with punctuation, dots and underscores turned into single spaces"""
+    return re.sub(r'[\W_]+', ' ', text.casefold()).strip()
+
+
+@lru_cache(maxsize=1 << 16)
+def word_trigrams(word):
+    # Series names and release tags repeat across thousands of files
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigrams(normalized):
+    """Trigrams of normalized text, each word padded with two spaces in front and one behind"""
+    return frozenset().union(*map(word_trigrams, normalized.split()))
+
+
+class SearchEntry:
+    __slots__ = ('text', 'normalized', 'trigrams', 'payload')
+
+    def __init__(self, text, payload):
+        self.text = text
+        self.normalized = normalize(text)
+        self.trigrams = trigrams(self.normalized)
+        self.payload = payload
+
+
+class SearchIndex:
+    """Thread-safe trigram index of documents keyed by id"""
+
+    def __init__(self):
+        self._entries = {}
+        self._postings = defaultdict(set)
+        self._lock = threading.Lock()
+        # Serializes update(), so entries can be built without blocking searches
+        self._update_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add(self, doc_id, entry):
+        self._entries[doc_id] = entry
+        postings = self._postings
+        for gram in entry.trigrams:
+            postings[gram].add(doc_id)
+
+    def _remove(self, doc_id):
+        entry = self._entries.pop(doc_id)
+        for gram in entry.trigrams:
+            posting = self._postings[gram]
+            posting.discard(doc_id)
+            if not posting:
+                del self._postings[gram]
+
+    def update(self, documents):
+        """Bring the index in line with documents ({id: (text, payload)})
+
+        Returns the number of (added, removed, changed) entries.
+        """
+        with self._update_lock:
+            removed = self._entries.keys() - documents.keys()
+            new_entries = {}
+            for doc_id, (text, payload) in documents.items():
+                entry = self._entries.get(doc_id)
+                if entry is not None and entry.text == text:
+                    entry.payload = payload
+                else:
+                    new_entries[doc_id] = SearchEntry(text, payload)
+            changed = new_entries.keys() & self._entries.keys()
+
+            with self._lock:
+                for doc_id in removed | changed:
+                    self._remove(doc_id)
+                for doc_id, entry in new_entries.items():
+                    self._add(doc_id, entry)
+        return len(new_entries) - len(changed), len(removed), len(changed)
+
+    def search(self, query, limit=20, kinds=None):
+        """Best matches for query as payload dicts with a 'score', best first"""
+        normalized = normalize(query)
+        query_grams = trigrams(normalized)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            postings = sorted((self._postings[gram] for gram in query_grams if gram in self._postings), key=len)
+            if not postings:
+                return []
+
+            # Gather candidates from the selective trigrams only
+            cutoff = max(1, int(len(self._entries) * COMMON_TRIGRAM_FRACTION))
+            selective = [posting for posting in postings if len(posting) <= cutoff] or postings[:1]
+            counts = Counter()
+            for posting in selective:
+                counts.update(posting)
+
+            results = []
+            for doc_id, _ in counts.most_common(max(CANDIDATE_LIMIT, limit * 10)):
+                entry = self._entries[doc_id]
+                if kinds and entry.payload['kind'] not in kinds:
+                    continue
+                common = len(query_grams & entry.trigrams)
+                containment = common / len(query_grams)
+                if containment < MIN_SIMILARITY:
+                    continue
+                dice = 2 * common / (len(query_grams) + len(entry.trigrams))
+                score = 0.7 * containment + 0.3 * dice + KIND_BOOST.get(entry.payload['kind'], 0)
+                if normalized in entry.normalized:
+                    score += 0.2 if entry.normalized.startswith(normalized) else 0.1
+                results.append((score, entry.text, entry.payload))
+
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return [dict(payload, score=round(score, 3)) for score, _, payload in results[:limit]]
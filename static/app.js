@@ -1,5 +1,20 @@
-// API Base URL
-const API_BASE = 'http://localhost:5000/api';
+// API Base URL (relative, so the library also works from other machines on the LAN)
+const API_BASE = `${window.location.origin}/api`;
+
+// Save browser playback progress at most this often (ms)
+const STREAM_PROGRESS_INTERVAL = 15000;
+
+// Delay after the last keystroke before searching (ms)
+const SEARCH_DEBOUNCE = 150;
+
+// Long lists render only what is within this many pixels of the viewport
+const VIRTUAL_OVERSCAN = 800;
+// Space left above a series scrolled to from search (px)
+const VIRTUAL_SCROLL_MARGIN = 20;
+// Height of a movie card row before it has been measured (px)
+const MOVIE_CARD_HEIGHT = 250;
+// Covers start loading when their card is this close to the viewport
+const COVER_PRELOAD_MARGIN = '300px';
 
 // Global state
 let library = { series: {}, movies: [] };
@@ -8,27 +23,70 @@ let vlcMonitorInterval = null;
 let contextMenuTarget = null;
 let isDesktopApp = false;
 let desktopBridge = null;
+let activeScanId = null;
+let libraryPainted = false;
+let libraryPaintReported = false;
+let searchTimer = null;
+let searchRequestId = 0;
+let itemsByPath = new Map();
+let moviesList = null;
+let seriesList = null;
+let expandedSeasons = new Set();
+let seriesHtmlCache = new Map();
+let virtualUpdateFrame = null;
+let virtualResizePending = false;
 
 // Initialize the app
 document.addEventListener('DOMContentLoaded', () => {
-    // Check if running as desktop app
-    document.addEventListener('desktopBridgeReady', () => {
+    // Check if running as desktop app (the bridge is injected after page load)
+    window.addEventListener('desktopBridgeReady', () => {
         isDesktopApp = true;
         desktopBridge = window.desktopBridge;
         console.log('Desktop bridge connected!');
+        
+        // The embedded player handles progress, external VLC is never used
+        if (vlcMonitorInterval) {
+            clearInterval(vlcMonitorInterval);
+            vlcMonitorInterval = null;
+        }
+        reportLibraryPainted();
     });
     
-    // Give the bridge a moment to initialize
-    setTimeout(() => {
-        loadLibrary();
-        setupEventListeners();
-        startVLCMonitor();
-    }, 100);
+    const moviesGrid = document.getElementById('moviesGrid');
+    moviesList = new VirtualList(moviesGrid, {
+        render: createMediaCard,
+        keyOf: movie => movie.path,
+        columns: () => gridColumnCount(moviesGrid),
+        estimateHeight: () => MOVIE_CARD_HEIGHT
+    });
+    seriesList = new VirtualList(document.getElementById('seriesContainer'), {
+        render: renderSeriesEntry,
+        keyOf: entry => entry.seriesName,
+        estimateHeight: estimateSeriesHeight
+    });
+    
+    loadLibrary();
+    setupEventListeners();
+    startVLCMonitor();
 });
 
 // Setup event listeners
 function setupEventListeners() {
-    document.getElementById('refreshBtn').addEventListener('click', loadLibrary);
+    document.getElementById('refreshBtn').addEventListener('click', refreshLibrary);
+    document.getElementById('cancelScanBtn').addEventListener('click', cancelScan);
+    setupWatchButtonListeners();
+    
+    // Keep the rendered window of the long lists in view
+    window.addEventListener('scroll', scheduleVirtualUpdate, { passive: true });
+    window.addEventListener('resize', () => scheduleVirtualUpdate(true));
+    
+    // Expand or collapse a season
+    document.getElementById('seriesContainer').addEventListener('click', (event) => {
+        const header = event.target.closest('.season-header');
+        if (header) {
+            toggleSeason(header.dataset.series, header.dataset.season);
+        }
+    });
     
     // Close modal when clicking outside
     document.getElementById('episodeModal').addEventListener('click', (e) => {
@@ -37,9 +95,36 @@ function setupEventListeners() {
         }
     });
     
-    // Close context menu when clicking anywhere
+    // Close context menu and search results when clicking anywhere
     document.addEventListener('click', () => {
         document.getElementById('contextMenu').style.display = 'none';
+        hideSearchResults();
+    });
+    
+    // Mark a whole season or series watched/unwatched
+    document.addEventListener('click', (event) => {
+        const button = event.target.closest('.batch-watch-btn');
+        if (button) {
+            event.preventDefault();
+            event.stopPropagation();
+            markGroup(button.dataset.action, button.dataset.series, button.dataset.season);
+        }
+    }, true);
+    
+    // Search as you type
+    const searchInput = document.getElementById('searchInput');
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => searchLibrary(searchInput.value), SEARCH_DEBOUNCE);
+    });
+    searchInput.addEventListener('keydown', handleSearchKeydown);
+    searchInput.addEventListener('click', (e) => e.stopPropagation());
+    document.getElementById('searchResults').addEventListener('click', (e) => {
+        e.stopPropagation();
+        const result = e.target.closest('.search-result');
+        if (result) {
+            openSearchResult(result);
+        }
     });
     
     // Prevent context menu from closing when clicking inside it
@@ -69,18 +154,180 @@ async function loadLibrary() {
     try {
         const response = await fetch(`${API_BASE}/library`);
         library = await response.json();
+        indexLibrary();
         
         renderLibrary();
         updateStats();
         
-        // Setup watch button listeners after rendering
-        setupWatchButtonListeners();
+        libraryPainted = true;
+        reportLibraryPainted();
     } catch (error) {
         console.error('Error loading library:', error);
         showError('Failed to load media library');
     }
 }
 
+// Look up episodes and movies by path without walking the library
+function indexLibrary() {
+    itemsByPath = new Map();
+    for (const seasons of Object.values(library.series)) {
+        for (const episodes of Object.values(seasons)) {
+            for (const episode of episodes) {
+                itemsByPath.set(episode.path, episode);
+            }
+        }
+    }
+    for (const movie of library.movies) {
+        itemsByPath.set(movie.path, movie);
+    }
+}
+
+// Tell the desktop app when the library is first on screen (startup timing)
+function reportLibraryPainted() {
+    if (!libraryPainted || libraryPaintReported || !desktopBridge) return;
+    libraryPaintReported = true;
+    requestAnimationFrame(() => desktopBridge.libraryPainted());
+}
+
+// Rescan the media folder in the background and show its progress
+async function refreshLibrary() {
+    if (activeScanId) return;
+    
+    const refreshBtn = document.getElementById('refreshBtn');
+    const cancelBtn = document.getElementById('cancelScanBtn');
+    
+    try {
+        const response = await fetch(`${API_BASE}/scan`, { method: 'POST' });
+        let job = await response.json();
+        activeScanId = job.id;
+        refreshBtn.disabled = true;
+        cancelBtn.style.display = 'inline-block';
+        
+        while (job.state === 'running') {
+            showScanProgress(job);
+            await new Promise(resolve => setTimeout(resolve, 500));
+            const statusResponse = await fetch(`${API_BASE}/scan/${job.id}`);
+            job = await statusResponse.json();
+        }
+        
+        if (job.state === 'completed') {
+            await loadLibrary();
+        } else if (job.state === 'cancelled') {
+            showNotification('Scan cancelled');
+            updateStats();
+        } else {
+            showError(`Scan failed: ${job.error || 'unknown error'}`);
+            updateStats();
+        }
+    } catch (error) {
+        console.error('Error scanning library:', error);
+        showError('Failed to scan media library');
+    } finally {
+        activeScanId = null;
+        refreshBtn.disabled = false;
+        cancelBtn.style.display = 'none';
+    }
+}
+
+// Cancel the running scan
+async function cancelScan() {
+    if (!activeScanId) return;
+    
+    try {
+        await fetch(`${API_BASE}/scan/${activeScanId}/cancel`, { method: 'POST' });
+    } catch (error) {
+        console.error('Error cancelling scan:', error);
+    }
+}
+
+// Show scan progress in the header
+function showScanProgress(job) {
+    document.getElementById('statsText').textContent = 
+        `Scanning... ${job.dirs_visited} folders • ${job.files_classified} files • ${job.elapsed.toFixed(1)}s`;
+}
+
+// Search the library on the server
+async function searchLibrary(query) {
+    const requestId = ++searchRequestId;
+    query = query.trim();
+    if (!query) {
+        hideSearchResults();
+        return;
+    }
+    
+    try {
+        const response = await fetch(`${API_BASE}/search?q=${encodeURIComponent(query)}&limit=15`);
+        const data = await response.json();
+        // Ignore answers to queries the user has already typed past
+        if (requestId === searchRequestId) {
+            renderSearchResults(data.results || []);
+        }
+    } catch (error) {
+        console.error('Search failed:', error);
+    }
+}
+
+// Show search results below the search box
+function renderSearchResults(results) {
+    const container = document.getElementById('searchResults');
+    
+    if (results.length === 0) {
+        container.innerHTML = '<div class="search-empty">No matches</div>';
+    } else {
+        container.innerHTML = results.map(result => `
+            <div class="search-result" data-kind="${result.kind}" data-path="${escapeHtml(result.path || '')}" data-title="${escapeHtml(result.title)}">
+                <span class="search-result-kind">${result.kind}</span>
+                <span class="search-result-title">${escapeHtml(result.title)}</span>
+            </div>
+        `).join('');
+    }
+    container.style.display = 'block';
+}
+
+function hideSearchResults() {
+    document.getElementById('searchResults').style.display = 'none';
+}
+
+// Arrow keys move through the results, Enter opens one, Escape closes them
+function handleSearchKeydown(event) {
+    const results = [...document.querySelectorAll('#searchResults .search-result')];
+    const active = results.findIndex(result => result.classList.contains('active'));
+    
+    if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+        event.preventDefault();
+        if (results.length === 0) return;
+        const next = event.key === 'ArrowDown'
+            ? (active + 1) % results.length
+            : (active - 1 + results.length) % results.length;
+        results.forEach((result, i) => result.classList.toggle('active', i === next));
+        results[next].scrollIntoView({ block: 'nearest' });
+    } else if (event.key === 'Enter') {
+        const result = results[active >= 0 ? active : 0];
+        if (result) {
+            openSearchResult(result);
+        }
+    } else if (event.key === 'Escape') {
+        hideSearchResults();
+    }
+}
+
+// Play a movie or episode result, or scroll to a series
+function openSearchResult(result) {
+    hideSearchResults();
+    
+    if (result.dataset.kind === 'series') {
+        // The series may not be rendered yet, scroll the list to it first
+        const index = seriesList.items.findIndex(entry => entry.seriesName === result.dataset.title);
+        const seriesItem = index >= 0 ? seriesList.scrollToIndex(index) : null;
+        if (seriesItem) {
+            seriesItem.classList.add('highlight');
+            setTimeout(() => seriesItem.classList.remove('highlight'), 2000);
+        }
+    } else if (result.dataset.path) {
+        playMedia(result.dataset.path);
+    }
+}
+
 // Render the entire library
 function renderLibrary() {
     renderContinueWatching();
@@ -88,6 +335,212 @@ function renderLibrary() {
     renderSeries();
 }
 
+// Renders only the part of a long list that is near the viewport. Items are
+// laid out in rows of columns() items (1 for a plain list); rows outside the
+// window are replaced by padding, sized from their measured height once they
+// have been on screen and from estimateHeight() until then.
+class VirtualList {
+    constructor(container, { render, keyOf, columns = () => 1, estimateHeight }) {
+        this.container = container;
+        this.render = render;
+        this.keyOf = keyOf;
+        this.columns = columns;
+        this.estimateHeight = estimateHeight;
+        this.items = [];
+        this.cols = 1;
+        this.heights = [];    // Measured height by row
+        this.offsets = null;  // Top of every row (and the end), rebuilt when heights change
+        container.classList.add('virtual-list');
+    }
+    
+    setItems(items) {
+        this.items = items;
+        this.offsets = null;
+        this.resize();
+    }
+    
+    // Column count or widths changed, measured heights no longer apply
+    resize() {
+        const cols = Math.max(1, this.columns());
+        if (cols !== this.cols) {
+            this.cols = cols;
+            this.heights = [];
+        }
+        this.offsets = null;
+        this.update();
+    }
+    
+    layout() {
+        if (this.offsets) return;
+        this.gap = parseFloat(getComputedStyle(this.container).rowGap) || 0;
+        const rows = Math.ceil(this.items.length / this.cols);
+        const offsets = new Float64Array(rows + 1);
+        for (let row = 0; row < rows; row++) {
+            const height = this.heights[row] ?? this.estimateHeight(this.items[row * this.cols]);
+            offsets[row + 1] = offsets[row] + height + this.gap;
+        }
+        this.offsets = offsets;
+    }
+    
+    setPadding(first, last) {
+        const rows = this.offsets.length - 1;
+        this.container.style.paddingTop = `${this.offsets[first]}px`;
+        this.container.style.paddingBottom = `${Math.max(0, this.offsets[rows] - this.offsets[last])}px`;
+    }
+    
+    // Render the rows overlapping the viewport (plus VIRTUAL_OVERSCAN)
+    update() {
+        if (this.items.length === 0) {
+            this.container.style.paddingTop = this.container.style.paddingBottom = '';
+            return;
+        }
+        this.layout();
+        const rows = this.offsets.length - 1;
+        const top = -this.container.getBoundingClientRect().top;
+        const first = Math.min(rows - 1, Math.max(0, upperBound(this.offsets, top - VIRTUAL_OVERSCAN) - 1));
+        const last = Math.max(first + 1, Math.min(rows, lowerBound(this.offsets, top + window.innerHeight + VIRTUAL_OVERSCAN)));
+        
+        this.setPadding(first, last);
+        patchChildren(this.container, this.items.slice(first * this.cols, last * this.cols), this.keyOf, this.render);
+        
+        // Grid items stretch to their row's height, so the first item of a row measures it
+        const children = this.container.children;
+        let changed = false;
+        for (let row = first; row < last; row++) {
+            const height = children[(row - first) * this.cols].offsetHeight;
+            if (this.heights[row] !== height) {
+                this.heights[row] = height;
+                changed = true;
+            }
+        }
+        if (changed) {
+            this.offsets = null;
+            this.layout();
+            this.setPadding(first, last);
+        }
+    }
+    
+    // Scroll the page so the item at index is at the top, returns its element
+    scrollToIndex(index) {
+        const row = Math.floor(index / this.cols);
+        // Twice, as rendering the rows above can correct their estimated heights
+        for (let pass = 0; pass < 2; pass++) {
+            this.layout();
+            const top = this.container.getBoundingClientRect().top + window.scrollY + this.offsets[row];
+            window.scrollTo(0, top - VIRTUAL_SCROLL_MARGIN);
+            this.update();
+        }
+        return [...this.container.children].find(child => child.dataset.key === this.keyOf(this.items[index]));
+    }
+}
+
+// First index whose value is >= target / > target in a sorted array
+function lowerBound(values, target) {
+    let low = 0, high = values.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (values[mid] < target) low = mid + 1; else high = mid;
+    }
+    return low;
+}
+
+function upperBound(values, target) {
+    let low = 0, high = values.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (values[mid] <= target) low = mid + 1; else high = mid;
+    }
+    return low;
+}
+
+// Make container's children the rendered items, in order. Elements are keyed
+// by keyOf(item): an element whose markup did not change is kept as it is
+// (with its loaded cover), only new and changed items are built.
+function patchChildren(container, items, keyOf, render) {
+    const existing = new Map();
+    for (const child of container.children) {
+        if (child.dataset.key !== undefined) {
+            existing.set(child.dataset.key, child);
+        }
+    }
+    
+    const wanted = items.map(item => {
+        const key = String(keyOf(item));
+        const html = render(item);
+        let element = existing.get(key);
+        if (!element || element.renderedHtml !== html) {
+            const template = document.createElement('template');
+            template.innerHTML = html.trim();
+            element = template.content.firstElementChild;
+            element.dataset.key = key;
+            element.renderedHtml = html;
+            observeCovers(element);
+        }
+        return element;
+    });
+    
+    const keep = new Set(wanted);
+    for (const child of [...container.children]) {
+        if (!keep.has(child)) {
+            unobserveCovers(child);
+            child.remove();
+        }
+    }
+    wanted.forEach((element, i) => {
+        if (container.children[i] !== element) {
+            container.insertBefore(element, container.children[i] || null);
+        }
+    });
+}
+
+// Covers are only requested once their card comes close to the viewport
+const coverObserver = 'IntersectionObserver' in window
+    ? new IntersectionObserver(entries => {
+        for (const entry of entries) {
+            if (entry.isIntersecting) {
+                const img = entry.target;
+                img.src = img.dataset.src;
+                coverObserver.unobserve(img);
+            }
+        }
+    }, { rootMargin: COVER_PRELOAD_MARGIN })
+    : null;
+
+function observeCovers(element) {
+    for (const img of element.querySelectorAll('img[data-src]')) {
+        if (coverObserver) {
+            coverObserver.observe(img);
+        } else {
+            // loading="lazy" still defers them
+            img.src = img.dataset.src;
+        }
+    }
+}
+
+function unobserveCovers(element) {
+    if (!coverObserver) return;
+    for (const img of element.querySelectorAll('img[data-src]')) {
+        coverObserver.unobserve(img);
+    }
+}
+
+// Re-render the visible part of the lists, at most once per frame
+function scheduleVirtualUpdate(resized) {
+    virtualResizePending = virtualResizePending || resized === true;
+    if (virtualUpdateFrame) return;
+    virtualUpdateFrame = requestAnimationFrame(() => {
+        virtualUpdateFrame = null;
+        for (const list of [moviesList, seriesList]) {
+            if (virtualResizePending) {
+                list.resize();
+            } else {
+                list.update();
+            }
+        }
+        virtualResizePending = false;
+    });
+}
+
 // Render continue watching section
 function renderContinueWatching() {
     const section = document.getElementById('continueWatchingSection');
@@ -136,50 +589,56 @@ function renderContinueWatching() {
     }
     
     section.style.display = 'block';
-    grid.innerHTML = inProgress.slice(0, 6).map(item => createMediaCard(item)).join('');
+    patchChildren(grid, inProgress.slice(0, 6), item => item.path, createMediaCard);
 }
 
 // Render series
 function renderSeries() {
     const container = document.getElementById('seriesContainer');
+    seriesHtmlCache.clear();
     
     if (Object.keys(library.series).length === 0) {
+        seriesList.setItems([]);
         container.innerHTML = '<div class="empty-state"><div class="empty-state-icon">📺</div><div class="empty-state-text">No TV series found</div></div>';
         return;
     }
     
-    // Get entries and sort by last watched date (most recent first)
-    const seriesEntries = Object.entries(library.series);
-    seriesEntries.sort(([nameA, seasonsA], [nameB, seasonsB]) => {
-        // Find the latest last_played date in each series
-        const getLatestDate = (seasons) => {
-            let latestDate = null;
-            for (const episodes of Object.values(seasons)) {
-                for (const episode of episodes) {
-                    if (episode.last_played) {
-                        const episodeDate = new Date(episode.last_played);
-                        if (!latestDate || episodeDate > latestDate) {
-                            latestDate = episodeDate;
-                        }
-                    }
+    // Most recently watched first, unwatched series alphabetically at the bottom.
+    // last_played is an ISO timestamp, so the latest one is the largest string
+    const seriesEntries = Object.entries(library.series).map(([seriesName, seasons]) => {
+        let latest = '';
+        for (const episodes of Object.values(seasons)) {
+            for (const episode of episodes) {
+                if (episode.last_played && episode.last_played > latest) {
+                    latest = episode.last_played;
                 }
             }
-            return latestDate;
-        };
-        
-        const dateA = getLatestDate(seasonsA);
-        const dateB = getLatestDate(seasonsB);
-        
-        // Most recent first (null dates go to bottom)
-        if (!dateA && !dateB) return nameA.localeCompare(nameB); // Alphabetical if both unwatched
-        if (!dateA) return 1; // Unwatched goes down
-        if (!dateB) return -1; // Unwatched goes down
-        return dateB - dateA; // Most recent first
+        }
+        return { seriesName, seasons, latest };
+    });
+    seriesEntries.sort((a, b) => {
+        if (!a.latest && !b.latest) return a.seriesName.localeCompare(b.seriesName);
+        if (!a.latest) return 1;
+        if (!b.latest) return -1;
+        return a.latest < b.latest ? 1 : (a.latest > b.latest ? -1 : 0);
     });
     
-    container.innerHTML = seriesEntries
-        .map(([seriesName, seasons]) => createSeriesCard(seriesName, seasons))
-        .join('');
+    seriesList.setItems(seriesEntries);
+}
+
+// Series markup only changes when the library is reloaded or a season is toggled
+function renderSeriesEntry(entry) {
+    let html = seriesHtmlCache.get(entry.seriesName);
+    if (html === undefined) {
+        html = createSeriesCard(entry.seriesName, entry.seasons);
+        seriesHtmlCache.set(entry.seriesName, html);
+    }
+    return html;
+}
+
+// Rough height of a series card before it has been rendered (seasons collapsed)
+function estimateSeriesHeight(entry) {
+    return 110 + Object.keys(entry.seasons).length * 105;
 }
 
 // Render movies
@@ -187,11 +646,18 @@ function renderMovies() {
     const grid = document.getElementById('moviesGrid');
     
     if (library.movies.length === 0) {
+        moviesList.setItems([]);
         grid.innerHTML = '<div class="empty-state"><div class="empty-state-icon">🎬</div><div class="empty-state-text">No movies found</div></div>';
         return;
     }
     
-    grid.innerHTML = library.movies.map(movie => createMediaCard(movie)).join('');
+    moviesList.setItems(library.movies);
+}
+
+// Number of columns the browser resolved for an auto-fill grid
+function gridColumnCount(grid) {
+    const columns = getComputedStyle(grid).gridTemplateColumns;
+    return columns && columns !== 'none' ? columns.split(' ').length : 1;
 }
 
 // Create a media card
@@ -202,8 +668,10 @@ function createMediaCard(item) {
     
     return `
         <div class="media-card ${completed}" data-path="${escapeHtml(item.path)}" onclick="playMediaFromCard(this)" oncontextmenu="showContextMenuFromCard(event, this)">
-            <div class="media-card-thumbnail" style="background-image: url('${item.cover_url || ''}'); background-size: cover; background-position: center;">
-                ${item.cover_url ? '' : (item.type === 'episode' ? '📺' : '🎬')}
+            <div class="media-card-thumbnail">
+                ${item.cover_url
+                    ? `<img class="media-card-cover" data-src="${escapeHtml(item.cover_url)}" loading="lazy" decoding="async" alt="">`
+                    : (item.type === 'episode' ? '📺' : '🎬')}
                 <div class="media-card-overlay">
                     <button class="watch-button" type="button" data-path="${escapeHtml(item.path)}">
                         ${completed ? '✓ Watched' : 'Mark Watched'}
@@ -231,10 +699,13 @@ function createSeriesCard(seriesName, seasons) {
         sum + eps.filter(ep => ep.completed).length, 0);
     
     return `
-        <div class="series-item">
+        <div class="series-item" data-series="${escapeHtml(seriesName)}">
             <div class="series-header">
                 <div class="series-title">📺 ${escapeHtml(seriesName)}</div>
-                <div class="series-stats">${Object.keys(seasons).length} Season${Object.keys(seasons).length !== 1 ? 's' : ''} • ${totalEpisodes} Episodes • ${watchedEpisodes} Watched</div>
+                <div class="series-actions">
+                    <div class="series-stats">${Object.keys(seasons).length} Season${Object.keys(seasons).length !== 1 ? 's' : ''} • ${totalEpisodes} Episodes • ${watchedEpisodes} Watched</div>
+                    ${createBatchWatchButton(seriesName, null, watchedEpisodes === totalEpisodes)}
+                </div>
             </div>
             <div class="seasons-container">
                 ${Object.entries(seasons)
@@ -246,27 +717,43 @@ function createSeriesCard(seriesName, seasons) {
     `;
 }
 
-// Create a season card
+// Create a season card, with its episodes only while it is expanded
 function createSeasonCard(seriesName, seasonNum, episodes) {
-    const seasonId = `season-${seriesName.replace(/\s/g, '-')}-${seasonNum}`;
+    const expanded = expandedSeasons.has(seasonKey(seriesName, seasonNum));
     const watchedCount = episodes.filter(ep => ep.completed).length;
     
     return `
         <div class="season-item">
-            <div class="season-header" onclick="toggleSeason('${seasonId}')">
+            <div class="season-header" data-series="${escapeHtml(seriesName)}" data-season="${seasonNum}">
                 <div>
                     <div class="season-title">Season ${seasonNum}</div>
                     <div class="season-episodes">${watchedCount}/${episodes.length} Episodes Watched</div>
                 </div>
-                <div class="season-toggle" id="${seasonId}-toggle">▼</div>
-            </div>
-            <div class="episodes-grid" id="${seasonId}" style="display: grid;">
-                ${episodes.map(episode => createEpisodeCard(episode)).join('')}
+                <div class="series-actions">
+                    ${createBatchWatchButton(seriesName, seasonNum, watchedCount === episodes.length)}
+                    <div class="season-toggle">${expanded ? '▼' : '▶'}</div>
+                </div>
             </div>
+            ${expanded ? `
+                <div class="episodes-grid">
+                    ${episodes.map(episode => createEpisodeCard(episode)).join('')}
+                </div>
+            ` : ''}
         </div>
     `;
 }
 
+// Button marking a whole series (season null) or season watched, or unwatched once it all is
+function createBatchWatchButton(seriesName, seasonNum, allWatched) {
+    const label = allWatched ? 'Mark Unwatched' : (seasonNum === null ? 'Mark Series Watched' : 'Mark Season Watched');
+    return `
+        <button class="btn btn-small btn-secondary batch-watch-btn" type="button"
+                data-series="${escapeHtml(seriesName)}"
+                ${seasonNum === null ? '' : `data-season="${seasonNum}"`}
+                data-action="${allWatched ? 'unwatched' : 'watched'}">${label}</button>
+    `;
+}
+
 // Create an episode card
 function createEpisodeCard(episode) {
     const progressPercent = episode.progress_percent || 0;
@@ -291,18 +778,18 @@ function createEpisodeCard(episode) {
     `;
 }
 
-// Toggle season visibility
-function toggleSeason(seasonId) {
-    const seasonEl = document.getElementById(seasonId);
-    const toggleEl = document.getElementById(`${seasonId}-toggle`);
-    
-    if (seasonEl.style.display === 'none') {
-        seasonEl.style.display = 'grid';
-        toggleEl.textContent = '▼';
-    } else {
-        seasonEl.style.display = 'none';
-        toggleEl.textContent = '▶';
+function seasonKey(seriesName, seasonNum) {
+    return `${seriesName}\u0000${seasonNum}`;
+}
+
+// Expand or collapse a season, building its episode cards only when shown
+function toggleSeason(seriesName, seasonNum) {
+    const key = seasonKey(seriesName, seasonNum);
+    if (!expandedSeasons.delete(key)) {
+        expandedSeasons.add(key);
     }
+    seriesHtmlCache.delete(seriesName);
+    seriesList.update();
 }
 
 // Play media from card element
@@ -496,24 +983,39 @@ async function resetProgress() {
     document.getElementById('contextMenu').style.display = 'none';
 }
 
+// Apply watched/unwatched/reset to paths, a series or a season in one request
+async function batchProgress(action, target) {
+    const response = await fetch(`${API_BASE}/progress/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ action, ...target })
+    });
+    if (!response.ok) {
+        throw new Error(`Batch progress update failed: ${response.status}`);
+    }
+    return response.json();
+}
+
+// Mark a whole series, or one season of it, watched or unwatched
+async function markGroup(action, seriesName, seasonNum) {
+    const target = seasonNum ? { series: seriesName, season: parseInt(seasonNum) } : { series: seriesName };
+    
+    try {
+        const result = await batchProgress(action, target);
+        showNotification(`${result.updated} episode${result.updated !== 1 ? 's' : ''} marked ${action}`);
+        await loadLibrary();
+    } catch (error) {
+        console.error('Error updating watch status:', error);
+        showError('Failed to update watch status');
+    }
+}
+
 // Mark as watched
 async function markAsWatched() {
     if (!contextMenuTarget) return;
     
-    const item = findItemByPath(contextMenuTarget);
-    const duration = item ? item.duration : 3600; // Default 1 hour
-    
     try {
-        await fetch(`${API_BASE}/progress`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ 
-                path: contextMenuTarget, 
-                position: duration, 
-                duration: duration, 
-                completed: true 
-            })
-        });
+        await batchProgress('watched', { paths: [contextMenuTarget] });
         
         showNotification('Marked as watched');
         await loadLibrary();
@@ -538,23 +1040,8 @@ async function toggleWatched(path) {
     
     try {
         const newCompleted = !item.completed;
-        const position = newCompleted ? (item.duration || 3600) : 0;
-        const duration = item.duration || 3600;
         
-        console.log('Sending update:', { path, position, duration, completed: newCompleted });
-        
-        const response = await fetch(`${API_BASE}/progress`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ 
-                path: path, 
-                position: position, 
-                duration: duration, 
-                completed: newCompleted 
-            })
-        });
-        
-        console.log('Response status:', response.status);
+        await batchProgress(newCompleted ? 'watched' : 'unwatched', { paths: [path] });
         
         showNotification(newCompleted ? 'Marked as watched' : 'Marked as unwatched');
         await loadLibrary();
@@ -564,34 +1051,87 @@ async function toggleWatched(path) {
     }
 }
 
+// Play media in the browser through the streaming endpoint
+function streamMedia() {
+    const path = contextMenuTarget;
+    document.getElementById('contextMenu').style.display = 'none';
+    if (!path) return;
+    
+    const item = findItemByPath(path);
+    const startTime = item ? item.current_time : 0;
+    
+    document.getElementById('modalTitle').textContent = getItemName(path);
+    const body = document.getElementById('modalBody');
+    body.innerHTML = '';
+    
+    const video = document.createElement('video');
+    video.className = 'stream-player';
+    video.controls = true;
+    video.autoplay = true;
+    video.preload = 'metadata';
+    video.src = `${API_BASE}/stream?path=${encodeURIComponent(path)}`;
+    video.dataset.path = path;
+    
+    let lastSaved = 0;
+    const saveStreamProgress = (force) => {
+        const now = Date.now();
+        if (!video.duration || (!force && now - lastSaved < STREAM_PROGRESS_INTERVAL)) return;
+        lastSaved = now;
+        updateProgress(path, video.currentTime, video.duration, false);
+    };
+    
+    video.addEventListener('loadedmetadata', () => {
+        if (startTime > 0 && startTime < video.duration) {
+            video.currentTime = startTime;
+        }
+    });
+    video.addEventListener('timeupdate', () => saveStreamProgress(false));
+    video.addEventListener('pause', () => saveStreamProgress(true));
+    video.addEventListener('ended', () => {
+        updateProgress(path, video.duration, video.duration, true);
+    });
+    video.addEventListener('error', () => {
+        showError('This video cannot be played in the browser, try VLC instead');
+    });
+    
+    body.appendChild(video);
+    document.getElementById('episodeModal').classList.add('active');
+}
+
 // Close modal
 function closeModal() {
+    const video = document.querySelector('#modalBody video');
+    if (video) {
+        if (!video.ended && video.duration) {
+            updateProgress(video.dataset.path, video.currentTime, video.duration, false);
+        }
+        video.pause();
+        video.removeAttribute('src');
+        video.load();
+    }
+    document.getElementById('modalBody').innerHTML = '';
     document.getElementById('episodeModal').classList.remove('active');
 }
 
 // Update stats
-function updateStats() {
-    const seriesCount = Object.keys(library.series).length;
-    const movieCount = library.movies.length;
-    const totalEpisodes = Object.values(library.series).reduce((sum, seasons) => 
-        sum + Object.values(seasons).reduce((s, eps) => s + eps.length, 0), 0);
-    
-    document.getElementById('statsText').textContent = 
-        `${seriesCount} Series • ${totalEpisodes} Episodes • ${movieCount} Movies`;
+async function updateStats() {
+    // Totals are kept up to date by the server, no need to walk the library here
+    try {
+        const response = await fetch(`${API_BASE}/stats?days=1`);
+        const stats = await response.json();
+        const totals = stats.totals;
+        
+        document.getElementById('statsText').textContent = 
+            `${Object.keys(stats.series).length} Series • ${totals.episodes} Episodes ` +
+            `(${totals.episodes_watched} Watched) • ${totals.movies} Movies • ${formatFileSize(totals.bytes)}`;
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
 }
 
 // Helper functions
 function findItemByPath(path) {
-    // Search in series
-    for (const seasons of Object.values(library.series)) {
-        for (const episodes of Object.values(seasons)) {
-            const episode = episodes.find(ep => ep.path === path);
-            if (episode) return episode;
-        }
-    }
-    
-    // Search in movies
-    return library.movies.find(movie => movie.path === path);
+    return itemsByPath.get(path);
 }
 
 function getItemName(path) {
@@ -607,10 +1147,10 @@ function formatFileSize(bytes) {
     return Math.round(bytes / Math.pow(k, i) * 100) / 100 + ' ' + sizes[i];
 }
 
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
 function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+    return String(text ?? '').replace(/[&<>"']/g, char => HTML_ESCAPES[char]);
 }
 
 function showNotification(message) {
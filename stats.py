@@ -0,0 +1,220 @@
+"""
+Running watch statistics and library aggregates
+
+LibraryStats keeps counters per series, per top-level folder and in total
+(files, bytes, watched episodes, watch time) plus seconds watched per day.
+Publishing a scan only touches the files that were added, removed or
+changed, and every progress write adjusts the counters of one file, so
+/api/stats never has to walk the library.
+
+Watch activity is the sum of small forward steps between progress saves
+reported by a player, each at most the time that passed between the two
+saves; larger jumps are seeks, and batch or "mark watched" writes never
+count. It is kept in a JSON file so it survives restarts.
+"""
+
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Largest position step between two progress saves counted as watching (seconds)
+ACTIVITY_MAX_STEP = 120
+# Days of watch activity kept in the activity file
+ACTIVITY_DAYS_KEPT = 365
+
+# Indexes into the per-file entries
+SERIES, ROOT, SIZE, WATCHED, WATCH_TIME = range(5)
+
+
+def progress_contribution(record):
+    """(watched, seconds watched) of a progress record or file_info"""
+    if not record:
+        return False, 0.0
+    completed = bool(record.get('completed'))
+    duration = record.get('duration') or 0
+    position = record.get('position', record.get('current_time', 0)) or 0
+    if completed:
+        return True, float(duration or position)
+    return False, float(min(position, duration) if duration else position)
+
+
+class LibraryStats:
+    """Aggregates over the published library, updated incrementally"""
+
+    def __init__(self, activity_file=None):
+        self.activity_file = Path(activity_file) if activity_file else None
+        self._files = {}
+        self._series = {}
+        self._roots = {}
+        self._totals = {'files': 0, 'episodes': 0, 'movies': 0, 'bytes': 0,
+                        'watched': 0, 'episodes_watched': 0, 'watch_time': 0.0}
+        self._activity = self._load_activity()
+        self._activity_dirty = False
+        self._lock = threading.Lock()
+        # Serializes writers of the activity file, which share one temp file
+        self._save_lock = threading.Lock()
+
+    def _load_activity(self):
+        if self.activity_file is None or not self.activity_file.exists():
+            return {}
+        try:
+            with open(self.activity_file, 'r', encoding='utf-8') as f:
+                return {day: float(seconds) for day, seconds in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _apply_file(self, entry, sign):
+        """Add (sign=1) or remove (sign=-1) a file's size and count"""
+        series_name = entry[SERIES]
+        totals = self._totals
+        totals['files'] += sign
+        totals['bytes'] += sign * entry[SIZE]
+        if series_name is None:
+            totals['movies'] += sign
+        else:
+            totals['episodes'] += sign
+            series = self._series.get(series_name)
+            if series is None:
+                series = self._series[series_name] = {'episodes': 0, 'watched': 0, 'bytes': 0, 'watch_time': 0.0}
+            series['episodes'] += sign
+            series['bytes'] += sign * entry[SIZE]
+            if series['episodes'] == 0:
+                del self._series[series_name]
+
+        root = self._roots.get(entry[ROOT])
+        if root is None:
+            root = self._roots[entry[ROOT]] = {'files': 0, 'bytes': 0}
+        root['files'] += sign
+        root['bytes'] += sign * entry[SIZE]
+        if root['files'] == 0:
+            del self._roots[entry[ROOT]]
+
+    def _apply_progress(self, entry, sign):
+        """Add or remove a file's watched flag and watch time"""
+        watched = sign if entry[WATCHED] else 0
+        self._totals['watched'] += watched
+        self._totals['watch_time'] += sign * entry[WATCH_TIME]
+        series = self._series.get(entry[SERIES]) if entry[SERIES] is not None else None
+        if series is not None:
+            self._totals['episodes_watched'] += watched
+            series['watched'] += watched
+            series['watch_time'] += sign * entry[WATCH_TIME]
+
+    def apply_library(self, library, media_root):
+        """Bring the aggregates in line with a newly published library
+
+        Returns the number of (added, removed, changed) files.
+        """
+        current = {}
+        for series_name, seasons in library['series'].items():
+            for episodes in seasons.values():
+                for episode in episodes:
+                    current[episode['path']] = (series_name, episode)
+        for movie in library['movies']:
+            current[movie['path']] = (None, movie)
+
+        added = changed = 0
+        with self._lock:
+            removed = self._files.keys() - current.keys()
+            for path in removed:
+                entry = self._files.pop(path)
+                self._apply_progress(entry, -1)
+                self._apply_file(entry, -1)
+
+            for path, (series_name, file_info) in current.items():
+                old = self._files.get(path)
+                if old is not None:
+                    if old[SERIES] == series_name and old[SIZE] == file_info['size']:
+                        continue
+                    # Progress of a known file is kept up to date by on_progress()
+                    watched, watch_time = old[WATCHED], old[WATCH_TIME]
+                    self._apply_progress(old, -1)
+                    self._apply_file(old, -1)
+                    changed += 1
+                else:
+                    watched, watch_time = progress_contribution(file_info)
+                    added += 1
+                entry = [series_name, self._root_of(path, media_root), file_info['size'], watched, watch_time]
+                self._files[path] = entry
+                self._apply_file(entry, 1)
+                self._apply_progress(entry, 1)
+        return added, len(removed), changed
+
+    @staticmethod
+    def _root_of(path, media_root):
+        """Top-level folder of a file below the media folder ('.' for files directly in it)"""
+        try:
+            parts = Path(path).relative_to(media_root).parts
+        except ValueError:
+            return '.'
+        return parts[0] if len(parts) > 1 else '.'
+
+    def on_progress(self, path, old_record, new_record):
+        """ProgressStore listener: update the file's counters"""
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None:
+                self._apply_progress(entry, -1)
+                entry[WATCHED], entry[WATCH_TIME] = progress_contribution(new_record)
+                self._apply_progress(entry, 1)
+
+    def on_playback(self, old_record, new_record):
+        """Add the playback between two progress saves of a player to today's activity
+
+        A forward step counts up to the wall-clock time between the saves, so
+        a seek adds at most the time that actually passed.
+        """
+        if not old_record or not new_record:
+            return
+        step = (new_record.get('position') or 0) - (old_record.get('position') or 0)
+        if not 0 < step <= ACTIVITY_MAX_STEP:
+            return
+        try:
+            elapsed = (datetime.fromisoformat(new_record['last_played']) -
+                       datetime.fromisoformat(old_record['last_played'])).total_seconds()
+        except (KeyError, TypeError, ValueError):
+            return
+        seconds = min(step, elapsed)
+        if seconds <= 0:
+            return
+        with self._lock:
+            today = date.today().isoformat()
+            self._activity[today] = self._activity.get(today, 0.0) + seconds
+            self._activity_dirty = True
+
+    def save(self):
+        """Write the watch activity file if it changed"""
+        if self.activity_file is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._activity_dirty:
+                    return
+                oldest = (date.today() - timedelta(days=ACTIVITY_DAYS_KEPT)).isoformat()
+                self._activity = {day: seconds for day, seconds in self._activity.items() if day >= oldest}
+                data = json.dumps(self._activity, indent=2, sort_keys=True)
+                self._activity_dirty = False
+            tmp_file = self.activity_file.with_suffix(self.activity_file.suffix + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_file, self.activity_file)
+
+    def snapshot(self, days=30):
+        """All aggregates as a JSON-ready dict, with activity for the last days"""
+        today = date.today()
+        with self._lock:
+            totals = dict(self._totals)
+            series = {name: dict(values, remaining=values['episodes'] - values['watched'])
+                      for name, values in self._series.items()}
+            roots = {name: dict(values) for name, values in self._roots.items()}
+            activity = [{'date': day, 'seconds': round(self._activity.get(day, 0.0), 1)}
+                        for day in ((today - timedelta(days=offset)).isoformat()
+                                    for offset in range(days - 1, -1, -1))]
+
+        totals['episodes_remaining'] = totals['episodes'] - totals['episodes_watched']
+        totals['watch_time'] = round(totals['watch_time'], 1)
+        for values in series.values():
+            values['watch_time'] = round(values['watch_time'], 1)
+        return {'totals': totals, 'series': series, 'roots': roots, 'activity': activity}
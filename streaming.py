@@ -0,0 +1,128 @@
+"""
+HTTP range streaming of video files
+
+Builds 200/206/304/416 responses for a file with Range, If-Range,
+If-None-Match and If-Modified-Since support. On the Werkzeug server the
+body is copied straight from the file to the client socket with
+socket.sendfile() (os.sendfile where the OS has it), so multi-GB videos
+are never read through Python. Other servers get a plain chunked read.
+"""
+
+import mimetypes
+import os
+import ssl
+from datetime import datetime, timezone
+
+from werkzeug.wrappers import Response
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Types mimetypes doesn't know on every platform
+VIDEO_MIME_TYPES = {
+    '.mkv': 'video/x-matroska',
+    '.webm': 'video/webm',
+    '.mp4': 'video/mp4',
+    '.m4v': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.ts': 'video/mp2t',
+    '.m2ts': 'video/mp2t',
+    '.avi': 'video/x-msvideo',
+    '.wmv': 'video/x-ms-wmv',
+    '.flv': 'video/x-flv',
+}
+
+
+class FileRangeBody:
+    """WSGI response body sending length bytes of a file starting at offset"""
+
+    def __init__(self, file_path, offset, length, environ):
+        self.file_path = file_path
+        self.offset = offset
+        self.length = length
+        self.environ = environ
+
+    def _client_socket(self):
+        sock = self.environ.get('werkzeug.socket')
+        if sock is None or isinstance(sock, ssl.SSLSocket):
+            return None
+        return sock
+
+    def __iter__(self):
+        with open(self.file_path, 'rb') as f:
+            sock = self._client_socket()
+            if sock is not None:
+                # An empty chunk makes the server flush the status line and
+                # headers, after which the body can go out through sendfile
+                yield b''
+                try:
+                    sock.sendfile(f, self.offset, self.length)
+                except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+                    # Browsers drop the connection whenever the user seeks
+                    pass
+                return
+
+            f.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def stream_file_response(request, file_path):
+    """Build the response for streaming file_path to request"""
+    file_stat = os.stat(file_path)
+    size = file_stat.st_size
+    etag = f"{file_stat.st_mtime_ns:x}-{size:x}"
+    last_modified = datetime.fromtimestamp(int(file_stat.st_mtime), tz=timezone.utc)
+
+    ext = os.path.splitext(file_path)[1].lower()
+    mimetype = VIDEO_MIME_TYPES.get(ext) or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+    def base_response(status):
+        response = Response(status=status, mimetype=mimetype, direct_passthrough=True)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.accept_ranges = 'bytes'
+        response.cache_control.no_cache = True
+        return response
+
+    # Conditional GET: the browser already has this version
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = bool(request.if_modified_since and request.if_modified_since >= last_modified)
+    if not_modified:
+        return base_response(304)
+
+    # If-Range: only honour the Range header if the file is unchanged
+    byte_range = request.range
+    if byte_range is not None and 'If-Range' in request.headers:
+        if_range = request.if_range
+        if if_range.etag is not None:
+            unchanged = if_range.etag == etag
+        else:
+            unchanged = if_range.date is not None and if_range.date >= last_modified
+        if not unchanged:
+            byte_range = None
+
+    start, stop = 0, size
+    status = 200
+    # Multiple ranges are answered with the whole file
+    if byte_range is not None and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response = base_response(416)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        start, stop = bounds
+        status = 206
+
+    response = base_response(status)
+    response.content_length = stop - start
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    response.response = FileRangeBody(file_path, start, stop - start, request.environ)
+    return response
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('a2wsgi')
+
+
+def asgi_get(backend, path, **kwargs):
+    """GET path from a fresh MediaLibraryASGI app, returns the httpx response"""
+    import asgi_app
+
+    async def fetch():
+        app = asgi_app.MediaLibraryASGI(backend.app)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+                return await client.get(path, **kwargs)
+        finally:
+            await app.stop()
+
+    return asyncio.run(fetch())
+
+
+def test_library_is_served_natively(backend):
+    response = asgi_get(backend, '/api/library')
+
+    assert response.status_code == 200
+    library = response.json()
+    assert sorted(library['series']['Breaking Bad']) == ['1', '2']
+    assert [movie['name'] for movie in library['movies']] == ['Heat.1995.1080p.BluRay', 'Inception']
+    # Responses are copies, the published library stays as scanned
+    assert 'cover_url' not in backend.library_state['library']['movies'][0]
+
+
+@pytest.mark.parametrize('kwargs', [{'params': {'profile': '1'}}, {'headers': {'X-Profile': '1'}}])
+def test_profiled_library_request_writes_profile(backend, kwargs):
+    response = asgi_get(backend, '/api/library', **kwargs)
+
+    assert response.status_code == 200
+    file_name = response.headers['x-profile-file']
+    assert file_name.endswith('.folded')
+    assert (backend.PROFILE_DIR / file_name).is_file()
+
+
+def test_unprofiled_request_writes_nothing(backend):
+    response = asgi_get(backend, '/api/library')
+
+    assert 'x-profile-file' not in response.headers
+    assert not backend.PROFILE_DIR.exists()
+
+
+def request_count(backend, path, status):
+    state = backend.request_duration._values.get(('GET', path, str(status)))
+    return sum(state[0]) if state else 0
+
+
+def test_native_requests_are_observed(backend):
+    before = request_count(backend, '/api/library', 200)
+    asgi_get(backend, '/api/library', params={'profile': '1'})
+
+    assert request_count(backend, '/api/library', 200) == before + 1
@@ -0,0 +1,88 @@
+import pytest
+
+
+@pytest.fixture
+def client(backend):
+    backend.get_current_library()
+    return backend.app.test_client()
+
+
+def episode_paths(backend, season=None):
+    seasons = backend.library_state['library']['series']['Breaking Bad']
+    return [episode['path'] for season_num, episodes in sorted(seasons.items())
+            if season is None or season_num == season for episode in episodes]
+
+
+def test_mark_season_watched(backend, client):
+    response = client.post('/api/progress/batch', json={'action': 'watched', 'series': 'Breaking Bad', 'season': 1})
+
+    assert response.status_code == 200
+    assert response.json['updated'] == 2
+    for path in episode_paths(backend, season=1):
+        assert backend.progress_store.get(path)['completed'] is True
+    assert backend.progress_store.get(episode_paths(backend, season=2)[0]) is None
+
+
+def test_reset_series(backend, client):
+    client.post('/api/progress/batch', json={'action': 'watched', 'series': 'Breaking Bad'})
+    response = client.post('/api/progress/batch', json={'action': 'reset', 'series': 'Breaking Bad'})
+
+    assert response.json['updated'] == 3
+    assert all(backend.progress_store.get(path) is None for path in episode_paths(backend))
+
+
+def test_unwatched_keeps_duration(backend, client):
+    path = episode_paths(backend)[0]
+    backend.record_progress(path, 1200, 2400, False)
+    client.post('/api/progress/batch', json={'action': 'unwatched', 'paths': [path]})
+
+    record = backend.progress_store.get(path)
+    assert record['position'] == 0
+    assert record['duration'] == 2400
+    assert record['completed'] is False
+
+
+def test_one_version_bump_per_batch(backend, client):
+    version = backend.library_state['version']
+    response = client.post('/api/progress/batch', json={'action': 'watched', 'paths': episode_paths(backend)})
+
+    assert response.json['version'] == version + 1
+
+
+def test_paths_outside_the_library_are_ignored(backend, client, tmp_path):
+    outside = tmp_path / 'secret.mkv'
+    outside.write_bytes(b'not a library file')
+    path = episode_paths(backend)[0]
+    response = client.post('/api/progress/batch', json={'action': 'watched', 'paths': [path, str(outside)]})
+
+    assert response.json['updated'] == 1
+    assert backend.progress_store.get(str(outside)) is None
+
+    response = client.post('/api/progress/batch', json={'action': 'watched', 'paths': [str(outside)]})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('body', [
+    {'action': 'watched', 'paths': '/'},
+    {'action': 'watched', 'paths': ['/ok', 3]},
+    {'action': 'watched', 'paths': {'a': 1}},
+    {'action': 'watched', 'series': ['Breaking Bad']},
+    {'action': 'watched', 'series': {'name': 'Breaking Bad'}},
+    {'action': 'watched'},
+    {'action': 'explode', 'series': 'Breaking Bad'},
+    ['watched'],
+])
+def test_malformed_bodies_are_rejected(backend, client, body):
+    response = client.post('/api/progress/batch', json=body)
+
+    assert response.status_code == 400
+    assert backend.library_state['version'] == 1
+
+
+@pytest.mark.parametrize('body', [
+    {'action': 'watched', 'series': 'The Wire'},
+    {'action': 'watched', 'series': 'Breaking Bad', 'season': 9},
+    {'action': 'watched', 'series': 'Breaking Bad', 'season': 'first'},
+])
+def test_unknown_series_or_season(client, body):
+    assert client.post('/api/progress/batch', json=body).status_code == 404
@@ -0,0 +1,46 @@
+from fingerprint import FINGERPRINT_POINTS, FINGERPRINT_WINDOW, compute_fingerprint
+
+LARGE_SIZE = len(FINGERPRINT_POINTS) * FINGERPRINT_WINDOW * 4
+
+
+def fingerprint_of(path):
+    return compute_fingerprint(path, path.stat().st_size)
+
+
+def write_large(path, changed_offset=None):
+    data = bytearray(i % 251 for i in range(LARGE_SIZE))
+    if changed_offset is not None:
+        data[changed_offset] ^= 0xFF
+    path.write_bytes(data)
+    return path
+
+
+def test_stable_across_renames(tmp_path):
+    original = write_large(tmp_path / 'Heat.1995.mkv')
+    fingerprint = fingerprint_of(original)
+    moved = original.rename(tmp_path / 'Heat (1995).mkv')
+
+    assert fingerprint_of(moved) == fingerprint
+    assert fingerprint.startswith(f"{LARGE_SIZE:x}-")
+
+
+def test_sampled_windows_detect_changes(tmp_path):
+    fingerprint = fingerprint_of(write_large(tmp_path / 'a.mkv'))
+
+    assert fingerprint_of(write_large(tmp_path / 'start.mkv', changed_offset=10)) != fingerprint
+    assert fingerprint_of(write_large(tmp_path / 'end.mkv', changed_offset=LARGE_SIZE - 1)) != fingerprint
+    # Bytes between the windows are not read
+    assert fingerprint_of(write_large(tmp_path / 'gap.mkv', changed_offset=FINGERPRINT_WINDOW + 10)) == fingerprint
+
+
+def test_small_files_are_hashed_whole(tmp_path):
+    first = tmp_path / 'first.mkv'
+    second = tmp_path / 'second.mkv'
+    first.write_bytes(b'a' * 1000 + b'b')
+    second.write_bytes(b'a' * 1000 + b'c')
+
+    assert fingerprint_of(first) != fingerprint_of(second)
+
+
+def test_unreadable_file(tmp_path):
+    assert compute_fingerprint(tmp_path / 'missing.mkv', 100) is None
@@ -0,0 +1,179 @@
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from file_cache import FileMetadataCache
+from media_probe import ProbeScheduler, probe_media
+
+
+# --- MP4 builders --------------------------------------------------------------
+
+def box(box_type, *children):
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def mvhd(timescale, duration):
+    return box(b'mvhd', b'\0' * 12, struct.pack('>II', timescale, duration), b'\0' * 80)
+
+
+def trak(handler, fourcc, width, height):
+    tkhd = box(b'tkhd', b'\0' * 76, struct.pack('>II', width << 16, height << 16))
+    hdlr = box(b'hdlr', b'\0' * 8, handler, b'\0' * 12)
+    entry = struct.pack('>I4s', 86, fourcc) + b'\0' * 24 + struct.pack('>HH', width, height) + b'\0' * 50
+    stsd = box(b'stsd', b'\0' * 8, entry)
+    return box(b'trak', tkhd, box(b'mdia', hdlr, box(b'minf', box(b'stbl', stsd))))
+
+
+def write_mp4(path, moov):
+    # moov after mdat, as most encoders write it without faststart
+    path.write_bytes(box(b'ftyp', b'isom\0\0\0\0') + box(b'mdat', b'\0' * 4096) + moov)
+    return path
+
+
+def test_mp4(tmp_path):
+    moov = box(b'moov', mvhd(1000, 5_400_500), trak(b'soun', b'mp4a', 0, 0), trak(b'vide', b'avc1', 1920, 1080))
+
+    info = probe_media(write_mp4(tmp_path / 'movie.mp4', moov))
+
+    assert info == {'container': 'mp4', 'duration': 5400.5, 'width': 1920, 'height': 1080, 'video_codec': 'h264'}
+
+
+def test_fragmented_mp4_duration(tmp_path):
+    mehd = box(b'mehd', b'\0' * 4, struct.pack('>I', 90_000 * 60))
+    moov = box(b'moov', mvhd(90_000, 0), box(b'mvex', mehd), trak(b'vide', b'hvc1', 3840, 2160))
+
+    info = probe_media(write_mp4(tmp_path / 'fragmented.mp4', moov))
+
+    assert info['duration'] == 60
+    assert info['video_codec'] == 'hevc'
+
+
+def test_mp4_without_moov(tmp_path):
+    path = tmp_path / 'broken.mp4'
+    path.write_bytes(box(b'ftyp', b'isom\0\0\0\0') + box(b'mdat', b'\0' * 64))
+
+    assert probe_media(path) is None
+
+
+# --- Matroska builders ---------------------------------------------------------
+
+UNKNOWN_SIZE = b'\x01\xff\xff\xff\xff\xff\xff\xff'
+
+
+def element(element_id, *children, size=None):
+    payload = b''.join(children)
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+    return id_bytes + (size or b'\x01' + len(payload).to_bytes(7, 'big')) + payload
+
+
+def uint(element_id, value):
+    return element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+EBML = element(0x1A45DFA3, element(0x4282, b'matroska'))
+
+
+def info(duration_ms):
+    return element(0x1549A966, uint(0x2AD7B1, 1_000_000), element(0x4489, struct.pack('>d', duration_ms)))
+
+
+def tracks():
+    audio = element(0xAE, uint(0x83, 2), element(0x86, b'A_AAC'))
+    video = element(0xAE, uint(0x83, 1), element(0x86, b'V_MPEGH/ISO/HEVC'),
+                    element(0xE0, uint(0xB0, 3840), uint(0xBA, 2160)))
+    return element(0x1654AE6B, audio, video)
+
+
+CLUSTER = element(0x1F43B675, b'\0' * 256)
+
+
+def test_matroska(tmp_path):
+    path = tmp_path / 'movie.mkv'
+    path.write_bytes(EBML + element(0x18538067, info(2_700_250.0), tracks(), CLUSTER))
+
+    assert probe_media(path) == {'container': 'matroska', 'duration': 2700.25, 'width': 3840, 'height': 2160,
+                                 'video_codec': 'hevc'}
+
+
+def test_matroska_tracks_after_clusters(tmp_path):
+    # Live recordings: unknown segment size, Tracks only reachable through the SeekHead
+    def seek_head(position):
+        return element(0x114D9B74, element(0x4DBB, uint(0x53AB, 0x1654AE6B), element(0x53AC, position.to_bytes(4, 'big'))))
+
+    head_info = info(60_000.0)
+    tracks_position = len(seek_head(0)) + len(head_info) + len(CLUSTER)
+    path = tmp_path / 'recording.mkv'
+    path.write_bytes(EBML + element(0x18538067, seek_head(tracks_position), head_info, CLUSTER, tracks(), size=UNKNOWN_SIZE))
+
+    info_found = probe_media(path)
+
+    assert info_found['duration'] == 60
+    assert info_found['video_codec'] == 'hevc'
+    assert (info_found['width'], info_found['height']) == (3840, 2160)
+
+
+@pytest.mark.parametrize('content', [b'', b'short', b'RIFF\0\0\0\0AVI LIST' + b'\0' * 32])
+def test_unsupported_files(tmp_path, content):
+    path = tmp_path / 'other.avi'
+    path.write_bytes(content)
+
+    assert probe_media(path) is None
+
+
+def test_missing_file(tmp_path):
+    assert probe_media(tmp_path / 'missing.mkv') is None
+
+
+# --- ProbeScheduler ------------------------------------------------------------
+
+def crashing_probe(path):
+    """probe_media, except that 'crash' files kill the worker process"""
+    if 'crash' in os.path.basename(path):
+        os._exit(1)
+    if 'error' in os.path.basename(path):
+        raise ValueError('unexpected header')
+    return probe_media(path)
+
+
+def run_scheduler(tmp_path, names, executor_class=ProcessPoolExecutor):
+    cache = FileMetadataCache(tmp_path / 'probe_cache.json')
+    finished = threading.Event()
+    scheduler = ProbeScheduler(cache, max_workers=2, probe=crashing_probe, on_batch=lambda count: finished.set(),
+                               executor_class=executor_class)
+    files = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b'not a video')
+        stat = path.stat()
+        files.append((str(path), stat.st_size, stat.st_mtime))
+    scheduler.submit(files)
+    try:
+        deadline = time.monotonic() + 30
+        while scheduler.pending() or not finished.wait(0.1):
+            assert time.monotonic() < deadline, "probing never finished"
+            finished.clear()
+    finally:
+        scheduler.shutdown()
+    return {os.path.basename(path): cache.get(path, size, mtime) for path, size, mtime in files}
+
+
+def test_scheduler_survives_a_crashing_worker(tmp_path):
+    names = [f"movie{n}.mkv" for n in range(6)]
+    names.insert(2, 'crash.mkv')
+
+    results = run_scheduler(tmp_path, names)
+
+    assert results.pop('crash.mkv') is None
+    assert results == dict.fromkeys(results, {})
+
+
+@pytest.mark.parametrize('executor_class', [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_failed_probes_are_not_cached(tmp_path, executor_class):
+    results = run_scheduler(tmp_path, ['error.mkv', 'movie.mkv'], executor_class)
+
+    assert results == {'error.mkv': None, 'movie.mkv': {}}
@@ -0,0 +1,141 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from metadata_index import MetadataIndex, import_dumps, split_title_year
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+FIXTURE = FIXTURES / 'metadata_dump.jsonl'
+# TMDB movie and TV exports whose ids overlap (949 and 1438 are in both)
+TMDB_MOVIES = FIXTURES / 'tmdb_movies.jsonl'
+TMDB_TV = FIXTURES / 'tmdb_tv.jsonl'
+TMDB_POSTER = "https://image.tmdb.org/t/p/w342"
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = tmp_path / 'metadata.db'
+    import_dumps(db_file, [FIXTURE])
+    return db_file
+
+
+@pytest.fixture
+def index(db_file):
+    return MetadataIndex(db_file)
+
+
+def test_import_counts(tmp_path):
+    result = import_dumps(tmp_path / 'metadata.db', [FIXTURE])
+
+    assert result == {'imported': 12, 'skipped': 1, 'sources': ['tmdb', 'tvmaze']}
+    assert MetadataIndex(tmp_path / 'metadata.db').count() == 12
+
+
+def test_reimport_replaces_source(db_file):
+    result = import_dumps(db_file, [FIXTURE])
+
+    assert result['imported'] == 12
+    assert MetadataIndex(db_file).count() == 12
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('Heat.1995.1080p.BluRay', ('heat', 1995)),
+    ('1917 (2019)', ('1917', 2019)),
+    ('Blade Runner 2049 2017', ('blade runner 2049', 2017)),
+    ('Inception', ('inception', None)),
+])
+def test_split_title_year(name, expected):
+    assert split_title_year(name) == expected
+
+
+def test_lookup_movie_with_release_tags(index):
+    assert index.lookup('Heat.1995.1080p.BluRay', 'movie') == f"{TMDB_POSTER}/umSVjVdbVwtx5ryCA2QXL44Durm.jpg"
+
+
+def test_lookup_number_in_title(index):
+    assert index.lookup('Blade Runner 2049', 'movie') == f"{TMDB_POSTER}/gajva2L0rPYkEWjzgFlBXCAVBE5.jpg"
+    assert index.lookup('1917 (2019)', 'movie') == f"{TMDB_POSTER}/iZf0KyrE25z1sage4SYFLCCrMi9.jpg"
+
+
+def test_lookup_year_disambiguates(index):
+    assert index.lookup('Doctor Who (1963)', 'series').endswith('/0/1776.jpg')
+    assert index.lookup('Doctor Who 2005', 'series').endswith('/417/1044056.jpg')
+    # Within YEAR_TOLERANCE of the premiere
+    assert index.lookup('The Office (2002)', 'series').endswith('/1/4062.jpg')
+
+
+def test_lookup_without_year_prefers_popular(index):
+    assert index.lookup('Doctor Who', 'series').endswith('/417/1044056.jpg')
+    assert index.lookup('The Office', 'series').endswith('/481/1204342.jpg')
+
+
+def test_lookup_respects_type(index):
+    assert index.lookup('Heat', 'series') is None
+    assert index.lookup('Breaking Bad', 'movie') is None
+    assert index.lookup('Breaking Bad', 'series') is not None
+
+
+def test_lookup_original_title(index):
+    assert index.lookup('千と千尋の神隠し', 'movie') == f"{TMDB_POSTER}/39wmItIWsg5sZMyRUHLkWBcuVCM.jpg"
+
+
+def test_lookup_unknown_or_without_poster(index):
+    assert index.lookup('Show Without Artwork', 'series') is None
+    assert index.lookup('Not In The Dump 2020', 'movie') is None
+
+
+def test_popularity_is_ranked_per_source(db_file):
+    with sqlite3.connect(db_file) as connection:
+        rows = dict(((source, source_id), popularity) for source, source_id, popularity in
+                    connection.execute('SELECT source, source_id, popularity FROM titles'))
+
+    assert all(0 <= popularity <= 1 for popularity in rows.values())
+    # The most popular title of each source ranks the same, whatever the scale
+    assert rows[('tvmaze', '169')] == rows[('tmdb', '1396')] == 1.0
+    assert rows[('tvmaze', '526')] > rows[('tvmaze', '4019')] > rows[('tvmaze', '766')]
+    assert rows[('tmdb', '27205')] > rows[('tmdb', '949')]
+
+
+def test_movies_and_tv_with_the_same_ids(tmp_path):
+    db_file = tmp_path / 'metadata.db'
+
+    assert import_dumps(db_file, [TMDB_MOVIES, TMDB_TV])['imported'] == 4
+    index = MetadataIndex(db_file)
+    assert index.lookup('The Wire', 'series') == f"{TMDB_POSTER}/4lbclFySvugI51fwsyxBTOm4DqK.jpg"
+    assert index.lookup('Heat Wave', 'series') == f"{TMDB_POSTER}/heatWave.jpg"
+    assert index.lookup('Heat', 'movie') == f"{TMDB_POSTER}/umSVjVdbVwtx5ryCA2QXL44Durm.jpg"
+
+
+def test_dump_replaces_only_its_kind(tmp_path):
+    db_file = tmp_path / 'metadata.db'
+    import_dumps(db_file, [TMDB_MOVIES])
+    import_dumps(db_file, [TMDB_TV])
+    # Importing the TV dump again replaces the series, not the movies
+    import_dumps(db_file, [TMDB_TV])
+
+    index = MetadataIndex(db_file)
+    assert index.count() == 4
+    assert index.lookup('Heat', 'movie') == f"{TMDB_POSTER}/umSVjVdbVwtx5ryCA2QXL44Durm.jpg"
+    assert index.lookup('The Wire', 'series') is not None
+
+
+def test_old_schema_is_rebuilt(tmp_path):
+    db_file = tmp_path / 'metadata.db'
+    with sqlite3.connect(db_file) as connection:
+        connection.execute('CREATE TABLE titles (id INTEGER PRIMARY KEY, source TEXT, source_id TEXT, '
+                           'UNIQUE (source, source_id))')
+        connection.execute("INSERT INTO titles (source, source_id) VALUES ('tmdb', '1438')")
+    connection.close()
+
+    import_dumps(db_file, [TMDB_MOVIES, TMDB_TV])
+
+    assert MetadataIndex(db_file).lookup('The Wire', 'series') is not None
+
+
+def test_missing_database(tmp_path):
+    index = MetadataIndex(tmp_path / 'missing.db')
+
+    assert not index.available
+    assert index.lookup('Heat', 'movie') is None
+    assert index.count() == 0
@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+
+def profiler_running():
+    return any(thread.name == 'profiler' for thread in threading.enumerate())
+
+
+def profiles(backend):
+    return sorted(backend.PROFILE_DIR.glob('*.folded')) if backend.PROFILE_DIR.exists() else []
+
+
+def test_profiled_request(backend):
+    response = backend.app.test_client().get('/api/library', headers={'X-Profile': '1'})
+
+    assert response.status_code == 200
+    assert [path.name for path in profiles(backend)] == [response.headers['X-Profile-File']]
+    assert not profiler_running()
+
+
+def test_profiler_stops_when_the_request_raises(backend, monkeypatch):
+    # Like app.run(debug=True): the exception propagates and after_request never runs
+    monkeypatch.setitem(backend.app.config, 'PROPAGATE_EXCEPTIONS', True)
+
+    with pytest.raises(AttributeError):
+        backend.app.test_client().post('/api/play?profile=1', data='null', content_type='application/json')
+
+    assert not profiler_running()
+    assert len(profiles(backend)) == 1
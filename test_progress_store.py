@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+
+from progress_store import PROGRESS_FORMAT_VERSION, ProgressStore
+
+
+def record(position, completed=False):
+    return {'position': position, 'duration': 2400, 'completed': completed, 'last_played': '2026-01-01T20:00:00'}
+
+
+@pytest.fixture
+def progress_file(tmp_path):
+    return tmp_path / 'progress.json'
+
+
+@pytest.fixture
+def store(progress_file):
+    return ProgressStore(progress_file)
+
+
+def test_renamed_file_keeps_progress(store):
+    store.set('/media/Heat.1995.mkv', record(600), 'fp-heat')
+    store.link('/media/Movies/Heat (1995).mkv', 'fp-heat')
+
+    assert store.get('/media/Movies/Heat (1995).mkv')['position'] == 600
+    assert store.get('/media/Movies/Heat (1995).mkv', 'fp-heat')['path'] == '/media/Movies/Heat (1995).mkv'
+
+
+def test_copies_share_one_record(store):
+    store.set('/media/a/Heat.mkv', record(600), 'fp-heat')
+    store.link('/media/b/Heat.mkv', 'fp-heat')
+    store.set('/media/b/Heat.mkv', record(900), 'fp-heat')
+
+    assert store.get('/media/a/Heat.mkv')['position'] == 900
+    assert store.delete('/media/a/Heat.mkv', 'fp-heat')
+    assert store.get('/media/a/Heat.mkv') is None
+    assert store.get('/media/b/Heat.mkv') is None
+
+
+def test_path_keyed_record_migrates(store):
+    store.set('/media/Heat.mkv', record(600))
+    store.link('/media/Heat.mkv', 'fp-heat')
+    store.link('/media/Movies/Heat.mkv', 'fp-heat')
+
+    assert store.get('/media/Movies/Heat.mkv')['position'] == 600
+    assert store.get('/other/path', 'fp-heat')['position'] == 600
+
+
+def test_set_with_new_fingerprint_replaces_old_key(store):
+    # The file was replaced by a different encode under the same name
+    store.set('/media/Heat.mkv', record(600), 'fp-old')
+    store.set('/media/Heat.mkv', record(30), 'fp-new')
+
+    assert store.get('/media/Heat.mkv')['position'] == 30
+    assert store.get('/elsewhere', 'fp-old') is None
+
+
+def test_link_without_progress_is_a_noop(store, progress_file):
+    store.link('/media/Inception.mp4', 'fp-inception')
+    store.link('/media/Inception.mp4', None)
+    store.save()
+
+    assert store.get('/media/Inception.mp4') is None
+    assert not progress_file.exists()
+
+
+def test_listeners_see_old_and_new_records(store):
+    calls = []
+    store.add_listener(lambda path, old, new: calls.append((path, old and old['position'], new and new['position'])))
+    store.set('/media/Heat.mkv', record(600), 'fp-heat')
+    store.set('/media/Heat.mkv', record(900), 'fp-heat')
+    store.delete('/media/Heat.mkv', 'fp-heat')
+
+    assert calls == [('/media/Heat.mkv', None, 600), ('/media/Heat.mkv', 600, 900), ('/media/Heat.mkv', 900, None)]
+
+
+def test_update_many(store):
+    store.set('/media/S01E01.mkv', record(100), 'fp-1')
+    changed = store.update_many([
+        ('/media/S01E01.mkv', None, 'fp-1'),
+        ('/media/S01E02.mkv', record(2400, completed=True), 'fp-2'),
+        ('/media/S01E03.mkv', None, 'fp-3'),
+    ])
+
+    assert changed == 2
+    assert store.get('/media/S01E01.mkv') is None
+    assert store.get('/media/S01E02.mkv')['completed'] is True
+
+
+def test_fingerprint_for_is_used_when_missing(progress_file):
+    store = ProgressStore(progress_file, fingerprint_for=lambda path: 'fp-' + os.path.basename(path))
+    store.set('/media/Heat.mkv', record(600))
+
+    assert store.get('/moved/Heat.mkv', 'fp-Heat.mkv')['position'] == 600
+
+
+def test_save_and_reload(store, progress_file):
+    store.set('/media/Heat.mkv', record(600), 'fp-heat')
+    store.link('/media/copy/Heat.mkv', 'fp-heat')
+    store.save()
+
+    data = json.loads(progress_file.read_text(encoding='utf-8'))
+    assert data['version'] == PROGRESS_FORMAT_VERSION
+    assert data['paths'] == {'/media/Heat.mkv': 'fp-heat', '/media/copy/Heat.mkv': 'fp-heat'}
+    reloaded = ProgressStore(progress_file)
+    assert reloaded.get('/media/copy/Heat.mkv')['position'] == 600
+
+
+def test_reads_old_path_keyed_format(progress_file):
+    progress_file.write_text(json.dumps({'/media/Heat.mkv': record(600)}), encoding='utf-8')
+    store = ProgressStore(progress_file)
+    store.link('/media/Heat.mkv', 'fp-heat')
+
+    assert store.get('/renamed.mkv', 'fp-heat')['position'] == 600
+
+
+def test_rescan_after_rename_keeps_progress(backend, media_tree):
+    backend.get_current_library()
+    heat = media_tree / 'Heat.1995.1080p.BluRay.mkv'
+    backend.record_progress(str(heat), 600, 2400, False)
+    renamed = heat.rename(media_tree / 'Heat (1995).mkv')
+
+    library = backend.scan_media_library()
+
+    movie = next(movie for movie in library['movies'] if movie['path'] == str(renamed))
+    assert movie['current_time'] == 600
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def gate(backend, monkeypatch):
+    """Hold background scans after the first directory (the media root) until opened"""
+    reached = threading.Event()
+    opened = threading.Event()
+    timed_iter = backend.timed_iter
+
+    def gated_iter(iterable, phases, phase):
+        for index, item in enumerate(timed_iter(iterable, phases, phase)):
+            if index == 1:
+                reached.set()
+                assert opened.wait(10)
+            yield item
+
+    monkeypatch.setattr(backend, 'timed_iter', gated_iter)
+    yield reached, opened
+    opened.set()
+
+
+def names(library):
+    episodes = sorted(episode['name'] for seasons in library['series'].values()
+                      for season in seasons.values() for episode in season)
+    return episodes, sorted(movie['name'] for movie in library['movies'])
+
+
+def test_cancel_stops_at_a_directory_boundary(backend, gate):
+    reached, opened = gate
+    job = backend.start_scan_job()
+    assert reached.wait(10)
+
+    response = backend.app.test_client().post(f"/api/scan/{job.id}/cancel")
+    opened.set()
+
+    assert response.status_code == 200
+    assert job.wait(10)
+    assert job.state == 'cancelled'
+    # The media root was classified completely, nothing after it
+    assert job.dirs_visited == 1
+    assert names(job.snapshot()) == ([], ['Heat.1995.1080p.BluRay', 'Inception'])
+    # A cancelled scan is never published
+    assert backend.library_state['library'] is None
+
+
+def test_time_budget_returns_partial_results(backend, gate):
+    reached, opened = gate
+    client = backend.app.test_client()
+    job = backend.start_scan_job()
+    assert reached.wait(10)
+
+    response = client.post('/api/scan', json={'time_budget': 0})
+
+    assert response.status_code == 202
+    assert response.json['id'] == job.id
+    assert response.json['state'] == 'running'
+    assert names(response.json['results']) == ([], ['Heat.1995.1080p.BluRay', 'Inception'])
+
+    opened.set()
+    assert job.wait(10)
+    response = client.get(f"/api/scan/{job.id}", query_string={'results': '1'})
+    assert response.json['state'] == 'completed'
+    assert len(names(response.json['results'])[0]) == 3
+
+
+def test_time_budget_long_enough_for_the_whole_scan(backend):
+    response = backend.app.test_client().post('/api/scan', json={'time_budget': 10})
+
+    assert response.status_code == 200
+    assert response.json['state'] == 'completed'
+    assert names(response.json['results']) == (
+        ['Breaking.Bad.S01E01', 'Breaking.Bad.S01E02', 'Breaking.Bad.S02E01'], ['Heat.1995.1080p.BluRay', 'Inception'])
+
+
+def test_invalid_time_budget(backend):
+    response = backend.app.test_client().post('/api/scan', json={'time_budget': 'soon'})
+
+    assert response.status_code == 400
+    assert backend.scan_jobs == {}
+
+
+def test_one_running_job_at_a_time(backend, gate):
+    reached, opened = gate
+    job = backend.start_scan_job()
+    assert reached.wait(10)
+
+    assert backend.start_scan_job() is job
+    opened.set()
+    assert job.wait(10)
+    second = backend.start_scan_job()
+    assert second is not job
+    assert second.wait(10)
+
+
+def test_library_falls_back_to_an_inline_scan_after_a_cancel(backend, monkeypatch):
+    cancelled = []
+
+    def start_cancelled_job():
+        # A job cancelled (say from /api/scan/<id>/cancel) before it got anywhere
+        job = backend.ScanJob()
+        job.cancel()
+        backend.run_scan_job(job)
+        cancelled.append(job)
+        return job
+
+    monkeypatch.setattr(backend, 'start_scan_job', start_cancelled_job)
+
+    library = backend.get_current_library()
+
+    assert cancelled[0].state == 'cancelled'
+    assert len(names(library)[0]) == 3
+    assert backend.library_state['library'] is library
+    assert backend.library_state['version'] == 1
+
+
+def test_unknown_job(backend):
+    client = backend.app.test_client()
+
+    assert client.get('/api/scan/missing').status_code == 404
+    assert client.post('/api/scan/missing/cancel').status_code == 404
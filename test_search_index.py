@@ -0,0 +1,95 @@
+import pytest
+
+from search_index import SearchIndex, normalize, trigrams
+
+TITLES = ['Breaking Bad', 'Better Call Saul', 'The Wire', 'Heat', 'Inception', 'Interstellar', 'The Office',
+          'Doctor Who', 'Blade Runner 2049', 'Spirited Away']
+
+
+def documents(titles=TITLES, kind='series'):
+    return {f"{kind}:{title}": (title, {'kind': kind, 'title': title}) for title in titles}
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.update(documents())
+    return index
+
+
+def titles(results):
+    return [result['title'] for result in results]
+
+
+def test_normalize_and_trigrams():
+    assert normalize('Breaking.Bad_S01E01 - Pilot!') == 'breaking bad s01e01 pilot'
+    assert trigrams('bad') == {'  b', ' ba', 'bad', 'ad '}
+    assert trigrams('') == frozenset()
+
+
+def test_update_counts(index):
+    changed_docs = documents(TITLES[1:] + ['Dark'])
+    changed_docs['series:Heat'] = ('Heat (1995)', {'kind': 'series', 'title': 'Heat (1995)'})
+
+    assert index.update(changed_docs) == (1, 1, 1)
+    assert len(index) == len(TITLES)
+    assert index.update(changed_docs) == (0, 0, 0)
+    assert titles(index.search('breaking')) == []
+    assert titles(index.search('heat 1995'))[0] == 'Heat (1995)'
+
+
+def test_unchanged_text_refreshes_payload(index):
+    docs = documents()
+    docs['series:Heat'] = ('Heat', {'kind': 'series', 'title': 'Heat', 'cover': 'heat.jpg'})
+    index.update(docs)
+
+    assert index.search('heat')[0]['cover'] == 'heat.jpg'
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('breaking bad', 'Breaking Bad'),
+    ('brekaing bad', 'Breaking Bad'),
+    ('interstelar', 'Interstellar'),
+    ('blade runner', 'Blade Runner 2049'),
+    ('doctor.who', 'Doctor Who'),
+])
+def test_typo_tolerant_ranking(index, query, expected):
+    assert titles(index.search(query))[0] == expected
+
+
+def test_prefix_match_ranks_first(index):
+    assert titles(index.search('inte')) == ['Interstellar']
+    assert titles(index.search('in'))[0] == 'Inception'
+
+
+def test_unrelated_or_empty_queries(index):
+    assert index.search('zzzz') == []
+    assert index.search('   ') == []
+
+
+def test_kinds_filter_and_limit():
+    index = SearchIndex()
+    docs = documents(['Heat'], kind='movie')
+    docs.update(documents(['Heat'], kind='series'))
+    docs.update({f"episode:{n}": (f"The Heat S01E{n:02d}", {'kind': 'episode', 'title': f"The Heat {n}"})
+                 for n in range(1, 30)})
+    index.update(docs)
+
+    assert [result['kind'] for result in index.search('heat', kinds={'movie'})] == ['movie']
+    assert len(index.search('heat', kinds={'episode'})) == 20
+    assert len(index.search('heat', limit=5)) == 5
+    # Series are boosted over movies with the same name
+    assert index.search('heat')[0]['kind'] == 'series'
+
+
+def test_search_endpoint(backend):
+    client = backend.app.test_client()
+
+    response = client.get('/api/search', query_string={'q': 'brekaing bad'})
+    assert response.status_code == 200
+    best = response.json['results'][0]
+    assert (best['kind'], best['title']) == ('series', 'Breaking Bad')
+
+    response = client.get('/api/search', query_string={'q': 'heat', 'kind': 'movie'})
+    assert titles(response.json['results']) == ['Heat.1995.1080p.BluRay']
+    assert len(client.get('/api/search', query_string={'q': 'breaking', 'limit': 2}).json['results']) == 2
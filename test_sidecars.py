@@ -0,0 +1,111 @@
+import pytest
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
+
+
+def test_cover_endpoint_prefers_local_poster(backend, client, media_tree):
+    poster = media_tree / 'Heat.1995.1080p.BluRay-poster.jpg'
+    poster.write_bytes(b'jpeg')
+    (media_tree / 'Breaking Bad' / 'poster.jpg').write_bytes(b'jpeg')
+
+    movie = client.get('/api/cover', query_string={'title': 'Heat.1995.1080p.BluRay', 'type': 'movie'}).json
+    series = client.get('/api/cover', query_string={'title': 'Breaking Bad', 'type': 'series'}).json
+
+    assert movie['cover_url'] == backend.artwork_url(str(poster))
+    assert series['cover_url'] == backend.artwork_url(str(media_tree / 'Breaking Bad' / 'poster.jpg'))
+    # Local artwork is never written to the online covers cache
+    assert backend.load_covers_cache() == {}
+
+
+def test_cover_endpoint_without_local_poster(backend, client):
+    backend.store_covers({'movie:Inception': 'https://covers.invalid/inception.jpg'})
+
+    response = client.get('/api/cover', query_string={'title': 'Inception', 'type': 'movie'})
+
+    assert response.json['cover_url'] == 'https://covers.invalid/inception.jpg'
+
+
+def test_video_sidecars_match_by_stem(backend):
+    subtitles = [('Show.S01E01', '/s/Show.S01E01.srt'), ('Show.S01E01.en', '/s/Show.S01E01.en.srt'),
+                 ('Show.S01E01.pt-BR', '/s/Show.S01E01.pt-BR.ass'), ('Show.S01E010', '/s/Show.S01E010.srt'),
+                 ('Show.S01E02.en', '/s/Show.S01E02.en.srt')]
+    nfos = {'Show.S01E01': '/s/Show.S01E01.nfo', 'Show': '/s/Show.nfo'}
+    images = {'Show.S01E01': '/s/Show.S01E01.jpg', 'Show.S01E01-poster': '/s/Show.S01E01-poster.jpg'}
+
+    sidecars = backend.video_sidecars('Show.S01E01', subtitles, nfos, images, '/s/poster.jpg')
+
+    assert sidecars == {
+        'subtitles': [{'path': '/s/Show.S01E01.srt', 'language': None},
+                      {'path': '/s/Show.S01E01.en.srt', 'language': 'en'},
+                      {'path': '/s/Show.S01E01.pt-BR.ass', 'language': 'pt-BR'}],
+        'nfo': '/s/Show.S01E01.nfo',
+        'poster': '/s/Show.S01E01-poster.jpg',
+        'folder_poster': '/s/poster.jpg',
+    }
+    assert backend.video_sidecars('Show.S01E03', subtitles, nfos, {}, None) == {}
+    assert backend.video_sidecars('Show.S01E03', [], {}, {}, '/s/poster.jpg')['poster'] == '/s/poster.jpg'
+
+
+def test_scan_indexes_sidecars(backend, media_tree):
+    (media_tree / 'Heat.1995.1080p.BluRay.en.srt').write_text('1\n', encoding='utf-8')
+    (media_tree / 'Heat.1995.1080p.BluRay.nfo').write_text('<movie/>', encoding='utf-8')
+    (media_tree / 'Inception.jpg').write_bytes(b'jpeg')
+
+    movies = {movie['name']: movie['sidecars'] for movie in backend.scan_media_library()['movies']}
+
+    assert movies['Heat.1995.1080p.BluRay'] == {
+        'subtitles': [{'path': str(media_tree / 'Heat.1995.1080p.BluRay.en.srt'), 'language': 'en'}],
+        'nfo': str(media_tree / 'Heat.1995.1080p.BluRay.nfo'),
+    }
+    assert movies['Inception'] == {'poster': str(media_tree / 'Inception.jpg')}
+
+
+def test_season_folders_inherit_the_series_poster(backend, media_tree):
+    series_poster = media_tree / 'Breaking Bad' / 'folder.jpg'
+    season_poster = media_tree / 'Breaking Bad' / 'Season 2' / 'poster.png'
+    series_poster.write_bytes(b'jpeg')
+    season_poster.write_bytes(b'png')
+
+    seasons = backend.scan_media_library()['series']['Breaking Bad']
+
+    assert {episode['sidecars']['poster'] for episode in seasons[1]} == {str(series_poster)}
+    assert seasons[2][0]['sidecars']['poster'] == str(season_poster)
+    assert backend.series_local_poster(seasons) == str(series_poster)
+
+
+def test_media_root_poster_is_nobodys(backend, media_tree):
+    (media_tree / 'poster.jpg').write_bytes(b'jpeg')
+
+    library = backend.scan_media_library()
+
+    assert all('poster' not in movie['sidecars'] for movie in library['movies'])
+    assert backend.series_local_poster(library['series']['Breaking Bad']) is None
+
+
+def test_library_uses_local_posters(backend, client, media_tree):
+    poster = media_tree / 'Breaking Bad' / 'poster.jpg'
+    poster.write_bytes(b'jpeg')
+
+    library = client.get('/api/library').json
+
+    assert library['series']['Breaking Bad']['1'][0]['cover_url'] == backend.artwork_url(str(poster))
+
+
+def test_artwork_only_serves_images_in_the_media_folder(client, media_tree, tmp_path):
+    poster = media_tree / 'Breaking Bad' / 'poster.jpg'
+    poster.write_bytes(b'jpeg')
+    outside = tmp_path / 'outside.jpg'
+    outside.write_bytes(b'secret')
+
+    def artwork(path):
+        return client.get('/api/artwork', query_string={'path': str(path)})
+
+    assert artwork(poster).data == b'jpeg'
+    assert artwork(outside).status_code == 403
+    assert artwork(media_tree / '..' / 'outside.jpg').status_code == 403
+    assert artwork(media_tree / 'Inception.mp4').status_code == 403
+    assert artwork(media_tree / 'missing.jpg').status_code == 404
+    assert client.get('/api/artwork').status_code == 400
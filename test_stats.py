@@ -0,0 +1,142 @@
+import threading
+from datetime import date, datetime, timedelta
+
+from stats import ACTIVITY_MAX_STEP, LibraryStats
+
+
+def file_info(path, size=100, current_time=0, duration=0, completed=False):
+    return {'path': path, 'size': size, 'current_time': current_time, 'duration': duration, 'completed': completed}
+
+
+def make_library(root):
+    return {
+        'series': {'Show': {1: [file_info(f"{root}/Show/Season 1/S01E01.mkv", completed=True, duration=1200),
+                                file_info(f"{root}/Show/Season 1/S01E02.mkv", current_time=300, duration=1200)]}},
+        'movies': [file_info(f"{root}/Heat.mkv", size=1000)],
+    }
+
+
+def record(position, at, duration=1200, completed=False):
+    return {'position': position, 'duration': duration, 'completed': completed, 'last_played': at.isoformat()}
+
+
+def today_activity(stats):
+    return stats.snapshot(1)['activity'][-1]['seconds']
+
+
+def test_apply_library_totals(tmp_path):
+    stats = LibraryStats()
+    assert stats.apply_library(make_library(tmp_path), tmp_path) == (3, 0, 0)
+
+    snapshot = stats.snapshot()
+    assert snapshot['totals']['files'] == 3
+    assert snapshot['totals']['bytes'] == 1200
+    assert snapshot['totals']['episodes_watched'] == 1
+    assert snapshot['totals']['episodes_remaining'] == 1
+    assert snapshot['totals']['watch_time'] == 1500
+    assert snapshot['series']['Show']['remaining'] == 1
+    assert snapshot['roots'] == {'Show': {'files': 2, 'bytes': 200}, '.': {'files': 1, 'bytes': 1000}}
+
+
+def test_apply_library_is_incremental(tmp_path):
+    stats = LibraryStats()
+    library = make_library(tmp_path)
+    stats.apply_library(library, tmp_path)
+    assert stats.apply_library(library, tmp_path) == (0, 0, 0)
+
+    library['movies'] = [dict(library['movies'][0], size=2000)]
+    del library['series']['Show']
+    assert stats.apply_library(library, tmp_path) == (0, 2, 1)
+    snapshot = stats.snapshot()
+    assert snapshot['totals']['bytes'] == 2000
+    assert snapshot['series'] == {}
+
+
+def test_progress_updates_counters(tmp_path):
+    stats = LibraryStats()
+    library = make_library(tmp_path)
+    stats.apply_library(library, tmp_path)
+    episode = library['series']['Show'][1][1]['path']
+
+    stats.on_progress(episode, None, record(1200, datetime.now(), completed=True))
+    assert stats.snapshot()['totals']['episodes_watched'] == 2
+    stats.on_progress(episode, None, None)
+    assert stats.snapshot()['totals']['episodes_watched'] == 1
+
+
+def test_playback_counts_forward_steps():
+    stats = LibraryStats()
+    now = datetime.now()
+    stats.on_playback(record(100, now), record(130, now + timedelta(seconds=30)))
+
+    assert today_activity(stats) == 30
+
+
+def test_playback_step_is_bounded_by_wall_clock():
+    stats = LibraryStats()
+    now = datetime.now()
+    # A short seek between two saves five seconds apart
+    stats.on_playback(record(100, now), record(190, now + timedelta(seconds=5)))
+
+    assert today_activity(stats) == 5
+
+
+def test_seeks_and_rewinds_do_not_count():
+    stats = LibraryStats()
+    now = datetime.now()
+    later = now + timedelta(seconds=ACTIVITY_MAX_STEP * 10)
+    stats.on_playback(record(0, now), record(ACTIVITY_MAX_STEP + 1, later))
+    stats.on_playback(record(500, now), record(100, later))
+    stats.on_playback(None, record(100, later))
+
+    assert today_activity(stats) == 0
+
+
+def test_activity_survives_restart(tmp_path):
+    activity_file = tmp_path / 'watch_activity.json'
+    stats = LibraryStats(activity_file)
+    now = datetime.now()
+    stats.on_playback(record(0, now), record(60, now + timedelta(seconds=60)))
+    stats.save()
+
+    assert LibraryStats(activity_file).snapshot(1)['activity'] == [{'date': date.today().isoformat(), 'seconds': 60}]
+
+
+def test_concurrent_saves(tmp_path):
+    stats = LibraryStats(tmp_path / 'watch_activity.json')
+    now = datetime.now()
+    errors = []
+
+    def play():
+        try:
+            for step in range(50):
+                at = now + timedelta(seconds=step)
+                stats.on_playback(record(step, at), record(step + 1, at + timedelta(seconds=1)))
+                stats.save()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=play) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert LibraryStats(tmp_path / 'watch_activity.json').snapshot(1)['activity'][-1]['seconds'] == 200
+
+
+def test_only_player_saves_count_as_activity(backend):
+    library = backend.get_current_library()
+    paths = [episode['path'] for episode in library['series']['Breaking Bad'][1]]
+    client = backend.app.test_client()
+
+    # Marking an almost finished episode watched jumps to its end
+    backend.record_progress(paths[0], 2350, 2400, False)
+    client.post('/api/progress/batch', json={'action': 'watched', 'paths': [paths[0]]})
+    assert today_activity(backend.library_stats) == 0
+
+    backend.record_progress(paths[1], 100, 2400, False)
+    backend.progress_store.get(paths[1])['last_played'] = (datetime.now() - timedelta(seconds=30)).isoformat()
+    backend.record_progress(paths[1], 130, 2400, False)
+    assert today_activity(backend.library_stats) == 30
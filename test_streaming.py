@@ -0,0 +1,90 @@
+import threading
+import urllib.request
+
+import pytest
+from werkzeug.serving import make_server
+
+
+@pytest.fixture
+def movie(media_tree):
+    return media_tree / 'Heat.1995.1080p.BluRay.mkv'
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
+
+
+def stream(client, path, **headers):
+    return client.get('/api/stream', query_string={'path': str(path)}, headers=headers)
+
+
+def test_whole_file(client, movie):
+    response = stream(client, movie)
+
+    assert response.status_code == 200
+    assert response.data == movie.read_bytes()
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.mimetype == 'video/x-matroska'
+
+
+@pytest.mark.parametrize('header, start, stop', [
+    ('bytes=0-99', 0, 100),
+    ('bytes=100-', 100, 4096),
+    ('bytes=-500', 3596, 4096),
+    ('bytes=4000-9999', 4000, 4096),
+])
+def test_single_range(client, movie, header, start, stop):
+    response = stream(client, movie, Range=header)
+
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes {start}-{stop - 1}/4096"
+    assert response.headers['Content-Length'] == str(stop - start)
+    assert response.data == movie.read_bytes()[start:stop]
+
+
+def test_unsatisfiable_range(client, movie):
+    response = stream(client, movie, Range='bytes=5000-6000')
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */4096'
+
+
+def test_multiple_ranges_get_the_whole_file(client, movie):
+    response = stream(client, movie, Range='bytes=0-9,20-29')
+
+    assert response.status_code == 200
+    assert len(response.data) == 4096
+
+
+def test_conditional_requests(client, movie):
+    etag = stream(client, movie).headers['ETag']
+
+    assert stream(client, movie, **{'If-None-Match': etag}).status_code == 304
+    assert stream(client, movie, Range='bytes=0-9', **{'If-Range': etag}).status_code == 206
+    # A stale If-Range means the file changed: send all of it
+    assert stream(client, movie, Range='bytes=0-9', **{'If-Range': '"stale"'}).status_code == 200
+
+
+def test_only_videos_in_the_media_folder(client, movie, tmp_path):
+    outside = tmp_path / 'outside.mkv'
+    outside.write_bytes(b'secret')
+
+    assert stream(client, outside).status_code == 403
+    assert stream(client, movie.parent / '..' / 'outside.mkv').status_code == 403
+    assert stream(client, movie.parent / 'Missing.mkv').status_code == 404
+    assert client.get('/api/stream').status_code == 400
+
+
+def test_sendfile_on_the_werkzeug_server(backend, movie):
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/api/stream?path={urllib.request.quote(str(movie))}"
+        request = urllib.request.Request(url, headers={'Range': 'bytes=1000-2999'})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert response.status == 206
+            assert response.read() == movie.read_bytes()[1000:3000]
+    finally:
+        server.shutdown()